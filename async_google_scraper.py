@@ -1,186 +1,212 @@
+import os
+import sys
 import time
-import re
 import csv
 import json
+import zlib
 import asyncio
+import argparse
+import threading
+import contextlib
+import itertools
+import multiprocessing
 import aiohttp
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from datetime import datetime
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    print("Note: pandas not installed. Excel export will be skipped.")
-    print("To enable Excel export, install pandas: pip install pandas openpyxl")
+from url_utils import dedupe_urls, DEFAULT_STRIP_PARAMS
+from scheduler import PriorityScheduler
+from proxy_pool import ProxyPool, is_proxy_failure
+from seen_filter import SeenFilter
+from email_extractor import extract_emails, categorize_email
+from site_result import SiteResult, to_json_results
+from profiler import stage as profile_stage, call_in_stage, start_profiling, stop_profiling
+from results_db import ResultDatabase
+from request_timing import LatencyRecorder, add_site_timing, create_trace_config
+from scrape_metrics import ScrapeMetrics, MetricsServer, StatsWriter
+from scraper_logging import get_logger, configure_logging, add_logging_arguments, ProgressRenderer
+from exporters import StreamingExport, StreamingExcelExporter, ResultSummary, result_domain, OPENPYXL_AVAILABLE
 
-async def scrape_google_urls(query, num_results=100, num_pages=1):
+logger = get_logger(__name__)
+
+# Proxies a page is tried through before it counts as failed
+PROXY_ATTEMPTS = 3
+
+def build_chrome_options(headless=True, proxy=None):
     """
-    Scrape URLs from Google search results.
+    Build the Chrome options used for scraping Google.
     
     Args:
-        query (str): The search term to use
-        num_results (int): Number of results to request from Google per page (default: 100)
-        num_pages (int): Number of pages to scrape (default: 1)
+        headless (bool): Run Chrome without a window
+        proxy (str, optional): Proxy such as 'http://10.0.0.1:3128'. Chrome cannot use
+            proxies with credentials from the command line.
         
     Returns:
-        list: A list of URLs from the search results
+        Options: Chrome options
     """
-    # Format the search query for URL
-    formatted_query = query.replace(' ', '+')
+    from selenium.webdriver.chrome.options import Options
     
-    # Configure Chrome options
     chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run in headless mode
+    if headless:
+        chrome_options.add_argument("--headless")  # Run in headless mode
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
+    if proxy:
+        chrome_options.add_argument(f"--proxy-server={proxy}")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
+    return chrome_options
+
+def create_chrome_driver(chrome_options=None):
+    """Start a Chrome driver with the scraping options. The caller has to quit() it."""
+    # Also profiled when the browser pool starts the browser in a worker thread
+    return call_in_stage('serp_browser', _start_chrome, chrome_options)
+
+def _start_chrome(chrome_options):
+    # Selenium is only imported once a browser is needed, extraction-only runs never load it
+    from selenium import webdriver
+    return webdriver.Chrome(options=chrome_options or build_chrome_options())
+
+async def iter_google_result_pages(driver, query, num_results=100, num_pages=1, metrics=None, debug_html=None):
+    """
+    Load Google search results pages in a browser and yield the URLs of each page.
     
-    # Initialize the Chrome driver
-    driver = webdriver.Chrome(options=chrome_options)
+    The browser calls run in a worker thread, so other tasks (such as email extraction or
+    searches in other browsers) keep running while a page loads.
     
-    try:
-        all_urls = []
+    Args:
+        driver (WebDriver): Browser to load the pages in. It is left open.
+        query (str): The search term to use
+        num_results (int): Number of results to request from Google per page (default: 100)
+        num_pages (int): Number of pages to scrape (default: 1)
+        metrics (ScrapeMetrics, optional): Live counters for loaded pages and found URLs
+        debug_html (str, optional): Save the first results page to this file for debugging
         
-        for page in range(num_pages):
-            # Calculate the start parameter for pagination (0, 100, 200, etc.)
-            start = page * min(num_results, 100)
-            
-            # Add num and start parameters
-            search_url = f"https://www.google.com/search?q={formatted_query}&num={min(num_results, 100)}&start={start}"
-            
+    Yields:
+        list: The URLs found on a results page, in result order
+    """
+    # The results page parser needs BeautifulSoup, which extraction-only runs do not load
+    from serp_parser import parse_serp
+    
+    # Format the search query for URL
+    formatted_query = query.replace(' ', '+')
+    
+    for page in range(num_pages):
+        # Calculate the start parameter for pagination (0, 100, 200, etc.)
+        start = page * min(num_results, 100)
+        
+        # Add num and start parameters
+        search_url = f"https://www.google.com/search?q={formatted_query}&num={min(num_results, 100)}&start={start}"
+        
+        # The browser calls run in worker threads, which call_in_stage() profiles as well
+        with profile_stage('serp_browser'):
             # Open the search URL
-            driver.get(search_url)
-            print(f"Navigating to Google search results page {page+1} (starting at result {start+1})...")
+            await asyncio.to_thread(call_in_stage, 'serp_browser', driver.get, search_url)
+            logger.info("Navigating to Google search results page", page=page+1, start=start+1)
             
             # Wait for the page to load
             await asyncio.sleep(5)  # Slightly longer wait for Google to load
             
-            # Get the page source and parse with BeautifulSoup
-            page_html = driver.page_source
-            soup = BeautifulSoup(page_html, 'html.parser')
-            
-            # Extract URLs for this page
-            page_urls = []
-            
-            # Save HTML for debugging (optional, only save the first page)
-            if page == 0:
-                with open("google_source.html", "w", encoding="utf-8") as f:
-                    f.write(page_html)
-                print("Saved HTML source to google_source.html for debugging")
-            
-            # Try multiple selector strategies to find search results
-            print(f"Extracting URLs from page {page+1}...")
-            
-            # Method 1: Try the original selectors from info.txt
-            try:
-                organic_results = soup.find("div", {"class": "dURPMd"}).find_all("div", {"class": "Ww4FFb"})
-                print(f"Method 1: Found {len(organic_results)} results")
-                
-                for result in organic_results:
-                    try:
-                        url = result.find("a").get('href')
-                        # Clean URL if necessary
-                        if url.startswith('/url?q='):
-                            url = url.split('/url?q=')[1].split('&')[0]
-                        page_urls.append(url)
-                    except:
-                        continue
-            except Exception as e:
-                print(f"Method 1 failed: {e}")
-            
-            # Method 2: Try finding all search result blocks with common classes
-            if not page_urls:
-                try:
-                    # Look for any divs that might contain search results (most common pattern)
-                    search_divs = soup.find_all("div", class_="g")
-                    print(f"Method 2: Found {len(search_divs)} results")
-                    
-                    for div in search_divs:
-                        try:
-                            a_tag = div.find("a")
-                            if a_tag and a_tag.get('href'):
-                                url = a_tag.get('href')
-                                if url.startswith('http'):
-                                    page_urls.append(url)
-                        except Exception as e:
-                            continue
-                except Exception as e:
-                    print(f"Method 2 failed: {e}")
-            
-            # Method 3: Try another common pattern
-            if not page_urls:
-                try:
-                    # Try to find all 'a' tags within search results
-                    search_results = soup.find_all("div", {"class": "yuRUbf"})
-                    print(f"Method 3: Found {len(search_results)} results")
-                    
-                    for result in search_results:
-                        try:
-                            url = result.find("a").get('href')
-                            if url.startswith('http'):
-                                page_urls.append(url)
-                        except:
-                            continue
-                except Exception as e:
-                    print(f"Method 3 failed: {e}")
-            
-            # Method 4: Most generic approach - find all links on the page and filter
-            if not page_urls:
-                try:
-                    all_links = soup.find_all("a")
-                    print(f"Method 4: Found {len(all_links)} links")
-                    
-                    for link in all_links:
-                        href = link.get('href')
-                        if href and href.startswith('http') and 'google' not in href and '?' in href:
-                            # This is likely a search result link
-                            if href not in page_urls:
-                                page_urls.append(href)
-                except Exception as e:
-                    print(f"Method 4 failed: {e}")
-            
-            # Remove Google-related URLs
-            page_urls = [url for url in page_urls if 'google.com' not in url]
+            # Get the page source
+            page_html = await asyncio.to_thread(call_in_stage, 'serp_browser', lambda: driver.page_source)
+        
+        # Save HTML for debugging (optional, only save the first page)
+        if page == 0 and debug_html:
+            with open(debug_html, "w", encoding="utf-8") as f:
+                f.write(page_html)
+            logger.debug("Saved HTML source for debugging", file=debug_html)
+        
+        # Try multiple selector strategies to find search results
+        logger.debug("Extracting URLs", page=page+1)
+        with profile_stage('serp_parse'):
+            page_urls = [result['url'] for result in parse_serp(page_html, require_query=True)]
+        
+        if metrics is not None:
+            metrics.serp_page_loaded(len(page_urls))
+        logger.info("Found URLs on search results page", page=page+1, urls=len(page_urls))
+        yield page_urls
+        
+        # Check if we have enough results or if there are no results on this page
+        if len(page_urls) == 0:
+            logger.info("No more results, stopping pagination", page=page+1)
+            break
             
+        # Delay between pages to avoid being detected as a bot (if scraping multiple pages)
+        if page < num_pages - 1:
+            delay = 3 + (page * 0.5)  # Progressive delay to further reduce detection risk
+            logger.debug("Waiting before loading the next page", seconds=round(delay, 1))
+            await asyncio.sleep(delay)
+
+async def scrape_google_urls(query, num_results=100, num_pages=1, metrics=None, driver=None, debug_html="google_source.html",
+                             strip_params=DEFAULT_STRIP_PARAMS, url_map=None, proxy_pool=None):
+    """
+    Scrape URLs from Google search results.
+    
+    Args:
+        query (str): The search term to use
+        num_results (int): Number of results to request from Google per page (default: 100)
+        num_pages (int): Number of pages to scrape (default: 1)
+        metrics (ScrapeMetrics, optional): Live counters for loaded pages and found URLs
+        driver (WebDriver, optional): Browser to use, for example to share one browser between
+            several queries. It is left open. By default a new browser is started and closed.
+        debug_html (str, optional): Save the first results page to this file for debugging.
+            None disables it.
+        strip_params (iterable): Query parameters removed before the URLs are deduplicated,
+            see url_utils.DEFAULT_STRIP_PARAMS
+        url_map (dict, optional): Filled with every URL as found on the results pages and the
+            canonical URL that replaces it
+        proxy_pool (ProxyPool, optional): Start the browser behind a proxy of this pool, when
+            no driver is passed. A search without results counts as a failure of the proxy,
+            since Google answers rate-limited addresses with a CAPTCHA page.
+        
+    Returns:
+        list: A list of canonical URLs from the search results, without duplicates
+    """
+    # Initialize the Chrome driver, unless the caller shares its own
+    owns_driver = driver is None
+    proxy = None
+    if owns_driver:
+        if proxy_pool is not None:
+            proxy = await proxy_pool.acquire(browser=True)
+            if proxy is None:
+                logger.warning("No proxy without credentials for the browser, searching without a proxy")
+        try:
+            driver = create_chrome_driver(build_chrome_options(proxy=proxy.address) if proxy is not None else None)
+        except Exception:
+            if proxy is not None:
+                await proxy_pool.release(proxy)
+            raise
+    
+    search_start = time.perf_counter()
+    found = 0
+    try:
+        all_urls = []
+        async for page_urls in iter_google_result_pages(driver, query, num_results, num_pages, metrics, debug_html):
             # Add to the global list
             all_urls.extend(page_urls)
-            print(f"Found {len(page_urls)} URLs on page {page+1}")
-            
-            # Check if we have enough results or if there are no results on this page
-            if len(page_urls) == 0:
-                print(f"No more results found on page {page+1}, stopping pagination")
-                break
-                
-            # Delay between pages to avoid being detected as a bot (if scraping multiple pages)
-            if page < num_pages - 1:
-                delay = 3 + (page * 0.5)  # Progressive delay to further reduce detection risk
-                print(f"Waiting {delay:.1f} seconds before loading the next page...")
-                await asyncio.sleep(delay)
         
-        # Remove duplicates
-        all_urls = list(dict.fromkeys(all_urls))  # Remove duplicates while preserving order
+        # Remove URLs of the same page (http/https, www, tracking parameters) while preserving order
+        found = len(all_urls)
+        all_urls, canonical = dedupe_urls(all_urls, strip_params)
+        if url_map is not None:
+            url_map.update(canonical)
         
-        print(f"Successfully extracted {len(all_urls)} unique URLs from Google search results")
+        logger.info("Extracted unique URLs from Google search results", urls=len(all_urls), duplicates=found - len(all_urls))
         
         return all_urls
         
     finally:
-        # Close the browser safely
-        try:
-            driver.quit()
-        except Exception as e:
-            print(f"Note: Could not terminate browser process cleanly, but this is normal. Error: {type(e).__name__}")
+        if proxy is not None:
+            await proxy_pool.release(proxy, time.perf_counter() - search_start, failed=found == 0)
+        
+        # Close the browser safely, a shared browser stays open for the next query
+        if owns_driver:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.debug("Could not terminate browser process cleanly", error=type(e).__name__)
 
-async def extract_emails_from_url(session, url, semaphore, timeout=10):
+async def extract_emails_from_url(session, url, semaphore, timeout=10, recorder=None, metrics=None, proxy_pool=None):
     """
     Extract email addresses from a given URL asynchronously.
     
@@ -189,23 +215,26 @@ async def extract_emails_from_url(session, url, semaphore, timeout=10):
         url (str): The URL to scrape for emails
         semaphore: asyncio Semaphore to limit concurrent requests
         timeout (int): Request timeout in seconds
+        recorder (LatencyRecorder, optional): Records body download, regex and categorization
+            times, and adds the per-site stage times to the metadata under 'timings'
+        metrics (ScrapeMetrics, optional): Live counters for requests in flight, bytes and errors
+        proxy_pool (ProxyPool, optional): Send every request through a proxy of this pool and
+            report the outcome to it
         
     Returns:
-        tuple: (url, list of found email addresses, metadata)
+        SiteResult: The found email addresses with their categories, and the metadata
     """
-    emails = []
-    metadata = {
-        'pages_checked': 0,
-        'status': 'failure',
-        'error': None,
-        'categorized_emails': {},
-        'domain_matches': 0
-    }
+    result = SiteResult(url, domain='')
+    
+    # Per-site stage times in milliseconds, also filled in by the session's trace config
+    timings = {} if recorder is not None else None
+    if timings is not None:
+        result.set_extra('timings', timings)
     
     try:
         # Parse the URL to get domain info
         parsed_url = urlparse(url)
-        domain = parsed_url.netloc
+        domain = result.domain = sys.intern(parsed_url.netloc)
         base_domain = '.'.join(domain.split('.')[-2:]) if len(domain.split('.')) > 1 else domain
         
         # Common user agent
@@ -226,455 +255,658 @@ async def extract_emails_from_url(session, url, semaphore, timeout=10):
                 pages_to_check.append(f"https://www.{domain}/{path}")
                 pages_to_check.append(f"https://{domain}/{path}")
         
-        # Regular expression for email extraction - more comprehensive
-        email_regex = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        
-        # Email categorization patterns
-        email_categories = {
-            'contact': ['contact', 'info', 'inquiries', 'enquiries', 'general'],
-            'support': ['support', 'help', 'service', 'services', 'customer'],
-            'sales': ['sales', 'order', 'orders', 'business', 'marketing'],
-            'admin': ['admin', 'administrator', 'webmaster', 'hostmaster', 'postmaster'],
-            'personal': ['john', 'jane', 'david', 'mike', 'sarah', 'jennifer'],
-            'other': []  # Default category
-        }
+        # Emails found so far on this site, for constant time duplicate checks
+        seen_emails = set()
         
-        # Initialize categorized emails dictionary
-        categorized_emails = {category: [] for category in email_categories}
+        # Pages answered with 200, and the error of the last page that was not
+        loaded_pages = 0
+        last_error = None
         
         # Check all pages for emails (limit to 3 to avoid too many requests)
         for page_index, page_url in enumerate(pages_to_check[:3]):
             try:
                 # Use semaphore to limit concurrent requests
                 async with semaphore:
-                    print(f"Checking for emails on: {page_url}")
-                    metadata['pages_checked'] += 1
+                    logger.debug("Checking for emails", url=page_url)
+                    result.pages_checked += 1
                     
-                    async with session.get(page_url, headers=headers, timeout=timeout) as response:
-                        if response.status == 200:
-                            # Get the HTML content
-                            content = await response.text()
+                    # A request that failed because of its proxy is sent again through another proxy.
+                    # A timeout can be the site as well as the proxy, so it is only tried once more.
+                    attempts = PROXY_ATTEMPTS if proxy_pool is not None else 1
+                    timeout_retried = False
+                    for attempt in range(attempts):
+                        if metrics is not None:
+                            metrics.request_started()
+                        byte_count = 0
+                        request_error = None
+                        proxy = await proxy_pool.acquire() if proxy_pool is not None else None
+                        proxy_failed = False
+                        timed_out = False
+                        retry = False
+                        request_start = time.perf_counter()
+                        try:
+                            async with session.get(page_url, headers=headers, timeout=timeout, trace_request_ctx=timings,
+                                                   proxy=proxy.url if proxy is not None else None) as response:
+                                if response.status == 200:
+                                    loaded_pages += 1
+                                    # Get the HTML content
+                                    stage_start = time.perf_counter()
+                                    body = await response.read()
+                                    byte_count = len(body)
+                                    content = await response.text()
+                                    if response.content_type in ('text/html', 'application/xhtml+xml'):
+                                        result.html_pages += 1
+                                    if recorder is not None:
+                                        page_host = response.url.host
+                                        elapsed = time.perf_counter() - stage_start
+                                        recorder.record('body', elapsed, page_host)
+                                        add_site_timing(timings, 'body', elapsed)
+                                        stage_start = time.perf_counter()
                             
-                            # Try to find emails in the HTML content
-                            page_emails = re.findall(email_regex, content)
+                                    with profile_stage('extraction'):
+                                        # Find and validate the emails in the HTML content
+                                        page_emails = extract_emails(content)
                             
-                            # Clean and filter the emails
-                            for email in page_emails:
-                                # Basic validation to ignore common false positives
-                                if (
-                                    '.' in email and 
-                                    '@' in email and
-                                    not email.endswith('.png') and
-                                    not email.endswith('.jpg') and
-                                    not email.endswith('.gif') and
-                                    not email.endswith('.svg') and
-                                    not email.endswith('.js') and
-                                    not email.endswith('.css') and
-                                    len(email) < 100 and
-                                    len(email) > 5  # Minimum length for valid email
-                                ):
-                                    # Enhanced validation
-                                    parts = email.split('@')
-                                    if len(parts) == 2:
-                                        username, domain_part = parts
-                                        
-                                        # Check for valid username and domain structure
-                                        if (
-                                            len(username) > 1 and
-                                            '.' in domain_part and
-                                            domain_part.split('.')[-1] in ['com', 'org', 'net', 'edu', 'io', 'gov', 'co', 'info', 'biz', 'de', 'uk', 'fr', 'es', 'it', 'nl']
-                                        ):
-                                            # Normalize email to lowercase
-                                            email = email.lower()
-                                            
+                                        if recorder is not None:
+                                            elapsed = time.perf_counter() - stage_start
+                                            recorder.record('regex', elapsed, page_host)
+                                            add_site_timing(timings, 'regex', elapsed)
+                                            stage_start = time.perf_counter()
+                            
+                                        for email in page_emails:
                                             # Check if this is a new email
-                                            if email not in emails:
-                                                emails.append(email)
-                                                
-                                                # Check if email domain matches website domain
-                                                email_domain = email.split('@')[1]
-                                                if base_domain in email_domain:
-                                                    metadata['domain_matches'] += 1
-                                                
-                                                # Categorize the email
-                                                categorized = False
-                                                for category, keywords in email_categories.items():
-                                                    for keyword in keywords:
-                                                        if keyword in username.lower():
-                                                            categorized_emails[category].append(email)
-                                                            categorized = True
-                                                            break
-                                                    if categorized:
-                                                        break
-                                                
-                                                # If not categorized, add to 'other'
-                                                if not categorized:
-                                                    categorized_emails['other'].append(email)
+                                            if email in seen_emails:
+                                                continue
+                                            seen_emails.add(email)
+                                            result.add_email(email, categorize_email(email))
+                                        
+                                            # Check if email domain matches website domain
+                                            if base_domain in email.split('@')[1]:
+                                                result.domain_matches += 1
+                            
+                                        if recorder is not None:
+                                            elapsed = time.perf_counter() - stage_start
+                                            recorder.record('categorize', elapsed, page_host)
+                                            add_site_timing(timings, 'categorize', elapsed)
+                                else:
+                                    request_error = last_error = f"HTTP {response.status}"
+                                    proxy_failed = is_proxy_failure(status=response.status)
+                                    retry = proxy_failed and attempt < attempts - 1
+                        except Exception as e:
+                            request_error = type(e).__name__
+                            proxy_failed = is_proxy_failure(e)
+                            timed_out = isinstance(e, asyncio.TimeoutError)
+                            if proxy_failed:
+                                retry = attempt < attempts - 1
+                            elif timed_out and proxy_pool is not None and not timeout_retried:
+                                retry = timeout_retried = attempt < attempts - 1
+                            if not retry:
+                                raise
+                        finally:
+                            if proxy is not None:
+                                # A timeout is not held against the proxy, nor counted in its latency
+                                seconds = None if timed_out else time.perf_counter() - request_start
+                                await proxy_pool.release(proxy, seconds, proxy_failed)
+                            if metrics is not None:
+                                metrics.request_finished(byte_count, request_error)
+                        
+                        if not retry:
+                            break
                 
                 # Only continue if we haven't found any emails yet
-                if emails and page_index > 0:  # Only stop early if we've checked more than the main page
+                if result.emails and page_index > 0:  # Only stop early if we've checked more than the main page
                     break
                     
             except Exception as e:
-                print(f"Error checking {page_url}: {str(e)}")
+                last_error = str(e) or type(e).__name__
+                logger.debug("Error checking page", url=page_url, error=last_error)
                 continue
         
-        # Update metadata with categorized emails
-        metadata['categorized_emails'] = {k: v for k, v in categorized_emails.items() if v}  # Only include non-empty categories
-        metadata['status'] = 'success'
+        # A site where no page could be loaded failed, even though no exception escaped
+        if loaded_pages:
+            result.status = 'success'
+        else:
+            result.error = last_error or "No page could be loaded"
                 
     except Exception as e:
-        metadata['error'] = str(e)
-        print(f"Error extracting emails from {url}: {str(e)}")
+        result.error = str(e)
+        logger.warning("Error extracting emails", url=url, error=str(e))
     
-    # Return the URL, found emails, and metadata
-    return url, emails, metadata
+    return result
 
-async def scrape_websites_for_emails(urls, max_sites=None, max_concurrent=10):
+# Returned by _next_url when an async iterable of URLs is exhausted
+_URLS_EXHAUSTED = object()
+
+async def _next_url(url_iterator):
+    try:
+        return await anext(url_iterator)
+    except StopAsyncIteration:
+        return _URLS_EXHAUSTED
+
+async def iter_site_results(session, urls, max_concurrent=10, recorder=None, metrics=None, window=None, semaphore=None, timeout=10,
+                            deadline=None, proxy_pool=None):
+    """
+    Extract emails from websites and yield the results as the sites complete.
+    
+    URLs are only taken from urls when a site finishes, so at most window sites are in
+    progress and a long URL list is never loaded or scheduled all at once. urls can be a
+    list, any iterable (such as the lines of a file) or an async iterable. An async
+    iterable is read concurrently with the sites in progress, so a slow producer such as
+    a pipe does not hold back the results.
+    
+    Args:
+        session: aiohttp ClientSession
+        urls: Iterable or async iterable of URLs
+        max_concurrent (int): Maximum number of concurrent requests
+        recorder (LatencyRecorder, optional): Passed to extract_emails_from_url
+        metrics (ScrapeMetrics, optional): Passed to extract_emails_from_url
+        window (int, optional): Maximum number of sites in progress. Defaults to four times
+            max_concurrent, enough to keep every request slot busy.
+        semaphore (asyncio.Semaphore, optional): Request limit shared with other calls. By default
+            each call gets its own limit of max_concurrent requests.
+        timeout (int): Request timeout in seconds
+        deadline (float, optional): time.monotonic() value at which the sites still in progress
+            are cancelled and the iteration stops
+        proxy_pool (ProxyPool, optional): Passed to extract_emails_from_url
+        
+    Yields:
+        SiteResult: The URL, the extracted emails and the metadata of a site
+    """
+    semaphore = semaphore or asyncio.Semaphore(max_concurrent)
+    window = window or max_concurrent * 4
+    is_async = hasattr(urls, '__aiter__')
+    url_iterator = aiter(urls) if is_async else iter(urls)
+    next_url = None  # Pending read from an async iterable
+    exhausted = False
+    pending = set()
+    
+    try:
+        while True:
+            # Start sites until the window is full or no URL is available right now
+            while not exhausted and len(pending) < window:
+                if is_async:
+                    if next_url is None:
+                        next_url = asyncio.ensure_future(_next_url(url_iterator))
+                    if not next_url.done():
+                        break
+                    url, next_url = next_url.result(), None
+                    if url is _URLS_EXHAUSTED:
+                        exhausted = True
+                        break
+                else:
+                    try:
+                        url = next(url_iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                pending.add(asyncio.ensure_future(
+                    extract_emails_from_url(session, url, semaphore, timeout, recorder=recorder, metrics=metrics,
+                                            proxy_pool=proxy_pool)))
+            
+            if not pending and exhausted:
+                return
+            
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("Deadline reached, cancelling sites in progress", sites=len(pending))
+                    return
+            
+            waiting = pending if next_url is None else pending | {next_url}
+            done, _ = await asyncio.wait(waiting, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is next_url:
+                    continue
+                pending.discard(task)
+                yield task.result()
+    finally:
+        # Cancel the remaining work when the consumer stops early
+        for task in pending:
+            task.cancel()
+        if next_url is not None:
+            next_url.cancel()
+
+def _limit_urls(urls, max_sites):
+    """Return the first max_sites URLs of a list, an iterable or an async iterable."""
+    if hasattr(urls, '__aiter__'):
+        async def limited():
+            count = 0
+            async for url in urls:
+                if count >= max_sites:
+                    return
+                count += 1
+                yield url
+        return limited()
+    if isinstance(urls, (list, tuple)):
+        return urls[:max_sites]
+    return itertools.islice(urls, max_sites)
+
+async def scrape_websites_for_emails(urls, max_sites=None, max_concurrent=10, progress_callback=None, exporters=None, keep_results=True, recorder=None, metrics=None, connector=None, session=None, render_fallback=None,
+                                     deadline=None, scheduler=None, proxy_pool=None, seen_filter=None):
     """
     Scrape multiple websites for email addresses asynchronously.
     
     Args:
-        urls (list): List of URLs to scrape
+        urls (list): List of URLs to scrape. Any iterable or async iterable of URLs works as
+            well, such as lines streamed from a file. The URLs are read as the sites complete.
         max_sites (int, optional): Maximum number of sites to check. None means check all sites.
         max_concurrent (int, optional): Maximum number of concurrent requests
+        progress_callback (callable, optional): Called as progress_callback(completed, total, data)
+            after each site instead of printing the progress line. total is None when urls has
+            no length.
+        exporters (list, optional): Exporters (such as StreamingExport) whose write(result) method
+            is called as soon as each site is done
+        keep_results (bool, optional): Collect the results in the returned list. Set to False together
+            with exporters to keep memory flat on very large runs.
+        recorder (LatencyRecorder, optional): Records DNS, connect, TTFB, body download, regex and
+            categorization times per request and per host
+        metrics (ScrapeMetrics, optional): Live counters exposed by the metrics endpoint and stats file
+        connector (aiohttp.BaseConnector, optional): Connector for the session, for example a
+            TCPConnector with a custom resolver. It is closed together with the session.
+        session (aiohttp.ClientSession, optional): Session to use instead of creating one, so its
+            connection pool and DNS cache are shared between calls. It is left open, and connector
+            is ignored. Its trace configs are used as they are, so pass a recorder only if the
+            session was created with create_trace_config(recorder).
+        render_fallback (RenderFallback, optional): Load sites that returned HTML but no emails
+            again in a headless browser and scan the rendered page. It is left open.
+        deadline (float, optional): Seconds after which no new site is started and the sites in
+            progress are cancelled. The results of the sites finished until then are returned
+            and exported as usual.
+        scheduler (PriorityScheduler, optional): Order the sites by expected emails per second
+            instead of taking them in the order of urls
+        proxy_pool (ProxyPool, optional): Spread the requests over these proxies
+        seen_filter (SeenFilter, optional): Flag or remove the emails delivered by earlier runs,
+            and skip the domains delivered before if the filter is set up to. It is left open.
         
     Returns:
-        list: List of dictionaries with URL and extracted emails
+        list: SiteResult of every site, see site_result.py
     """
-    # Limit the number of sites to check if specified
+    # Leave out the domains delivered before, then limit the number of sites to check if specified
+    if seen_filter is not None:
+        urls = seen_filter.filter_urls(urls)
     if max_sites is not None and max_sites > 0:
-        urls = urls[:max_sites]
+        urls = _limit_urls(urls, max_sites)
     
-    # Create a semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(max_concurrent)
+    # Create an aiohttp session for all requests, unless the caller shares its own
+    if session is None:
+        # Trace DNS, connect and time to first byte of every request when timing is enabled
+        trace_configs = [create_trace_config(recorder)] if recorder is not None else None
+        session_context = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs)
+    else:
+        session_context = contextlib.nullcontext(session)
     
-    # Create an aiohttp session for all requests
-    async with aiohttp.ClientSession() as session:
-        # Create tasks for each URL
-        tasks = [extract_emails_from_url(session, url, semaphore) for url in urls]
+    with profile_stage('fetch'):
+        async with session_context as session:
+            # Track progress. Streamed URLs have no total.
+            total_tasks = len(urls) if hasattr(urls, '__len__') else None
+            completed_tasks = 0
+            results = []
+            
+            deadline_at = time.monotonic() + deadline if deadline is not None else None
+            if scheduler is not None:
+                urls = scheduler.iter_urls(urls, deadline_at)
+            if render_fallback is not None:
+                render_fallback.deadline = deadline_at
         
-        # Track progress
-        total_tasks = len(tasks)
-        completed_tasks = 0
-        results = []
+            if metrics is not None:
+                metrics.sites_total += total_tasks or 0
+                metrics.concurrency_limit = max_concurrent
         
-        print(f"\nStarting to check {total_tasks} websites for emails...")
-        print(f"Progress: 0/{total_tasks} (0.0%)")
+            logger.info("Starting to check websites for emails", websites=total_tasks if total_tasks is not None else 'streamed')
+            progress = ProgressRenderer(total_tasks) if progress_callback is None else None
+            emails_found = 0
         
-        # Wait for all tasks to complete
-        for i, task_result in enumerate(asyncio.as_completed(tasks), 1):
-            url, emails, metadata = await task_result
+            # Handle the sites as they complete, after the browser tier for sites that need it
+            # With a scheduler only as many sites as requests are in progress, so the order is
+            # decided as late as possible and the measured time per site is not queueing time
+            site_results = iter_site_results(session, urls, max_concurrent, recorder=recorder, metrics=metrics,
+                                             window=max_concurrent if scheduler is not None else None,
+                                             deadline=deadline_at, proxy_pool=proxy_pool)
+            if render_fallback is not None:
+                site_results = render_fallback.iter_results(site_results)
+            async for data in site_results:
+                if scheduler is not None:
+                    scheduler.observe(data)
+                if seen_filter is not None:
+                    seen_filter.apply(data)
+                url, emails = data.url, data.emails
+            
+                # Log result
+                if emails:
+                    emails_found += len(emails)
+                    logger.debug("Found emails", url=url, count=len(emails))
             
-            data = {"url": url, "emails": emails, "metadata": metadata}
+                if metrics is not None:
+                    if total_tasks is None:
+                        metrics.sites_total += 1
+                    metrics.site_completed(len(emails))
+                    if data.error:
+                        metrics.error('SiteError')
             
-            # Print result
-            if emails:
-                email_count = len(emails)
-                print(f"Found {email_count} email{'s' if email_count > 1 else ''} from {url}")
+                # Hand the result to the streaming exporters right away
+                if exporters:
+                    with profile_stage('export'):
+                        for exporter in exporters:
+                            exporter.write(data)
+            
+                if keep_results:
+                    results.append(data)
+            
+                # Update progress
+                completed_tasks += 1
+                if progress_callback is not None:
+                    progress_callback(completed_tasks, total_tasks, data)
+                else:
+                    progress.update(completed_tasks, emails=emails_found)
+        
+            if progress is not None:
+                progress.close()
             
-            results.append(data)
+            if proxy_pool is not None:
+                proxy_pool.log_stats()
             
-            # Update progress
-            completed_tasks += 1
-            progress_percent = (completed_tasks / total_tasks) * 100
-            print(f"Progress: {completed_tasks}/{total_tasks} ({progress_percent:.1f}%)")
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                logger.warning("Deadline reached, exporting partial results", completed=completed_tasks,
+                               not_started=scheduler.queued() if scheduler is not None else 'unknown')
         
-        return results
+            return results
 
-def save_results_to_csv(results, filename="google_results_with_emails.csv"):
+def normalize_work_item(item):
+    """Turn a URL or a bare domain into a URL that can be fetched."""
+    item = item.strip()
+    if not urlparse(item).scheme:
+        item = f"https://{item}"
+    return item
+
+async def stream_url_lines(path, batch_bytes=65536):
+    """
+    Yield the URLs or domains of a file, one per line, or of stdin for '-'.
+    
+    The file is read in batches in a worker thread, so it is never loaded as a whole and
+    a slow pipe does not block the event loop. stdin is read one line at a time, so every
+    URL can be started as soon as it arrives. Empty lines and lines starting with '#'
+    are skipped, and bare domains get https://.
+    
+    Args:
+        path (str): File name, or '-' for stdin
+        batch_bytes (int): Approximate number of bytes read from a file at once
+        
+    Yields:
+        str: URL
+    """
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    hint = 1 if handle is sys.stdin else batch_bytes
+    try:
+        while True:
+            lines = await asyncio.to_thread(handle.readlines, hint)
+            if not lines:
+                return
+            for line in lines:
+                if line.strip() and not line.startswith('#'):
+                    yield normalize_work_item(line)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def shard_urls_by_domain(urls, num_shards):
+    """
+    Split URLs into shards so that all URLs of the same domain end up in the same shard.
+    
+    Args:
+        urls (list): List of URLs to split
+        num_shards (int): Number of shards to create
+        
+    Returns:
+        list: A list of num_shards lists of URLs
+    """
+    shards = [[] for _ in range(num_shards)]
+    for url in urls:
+        domain = urlparse(url).netloc.lower()
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        # crc32 is stable across processes, unlike the built-in hash()
+        shards[zlib.crc32(domain.encode('utf-8')) % num_shards].append(url)
+    return shards
+
+# Progress queue shared with shard worker processes (set by the pool initializer)
+_shard_progress_queue = None
+
+def _init_shard_worker(progress_queue):
+    """Store the progress queue in a shard worker process."""
+    global _shard_progress_queue
+    _shard_progress_queue = progress_queue
+
+def _scrape_shard(shard_index, urls, max_concurrent):
+    """
+    Run scrape_websites_for_emails for one shard inside a worker process.
+    
+    Each worker has its own event loop and aiohttp session. Progress is reported
+    back to the launcher through the shared queue.
+    """
+    def report_progress(completed, total, data):
+        _shard_progress_queue.put((shard_index, completed, total, len(data.emails)))
+    
+    return asyncio.run(scrape_websites_for_emails(urls, None, max_concurrent, progress_callback=report_progress))
+
+async def scrape_websites_sharded(urls, num_workers=None, max_sites=None, max_concurrent=10):
+    """
+    Scrape websites for emails using several worker processes.
+    
+    The URLs are sharded by domain hash and every shard is scraped in its own process
+    with its own event loop and session. The per-shard results are merged into a single
+    list in the same format as scrape_websites_for_emails, so they can be passed to
+    save_results_to_csv unchanged.
+    
+    Args:
+        urls (list): List of URLs to scrape
+        num_workers (int, optional): Number of worker processes. None means one per CPU core.
+        max_sites (int, optional): Maximum number of sites to check. None means check all sites.
+        max_concurrent (int, optional): Maximum number of concurrent requests per worker
+        
+    Returns:
+        list: SiteResult of every site, see site_result.py
+    """
+    # Limit the number of sites to check if specified
+    if max_sites is not None and max_sites > 0:
+        urls = urls[:max_sites]
+    
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(urls) or 1))
+    shards = [shard for shard in shard_urls_by_domain(urls, num_workers) if shard]
+    total_sites = len(urls)
+    
+    logger.info("Starting to check websites for emails", websites=total_sites, workers=len(shards))
+    progress = ProgressRenderer(total_sites)
+    
+    # Spawn keeps the workers independent of the parent's running event loop
+    context = multiprocessing.get_context('spawn')
+    progress_queue = context.Queue()
+    shard_progress = {index: 0 for index in range(len(shards))}
+    shard_emails = {index: 0 for index in range(len(shards))}
+    
+    def drain_progress():
+        updated = False
+        while True:
+            try:
+                shard_index, completed, _, email_count = progress_queue.get_nowait()
+            except Exception:
+                return updated
+            shard_progress[shard_index] = completed
+            shard_emails[shard_index] += email_count
+            updated = True
+    
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                             initializer=_init_shard_worker, initargs=(progress_queue,)) as executor:
+        futures = [
+            loop.run_in_executor(executor, _scrape_shard, index, shard, max_concurrent)
+            for index, shard in enumerate(shards)
+        ]
+        
+        # Roll the per-shard progress up into a single progress line
+        pending = set(futures)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=0.5)
+            if drain_progress():
+                finished_shards = sum(1 for index, shard in enumerate(shards) if shard_progress[index] == len(shard))
+                progress.update(sum(shard_progress.values()), emails=sum(shard_emails.values()),
+                                workers_done=f"{finished_shards}/{len(shards)}")
+        progress.close()
+        
+        # Merge the shard results
+        results = []
+        for future in futures:
+            results.extend(future.result())
+    
+    return results
+
+def save_results_to_excel(results, excel_filename="google_results_with_emails.xlsx", background=False):
+    """
+    Save the results to an Excel workbook with a sheet per email category.
+    
+    The rows are streamed into a write-only workbook in a single pass over the results.
+    
+    Args:
+        results (list): List of dictionaries containing URLs and their emails
+        excel_filename (str): Name of the Excel file to save results to
+        background (bool): Build and save the workbook in a background thread
+        
+    Returns:
+        threading.Thread: The background thread if background is True, otherwise None
+    """
+    if not OPENPYXL_AVAILABLE:
+        return None
+    
+    def build_workbook():
+        excel = StreamingExcelExporter(excel_filename, time.strftime("%Y-%m-%d %H:%M:%S"))
+        summary = ResultSummary()
+        for result in results:
+            domain = result_domain(result)
+            summary.add(result, domain)
+            excel.write(result, domain)
+        excel.close(summary)
+    
+    if not background:
+        build_workbook()
+        return None
+    
+    thread = threading.Thread(target=build_workbook, name='excel-writer')
+    thread.start()
+    return thread
+
+def save_results_to_json(results, json_filename="search_results.json"):
+    """
+    Save the raw results as JSON for programmatic use.
+    
+    Args:
+        results (list): SiteResult of every site, or result dictionaries
+        json_filename (str): Name of the JSON file to save results to
+    """
+    with open(json_filename, 'w', encoding='utf-8') as f:
+        json.dump(to_json_results(results), f, indent=2)
+    logger.info("Raw data saved for programmatic use", file=json_filename)
+
+def save_results_to_csv(results, filename="google_results_with_emails.csv", json_format="json", jsonl_compression=None, parquet=False, database=None):
     """
     Save the URLs and emails to a CSV file in a clean, structured format.
     
+    Also writes the Excel workbook, the emails-only CSV, the JSON file and the summary report.
+    
     Args:
         results (list): List of dictionaries containing URLs and their emails
         filename (str): Name of the CSV file to save results to
+        json_format (str): 'json' for the indented search_results.json, or 'jsonl' for
+            newline-delimited search_results.jsonl instead
+        jsonl_compression (str, optional): Compress the JSONL file with 'gzip' or 'zstd'
+        parquet (bool): Also write search_results.parquet with one row per (url, email, category).
+            Requires pyarrow.
+        database (str, optional): Also upsert the results into this SQLite results database
     """
     # Get current date and time for the report
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     
-    # Prepare data for export
-    export_data = []
-    for i, result in enumerate(results, 1):
-        # Extract domain from URL
-        try:
-            domain = urlparse(result['url']).netloc
-        except:
-            domain = ''
-        
-        # Prepare email data
-        emails = result.get('emails', [])
-        email_str = '; '.join(emails) if emails else ''
-        has_email = 'Yes' if emails else 'No'
-        
-        # Get metadata
-        metadata = result.get('metadata', {})
-        status = metadata.get('status', 'unknown')
-        pages_checked = metadata.get('pages_checked', 0)
-        error = metadata.get('error', '')
-        domain_matches = metadata.get('domain_matches', 0)
-        
-        # Get categorized emails
-        categorized = metadata.get('categorized_emails', {})
-        contact_emails = '; '.join(categorized.get('contact', []))
-        support_emails = '; '.join(categorized.get('support', []))
-        sales_emails = '; '.join(categorized.get('sales', []))
-        admin_emails = '; '.join(categorized.get('admin', []))
-        personal_emails = '; '.join(categorized.get('personal', []))
-        other_emails = '; '.join(categorized.get('other', []))
-        
-        # Create a comprehensive row
-        row = {
-            'id': i,
-            'url': result['url'],
-            'domain': domain,
-            'has_email': has_email,
-            'email_count': len(emails),
-            'domain_match_count': domain_matches,
-            'pages_checked': pages_checked,
-            'status': status,
-            'error': error,
-            'contact_emails': contact_emails,
-            'support_emails': support_emails,
-            'sales_emails': sales_emails,
-            'admin_emails': admin_emails,
-            'personal_emails': personal_emails,
-            'other_emails': other_emails,
-            'all_emails': email_str,
-            'timestamp': timestamp
-        }
-        
-        export_data.append(row)
-    
-    # Define field names for CSV
-    fieldnames = [
-        'id', 
-        'url', 
-        'domain',
-        'has_email',
-        'email_count',
-        'domain_match_count',
-        'pages_checked',
-        'status',
-        'error',
-        'contact_emails',
-        'support_emails',
-        'sales_emails',
-        'admin_emails',
-        'personal_emails',
-        'other_emails',
-        'all_emails', 
-        'timestamp'
-    ]
-    
-    # Save as CSV
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in export_data:
-            writer.writerow(row)
-    
-    print(f"\nResults saved to {filename} in a clean, structured format")
-    
-    # Save as Excel if pandas is available
-    if PANDAS_AVAILABLE:
-        excel_filename = filename.replace('.csv', '.xlsx')
-        try:
-            # Convert to pandas DataFrame and save as Excel
-            df = pd.DataFrame(export_data)
-            
-            # Create a Pandas Excel writer
-            with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
-                # Write main data to a sheet
-                df.to_excel(writer, sheet_name='Full Results', index=False)
-                
-                # Create a summary sheet
-                total_sites = len(results)
-                sites_with_emails = sum(1 for r in results if r.get('emails'))
-                total_emails = sum(len(r.get('emails', [])) for r in results)
-                
-                # Count emails by category
-                all_categorized_emails = {}
-                for result in results:
-                    metadata = result.get('metadata', {})
-                    categorized = metadata.get('categorized_emails', {})
-                    for category, emails in categorized.items():
-                        if category not in all_categorized_emails:
-                            all_categorized_emails[category] = 0
-                        all_categorized_emails[category] += len(emails)
-                
-                # Create summary metrics
-                summary_data = {
-                    'Metric': [
-                        'Date', 
-                        'Total websites scraped', 
-                        'Websites with emails', 
-                        'Success rate', 
-                        'Total emails found',
-                        'Domain-matching emails',
-                        'Average emails per website',
-                        'Average emails per website with emails'
-                    ],
-                    'Value': [
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        total_sites,
-                        sites_with_emails,
-                        f"{sites_with_emails/total_sites*100:.1f}%" if total_sites > 0 else "0%",
-                        total_emails,
-                        sum(r.get('metadata', {}).get('domain_matches', 0) for r in results),
-                        f"{total_emails/total_sites:.2f}" if total_sites > 0 else "0",
-                        f"{total_emails/sites_with_emails:.2f}" if sites_with_emails > 0 else "0"
-                    ]
-                }
-                
-                # Add category breakdowns
-                for category, count in sorted(all_categorized_emails.items(), key=lambda x: x[1], reverse=True):
-                    summary_data['Metric'].append(f'{category.title()} emails')
-                    summary_data['Value'].append(count)
-                
-                # Write summary to a separate sheet
-                pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Create sheets for each category of emails
-                for category in ['contact', 'support', 'sales', 'admin', 'personal', 'other']:
-                    category_data = []
-                    for result in results:
-                        try:
-                            domain = urlparse(result['url']).netloc
-                            metadata = result.get('metadata', {})
-                            categorized = metadata.get('categorized_emails', {})
-                            emails = categorized.get(category, [])
-                            
-                            for email in emails:
-                                category_data.append({
-                                    'Domain': domain,
-                                    'URL': result['url'],
-                                    'Email': email
-                                })
-                        except Exception:
-                            continue
-                    
-                    if category_data:
-                        pd.DataFrame(category_data).to_excel(
-                            writer, 
-                            sheet_name=f'{category.title()} Emails', 
-                            index=False
-                        )
-                
-                # Create a simple emails-only sheet
-                email_data = []
-                for result in results:
-                    if result.get('emails'):
-                        domain = urlparse(result['url']).netloc
-                        for email in result.get('emails', []):
-                            is_domain_match = any(domain in email for domain in [domain, domain.replace('www.', '')])
-                            email_data.append({
-                                'Domain': domain,
-                                'Email': email,
-                                'Domain Match': 'Yes' if is_domain_match else 'No'
-                            })
-                
-                if email_data:
-                    pd.DataFrame(email_data).to_excel(writer, sheet_name='All Emails', index=False)
-            
-            print(f"Excel workbook with multiple sheets saved to {excel_filename}")
-        except Exception as e:
-            print(f"Warning: Could not save Excel file. Error: {str(e)}")
+    # Build the CSV files, the Excel sheets and the summary in a single pass over the results
+    export = StreamingExport(filename,
+                             jsonl_filename="search_results.jsonl" if json_format == "jsonl" else None,
+                             excel_filename=filename.replace('.csv', '.xlsx'),
+                             parquet_filename="search_results.parquet" if parquet else None,
+                             jsonl_compression=jsonl_compression,
+                             batch_size=1000, timestamp=timestamp)
+    result_db = ResultDatabase(database) if database else None
+    for result in results:
+        export.write(result)
+        if result_db is not None:
+            result_db.write(result)
+    export.close()
+    if result_db is not None:
+        result_db.close()
     
-    # Also save a simplified version with just domains and emails for quick reference
-    simple_filename = "emails_only.csv"
-    with open(simple_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['Domain', 'Email', 'Category', 'Domain Match'])
-        
-        for result in results:
-            if result.get('emails'):
-                try:
-                    domain = urlparse(result['url']).netloc
-                    metadata = result.get('metadata', {})
-                    categorized = metadata.get('categorized_emails', {})
-                    
-                    # Flatten categorized emails
-                    for category, emails in categorized.items():
-                        for email in emails:
-                            is_domain_match = email.split('@')[1] in [domain, domain.replace('www.', '')]
-                            writer.writerow([
-                                domain, 
-                                email, 
-                                category.title(),
-                                'Yes' if is_domain_match else 'No'
-                            ])
-                except:
-                    # Fallback if categorization failed
-                    for email in result.get('emails', []):
-                        writer.writerow([domain, email, 'Uncategorized', 'Unknown'])
-    
-    print(f"Simplified email list saved to {simple_filename}")
+    logger.info("Results saved", file=filename)
     
     # Save as JSON for programmatic use
-    json_filename = "search_results.json"
-    with open(json_filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2)
-    print(f"Raw data saved to {json_filename} for programmatic use")
-    
-    # Count and report statistics
-    total_sites = len(results)
-    sites_with_emails = sum(1 for r in results if r.get('emails'))
-    total_emails = sum(len(r.get('emails', [])) for r in results)
-    
-    # Save a summary report
-    summary_filename = "email_scraping_summary.txt"
-    with open(summary_filename, 'w', encoding='utf-8') as f:
-        f.write(f"Email Scraping Summary\n")
-        f.write(f"====================\n\n")
-        f.write(f"Date: {timestamp}\n")
-        f.write(f"Total websites scraped: {total_sites}\n")
-        
-        # Calculate percentage safely
-        email_percentage = sites_with_emails/total_sites*100 if total_sites > 0 else 0
-        f.write(f"Websites with emails: {sites_with_emails} ({email_percentage:.1f}%)\n")
-        
-        f.write(f"Total emails found: {total_emails}\n")
-        
-        # Count domain-matching emails
-        domain_match_emails = sum(r.get('metadata', {}).get('domain_matches', 0) for r in results)
-        domain_match_percentage = domain_match_emails/total_emails*100 if total_emails > 0 else 0
-        f.write(f"Domain-matching emails: {domain_match_emails} ({domain_match_percentage:.1f}%)\n")
-        
-        # Calculate averages safely
-        avg_per_site = total_emails/total_sites if total_sites > 0 else 0
-        avg_per_site_with_emails = total_emails/sites_with_emails if sites_with_emails > 0 else 0
-        
-        f.write(f"Average emails per website: {avg_per_site:.2f}\n")
-        f.write(f"Average emails per website with emails: {avg_per_site_with_emails:.2f}\n\n")
-        
-        # Write email breakdown by category
-        f.write(f"Email breakdown by category:\n")
-        all_categorized_emails = {}
-        for result in results:
-            metadata = result.get('metadata', {})
-            categorized = metadata.get('categorized_emails', {})
-            for category, emails in categorized.items():
-                if category not in all_categorized_emails:
-                    all_categorized_emails[category] = 0
-                all_categorized_emails[category] += len(emails)
-        
-        for category, count in sorted(all_categorized_emails.items(), key=lambda x: x[1], reverse=True):
-            percentage = count/total_emails*100 if total_emails > 0 else 0
-            f.write(f"- {category.title()}: {count} ({percentage:.1f}%)\n")
-        
-        f.write(f"\nTop domains with most emails:\n")
-        top_domains = sorted(results, key=lambda x: len(x.get('emails', [])), reverse=True)[:10]
-        for i, result in enumerate(top_domains, 1):
-            if result.get('emails'):
-                domain = urlparse(result['url']).netloc
-                f.write(f"{i}. {domain}: {len(result['emails'])} emails\n")
-    
-    print(f"Summary report saved to {summary_filename}")
+    if json_format == "json":
+        save_results_to_json(results)
 
-async def main():
+def save_url_list(urls, url_map=None, filename="google_urls.txt"):
+    """
+    Write URLs to a text file, one per line.
+    
+    Args:
+        urls (list): URLs to write
+        url_map (dict, optional): Original URLs and their canonical URLs, written to a
+            '_mapping.csv' file next to the text file
+        filename (str): Name of the text file
+    """
+    with open(filename, "w") as f:
+        for url in urls:
+            f.write(f"{url}\n")
+    logger.info("URLs saved", file=filename)
+    
+    if url_map is not None:
+        mapping_filename = filename.rsplit('.', 1)[0] + "_mapping.csv"
+        with open(mapping_filename, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['original_url', 'canonical_url'])
+            writer.writerows(url_map.items())
+        logger.info("URL mapping saved", file=mapping_filename, urls=len(url_map))
+
+def create_render_fallback(browsers=0, budget=120.0):
+    """
+    Create the browser tier for sites that render their emails with JavaScript.
+    
+    Args:
+        browsers (int): Maximum number of pages rendered at the same time, 0 disables the tier
+        budget (float): Seconds during which renders may start
+        
+    Returns:
+        RenderFallback: The tier, or None when it is disabled. The caller has to close() it.
+    """
+    if not browsers:
+        return None
+    # Selenium is only loaded when the tier is used
+    from render_fallback import RenderFallback
+    return RenderFallback(browsers, budget)
+
+async def run_interactive(metrics=None, strip_params=DEFAULT_STRIP_PARAMS, render_browsers=0, render_budget=120.0, deadline=None,
+                          proxy_pool=None, seen_filter=None):
+    """
+    Prompt for a search term and settings, then scrape the results and extract emails.
+    
+    Args:
+        metrics (ScrapeMetrics, optional): Live counters updated by both stages
+        strip_params (iterable): Query parameters removed before the URLs are deduplicated
+        render_browsers (int): Browsers that render sites without emails in the static HTML,
+            0 disables the tier. Not used with more than one worker process.
+        render_budget (float): Seconds during which renders may start
+        deadline (float, optional): Seconds the email extraction may take. Sites are then
+            extracted in order of expected emails per second and the rest is dropped at the
+            deadline. Not used with more than one worker process.
+        proxy_pool (ProxyPool, optional): Proxies for the browser and for the email extraction.
+            Not used for extraction with more than one worker process.
+        seen_filter (SeenFilter, optional): Emails and domains delivered by earlier runs
+    """
     search_term = input("Enter search term: ")
-    print(f"Searching for: {search_term}")
+    logger.info("Searching", query=search_term)
     
     # Ask for the number of search results to request
     try:
@@ -691,55 +923,225 @@ async def main():
         num_pages = 1
     
     # Get URLs from Google search results
-    urls = await scrape_google_urls(search_term, num_results, num_pages)
+    url_map = {}
+    urls = await scrape_google_urls(search_term, num_results, num_pages, metrics=metrics,
+                                    strip_params=strip_params, url_map=url_map, proxy_pool=proxy_pool)
     
-    print(f"\nFound {len(urls)} URLs:")
+    logger.info("Found URLs", count=len(urls))
     for i, url in enumerate(urls, 1):
-        print(f"{i}. {url}")
+        logger.info(url, rank=i)
     
     # Ask user if they want to proceed with email extraction
     proceed = input("\nDo you want to extract emails from these websites? (y/n): ").lower()
     
     if proceed == 'y':
+        # Ask for the number of worker processes to use
+        cpu_count = os.cpu_count() or 1
+        try:
+            num_workers = int(input(f"\nHow many worker processes do you want to use? (1-{cpu_count}, default 1): ") or 1)
+            num_workers = max(1, min(cpu_count, num_workers))  # Limit between 1 and the number of CPU cores
+        except ValueError:
+            num_workers = 1
+        
         # Use default values instead of prompting
         max_sites = None  # Check all sites by default
         max_concurrent = 15  # Default to 15 concurrent requests for good performance
         
-        print(f"\nUsing optimized default settings:")
-        print(f"- Checking all {len(urls)} websites")
-        print(f"- Using 15 concurrent requests for maximum speed")
-        print(f"- Checking up to 3 pages per website (main page + contact pages)")
-        print("\nStarting email extraction...")
+        logger.info("Starting email extraction", websites=len(urls), concurrency=max_concurrent,
+                    workers=num_workers, pages_per_site=3)
         
         # Start time
         start_time = time.time()
         
-        # Scrape websites for emails
-        results = await scrape_websites_for_emails(urls, max_sites, max_concurrent)
+        # Write the CSV files, JSONL output and Excel rows while the websites are being scraped.
+        # The workbook is saved in the background while the remaining outputs are written.
+        recorder = LatencyRecorder()
+        export = StreamingExport(excel_filename="google_results_with_emails.xlsx", excel_background=True,
+                                 latency_recorder=recorder)
+        
+        # Keep the results of every run in a queryable database as well
+        result_db = ResultDatabase("scraping_results.db", query=search_term)
+        render_fallback = create_render_fallback(render_browsers, render_budget) if num_workers == 1 else None
+        scheduler = PriorityScheduler(result_db.domain_stats()) if deadline is not None and num_workers == 1 else None
+        try:
+            # Scrape websites for emails
+            if num_workers > 1:
+                # The workers do not share the filter, so it is applied to their merged results
+                site_urls = seen_filter.filter_urls(urls) if seen_filter is not None else urls
+                results = await scrape_websites_sharded(site_urls, num_workers, max_sites, max_concurrent)
+                with profile_stage('export'):
+                    for result in results:
+                        if seen_filter is not None:
+                            seen_filter.apply(result)
+                        export.write(result)
+                        result_db.write(result)
+            else:
+                results = await scrape_websites_for_emails(urls, max_sites, max_concurrent, exporters=[export, result_db],
+                                                           recorder=recorder, metrics=metrics, render_fallback=render_fallback,
+                                                           deadline=deadline if num_workers == 1 else None, scheduler=scheduler,
+                                                           proxy_pool=proxy_pool, seen_filter=seen_filter)
+        finally:
+            if render_fallback is not None:
+                await render_fallback.close()
+            with profile_stage('export'):
+                export.close()
+                result_db.close()
         
         # Calculate elapsed time
         elapsed_time = time.time() - start_time
         
         # Count total emails found
-        total_emails = sum(len(result['emails']) for result in results)
-        print(f"\nTotal emails found: {total_emails}")
-        print(f"Time taken: {elapsed_time:.2f} seconds")
-        
-        # Save results to CSV
-        save_results_to_csv(results)
-        
-        # Also write URLs to a text file (original functionality)
-        with open("google_urls.txt", "w") as f:
-            for url in urls:
-                f.write(f"{url}\n")
-        print(f"URLs saved to google_urls.txt")
+        total_emails = sum(len(result.emails) for result in results)
+        logger.info("Email extraction finished", emails=total_emails, seconds=round(elapsed_time, 2))
+        
+        with profile_stage('export'):
+            # Save the raw results as JSON for programmatic use
+            save_results_to_json(results)
+            if recorder.stages:
+                recorder.save_json()
+            
+            # Also write URLs to a text file (original functionality)
+            save_url_list(urls, url_map)
+            
+            # Make sure the Excel workbook is complete
+            export.wait()
     else:
         # Just write URLs to a text file without scraping for emails
-        with open("google_urls.txt", "w") as f:
-            for url in urls:
-                f.write(f"{url}\n")
-        print(f"\nURLs saved to google_urls.txt")
+        save_url_list(urls, url_map)
+
+async def run_url_list(path, max_concurrent=15, max_sites=None, excel=False, metrics=None, render_browsers=0, render_budget=120.0,
+                       deadline=None, proxy_pool=None, seen_filter=None):
+    """
+    Extract emails from a list of URLs without searching Google first.
+    
+    The URLs are streamed from the file into scrape_websites_for_emails and the results are
+    streamed to the output files, so memory stays flat however long the list is. Selenium,
+    BeautifulSoup and openpyxl (unless excel is set) are never imported.
+    
+    Args:
+        path (str): File with one URL or domain per line, or '-' for stdin
+        max_concurrent (int): Maximum number of concurrent requests
+        max_sites (int, optional): Maximum number of sites to check. None means check all sites.
+        excel (bool): Also write the Excel workbook
+        metrics (ScrapeMetrics, optional): Live counters
+        render_browsers (int): Browsers that render sites without emails in the static HTML,
+            0 disables the tier
+        render_budget (float): Seconds during which renders may start
+        deadline (float, optional): Seconds the run may take. Sites are then extracted in order of
+            expected emails per second and the rest is dropped at the deadline.
+        proxy_pool (ProxyPool, optional): Spread the requests over these proxies
+        seen_filter (SeenFilter, optional): Emails and domains delivered by earlier runs
+    """
+    logger.info("Extracting emails from URL list", input='stdin' if path == '-' else path, concurrency=max_concurrent)
+    start_time = time.time()
+    
+    recorder = LatencyRecorder()
+    export = StreamingExport(excel_filename="google_results_with_emails.xlsx" if excel else None,
+                             latency_recorder=recorder)
+    result_db = ResultDatabase("scraping_results.db")
+    render_fallback = create_render_fallback(render_browsers, render_budget)
+    scheduler = PriorityScheduler(result_db.domain_stats()) if deadline is not None else None
+    try:
+        await scrape_websites_for_emails(stream_url_lines(path), max_sites, max_concurrent, exporters=[export, result_db],
+                                         keep_results=False, recorder=recorder, metrics=metrics, render_fallback=render_fallback,
+                                         deadline=deadline, scheduler=scheduler, proxy_pool=proxy_pool, seen_filter=seen_filter)
+    finally:
+        if render_fallback is not None:
+            await render_fallback.close()
+        with profile_stage('export'):
+            export.close()
+            result_db.close()
+    
+    with profile_stage('export'):
+        if recorder.stages:
+            recorder.save_json()
+        export.wait()
+    
+    logger.info("Email extraction finished", sites=export.summary.total_sites, emails=export.summary.total_emails,
+                seconds=round(time.time() - start_time, 2))
+
+def parse_args(argv=None):
+    """Parse the command line options of the interactive scraper."""
+    parser = argparse.ArgumentParser(description="Scrape Google search results and extract emails from the websites found")
+    parser.add_argument('--urls', help="Skip the Google search and the prompts, and extract emails from the URLs or "
+                                       "domains in this file (one per line, '-' for stdin)")
+    parser.add_argument('--concurrency', type=int, default=15, help="Concurrent requests with --urls (default: 15)")
+    parser.add_argument('--max-sites', type=int, help="Maximum number of sites to check with --urls (default: all)")
+    parser.add_argument('--excel', action='store_true', help="Also write the Excel workbook with --urls")
+    parser.add_argument('--render-browsers', type=int, default=0,
+                        help="Render sites that return HTML but no emails in up to this many headless browsers "
+                             "(default: 0, disabled)")
+    parser.add_argument('--render-budget', type=float, default=120.0,
+                        help="Seconds during which renders may start, later sites are not rendered (default: 120)")
+    parser.add_argument('--deadline', type=float,
+                        help="Seconds the email extraction may take. Sites are extracted in order of expected emails "
+                             "per second, and the sites left at the deadline are dropped (default: no deadline)")
+    parser.add_argument('--proxies', help="File with one proxy URL per line (http://[user:password@]host:port). Requests "
+                                          "are spread over the proxies by health, and failing proxies are ejected for a while")
+    parser.add_argument('--max-per-proxy', type=int, default=8, help="Requests in flight per proxy (default: 8)")
+    parser.add_argument('--seen-filter', help="Bloom filter file of the emails and domains delivered by earlier runs, created "
+                                              "if needed. Emails found before are listed under 'seen_emails' in the metadata.")
+    parser.add_argument('--seen-capacity', type=int, default=10_000_000,
+                        help="Emails and domains a new seen filter is sized for (default: 10000000)")
+    parser.add_argument('--seen-fp-rate', type=float, default=0.001,
+                        help="False positive rate of a new seen filter at its capacity (default: 0.001)")
+    parser.add_argument('--suppress-seen', action='store_true', help="Remove the emails found before from the results")
+    parser.add_argument('--skip-seen-domains', action='store_true', help="Do not fetch the sites of domains found before")
+    parser.add_argument('--strip-param', action='append', default=[],
+                        help="Also remove this query parameter (wildcards allowed) before URLs are deduplicated, "
+                             "on top of the tracking parameters in url_utils.DEFAULT_STRIP_PARAMS. Can be repeated.")
+    parser.add_argument('--metrics-port', type=int, help="Serve live metrics in Prometheus format on this local port")
+    parser.add_argument('--stats-file', help="Append a JSON stats snapshot to this file periodically")
+    parser.add_argument('--stats-interval', type=float, default=5.0, help="Seconds between stats snapshots (default: 5)")
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'sample'],
+                        help="Profile each pipeline stage, deterministically (cprofile, the default) or by sampling the stack")
+    parser.add_argument('--profile-dir', default='profiles', help="Directory for the per-stage profiles (default: profiles)")
+    parser.add_argument('--profile-top', type=int, default=10, help="Hot functions to show per stage (default: 10)")
+    add_logging_arguments(parser)
+    return parser.parse_args(argv)
+
+async def main(args=None):
+    if args is None:
+        args = parse_args([])
+    
+    # Start the optional metrics endpoint and stats stream
+    metrics = ScrapeMetrics() if args.metrics_port or args.stats_file else None
+    services = []
+    if args.metrics_port:
+        services.append(MetricsServer(metrics, port=args.metrics_port))
+    if args.stats_file:
+        services.append(StatsWriter(metrics, args.stats_file, args.stats_interval))
+    for service in services:
+        await service.start()
+    
+    # Profile the pipeline stages when requested
+    if args.profile:
+        start_profiling(args.profile, args.profile_dir)
+    
+    proxy_pool = ProxyPool.from_file(args.proxies, max_per_proxy=args.max_per_proxy) if args.proxies else None
+    seen_filter = None
+    if args.seen_filter:
+        seen_filter = SeenFilter(args.seen_filter, args.seen_capacity, args.seen_fp_rate,
+                                 suppress=args.suppress_seen, skip_domains=args.skip_seen_domains)
+    
+    try:
+        if args.urls:
+            await run_url_list(args.urls, args.concurrency, args.max_sites, args.excel, metrics,
+                               args.render_browsers, args.render_budget, args.deadline, proxy_pool, seen_filter)
+        else:
+            await run_interactive(metrics, DEFAULT_STRIP_PARAMS + tuple(args.strip_param),
+                                  args.render_browsers, args.render_budget, args.deadline, proxy_pool, seen_filter)
+    finally:
+        if seen_filter is not None:
+            seen_filter.close()
+        if args.profile:
+            stop_profiling(args.profile_top)
+        for service in services:
+            await service.stop()
 
 if __name__ == "__main__":
+    args = parse_args()
+    configure_logging(args.log_level, args.log_format, args.quiet, args.log_file)
+    
     # Run the async main function
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main(args)) 
\ No newline at end of file
@@ -0,0 +1,449 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+from async_google_scraper import (build_chrome_options, create_chrome_driver, scrape_google_urls, scrape_websites_for_emails,
+                                  save_results_to_json, save_url_list)
+from url_utils import DEFAULT_STRIP_PARAMS
+from scheduler import PriorityScheduler
+from proxy_pool import ProxyPool
+from seen_filter import SeenFilter
+from exporters import StreamingExport
+from results_db import ResultDatabase
+from request_timing import LatencyRecorder, create_trace_config
+from scraper_logging import get_logger, configure_logging, add_logging_arguments
+
+logger = get_logger(__name__)
+
+# Settings of a batch run. The config file and the command line options override them in that order.
+DEFAULT_SETTINGS = {
+    'pages': 1,                    # Google results pages per query (1-10)
+    'results': 100,                # Results per page (10-100)
+    'concurrency': 15,             # Concurrent requests during email extraction
+    'max_sites': None,             # Websites to check per query, None for all
+    'extract': True,               # Extract emails, or only collect the URLs
+    'output_dir': 'batch_output',  # One subdirectory per query is created here
+    'json_format': 'json',         # 'json' also writes search_results.json, 'jsonl' only the JSONL file
+    'jsonl_compression': None,     # 'gzip' or 'zstd'
+    'parquet': False,              # Also write search_results.parquet (requires pyarrow)
+    'database': 'scraping_results.db',  # Results database, relative to output_dir. Empty to disable.
+    'cache': True,                 # Reuse the results of URLs already checked for an earlier query
+    'dns_cache_ttl': 300,          # Seconds the shared session caches DNS lookups, 0 to disable
+    'query_delay': 5.0,            # Seconds between queries, to avoid being detected as a bot
+    'save_html': False,            # Save the first results page of every query for debugging
+    'strip_params': [],            # Query parameters removed before deduplicating, on top of DEFAULT_STRIP_PARAMS
+    'render_browsers': 0,          # Browsers that render sites without emails in the static HTML, 0 to disable
+    'render_budget': 120.0,        # Seconds per query during which renders may start
+    'deadline': None,              # Seconds the whole batch may take, None for no deadline
+    'proxies': None,               # File with one proxy URL per line, used by the browser and the extraction
+    'max_per_proxy': 8,            # Requests in flight per proxy
+    'seen_filter': None,           # Bloom filter of the emails and domains delivered before, relative to output_dir
+    'seen_capacity': 10000000,     # Emails and domains a new seen filter is sized for
+    'seen_fp_rate': 0.001,         # False positive rate of a new seen filter at its capacity
+    'suppress_seen': False,        # Remove the emails delivered before instead of flagging them
+    'skip_seen_domains': False,    # Do not fetch the sites of domains delivered before
+}
+
+def load_config(path):
+    """
+    Load batch settings from a JSON file.
+
+    Args:
+        path (str): JSON file with an object of settings, see DEFAULT_SETTINGS
+
+    Returns:
+        dict: The settings found in the file
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: expected a JSON object of settings")
+    unknown = sorted(set(config) - set(DEFAULT_SETTINGS))
+    if unknown:
+        raise ValueError(f"{path}: unknown settings: {', '.join(unknown)}")
+    return config
+
+def resolve_settings(config=None, overrides=None):
+    """
+    Merge the default settings, the config file and the command line options.
+
+    Args:
+        config (dict, optional): Settings from load_config
+        overrides (dict, optional): Settings from the command line. None values are ignored.
+
+    Returns:
+        dict: The complete settings
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config or {})
+    settings.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    settings['pages'] = max(1, min(10, int(settings['pages'])))
+    settings['results'] = max(10, min(100, int(settings['results'])))
+    return settings
+
+def parse_query_line(line, pages=1, results=100):
+    """
+    Parse one line of a query file.
+
+    A line is either a JSON object such as {"query": "plumbers amsterdam", "pages": 2, "results": 50},
+    or the query text, optionally followed by tab-separated pages and results.
+
+    Args:
+        line (str): The line without the newline
+        pages (int): Pages when the line does not set them
+        results (int): Results per page when the line does not set them
+
+    Returns:
+        dict: The query with its 'query', 'pages' and 'results'
+    """
+    if line.lstrip().startswith('{'):
+        entry = json.loads(line)
+        query = str(entry.get('query', '')).strip()
+        pages = entry.get('pages', pages)
+        results = entry.get('results', results)
+    else:
+        fields = line.split('\t')
+        query = fields[0].strip()
+        if len(fields) > 1 and fields[1].strip():
+            pages = fields[1]
+        if len(fields) > 2 and fields[2].strip():
+            results = fields[2]
+    if not query:
+        raise ValueError("empty query")
+    return {
+        'query': query,
+        'pages': max(1, min(10, int(pages))),
+        'results': max(10, min(100, int(results))),
+    }
+
+def read_queries(path, pages=1, results=100):
+    """
+    Read queries, one per line, from a file or '-' for stdin.
+
+    Empty lines and lines starting with '#' are skipped, and so are lines that
+    cannot be parsed, with a warning.
+
+    Returns:
+        list: Query dictionaries from parse_query_line
+    """
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    queries = []
+    try:
+        for line_number, line in enumerate(handle, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            try:
+                queries.append(parse_query_line(line, pages, results))
+            except ValueError as e:
+                logger.warning("Skipping invalid query line", line=line_number, error=str(e))
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return queries
+
+def query_directory_name(index, query):
+    """Return the output subdirectory name of a query, such as '001-plumbers-amsterdam'."""
+    slug = re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')[:60]
+    return f"{index:03d}-{slug or 'query'}"
+
+class ResultCache:
+    """
+    Results of the URLs already checked in this batch, shared by all queries.
+
+    Passed to scrape_websites_for_emails as an exporter, so every result is stored as
+    soon as its site is done.
+    """
+
+    def __init__(self):
+        self.results = {}
+
+    def write(self, result, domain=None):
+        self.results[result.url] = result
+
+    def get(self, url):
+        return self.results.get(url)
+
+async def run_query(entry, directory, settings, driver, session, cache=None, recorder=None, render_pool=None, deadline=None,
+                    proxy_pool=None, seen_filter=None):
+    """
+    Search one query and extract the emails of the websites found.
+
+    Args:
+        entry (dict): Query from parse_query_line
+        directory (str): Output directory of the query, created if needed
+        settings (dict): Batch settings from resolve_settings
+        driver (WebDriver): Shared browser for the search
+        session (aiohttp.ClientSession): Shared session for the email extraction
+        cache (ResultCache, optional): Results of URLs checked for earlier queries
+        recorder (LatencyRecorder, optional): Latency recorder of the shared session
+        render_pool (BrowserPool, optional): Shared browsers of the render fallback, which is
+            used when this is set
+        deadline (float, optional): Seconds the email extraction may take. Sites are then
+            extracted in order of expected emails per second.
+        proxy_pool (ProxyPool, optional): Proxies for the email extraction
+        seen_filter (SeenFilter, optional): Emails and domains delivered by earlier runs. Results
+            taken from the cache were already checked for an earlier query.
+
+    Returns:
+        dict: Summary of the query
+    """
+    os.makedirs(directory, exist_ok=True)
+    start_time = time.time()
+    summary = {'query': entry['query'], 'pages': entry['pages'], 'results': entry['results'],
+               'directory': directory, 'urls': 0, 'sites': 0, 'cached': 0, 'emails': 0}
+
+    debug_html = os.path.join(directory, "google_source.html") if settings['save_html'] else None
+    url_map = {}
+    search_start = time.time()
+    urls = await scrape_google_urls(entry['query'], entry['results'], entry['pages'], driver=driver, debug_html=debug_html,
+                                    strip_params=DEFAULT_STRIP_PARAMS + tuple(settings['strip_params']), url_map=url_map)
+    summary['urls'] = len(urls)
+    summary['search_seconds'] = round(time.time() - search_start, 2)
+    save_url_list(urls, url_map, os.path.join(directory, "google_urls.txt"))
+
+    if settings['extract'] and urls:
+        if settings['max_sites']:
+            urls = urls[:settings['max_sites']]
+
+        # Write the outputs of this query while its websites are being scraped
+        export = StreamingExport(os.path.join(directory, "google_results_with_emails.csv"),
+                                 emails_only_filename=os.path.join(directory, "emails_only.csv"),
+                                 jsonl_filename=os.path.join(directory, "search_results.jsonl"),
+                                 summary_filename=os.path.join(directory, "email_scraping_summary.txt"),
+                                 excel_filename=os.path.join(directory, "google_results_with_emails.xlsx"),
+                                 parquet_filename=os.path.join(directory, "search_results.parquet") if settings['parquet'] else None,
+                                 jsonl_compression=settings['jsonl_compression'], excel_background=True)
+        exporters = [export]
+        database = None
+        if settings['database']:
+            database = ResultDatabase(os.path.join(settings['output_dir'], settings['database']), query=entry['query'])
+            exporters.append(database)
+        scheduler = None
+        if deadline is not None:
+            scheduler = PriorityScheduler(database.domain_stats() if database is not None else None)
+
+        # Sites already checked for an earlier query are not fetched again
+        cached_results = []
+        new_urls = urls
+        if cache is not None:
+            new_urls = []
+            for url in urls:
+                cached = cache.get(url)
+                if cached is None:
+                    new_urls.append(url)
+                else:
+                    cached_results.append(cached)
+            exporters.append(cache)
+
+        keep_results = settings['json_format'] == 'json'
+        render_fallback = None
+        if render_pool is not None:
+            from render_fallback import RenderFallback
+            render_fallback = RenderFallback(settings['render_browsers'], settings['render_budget'], pool=render_pool)
+        try:
+            for result in cached_results:
+                for exporter in exporters:
+                    exporter.write(result)
+            results = await scrape_websites_for_emails(new_urls, None, settings['concurrency'], exporters=exporters,
+                                                       keep_results=keep_results, recorder=recorder, session=session,
+                                                       render_fallback=render_fallback, deadline=deadline, scheduler=scheduler,
+                                                       proxy_pool=proxy_pool, seen_filter=seen_filter)
+        finally:
+            for exporter in exporters:
+                if exporter is not cache:
+                    exporter.close()
+
+        if keep_results:
+            save_results_to_json(cached_results + results, os.path.join(directory, "search_results.json"))
+        export.wait()
+
+        summary['sites'] = len(urls)
+        summary['cached'] = len(cached_results)
+        summary['emails'] = export.summary.total_emails
+        if scheduler is not None:
+            summary['dropped'] = scheduler.queued()
+        if render_fallback is not None:
+            summary['rendered'] = render_fallback.rendered
+            summary['render_skipped'] = render_fallback.skipped
+
+    summary['seconds'] = round(time.time() - start_time, 2)
+    return summary
+
+async def _start_browser(proxy_pool=None):
+    """Start the shared browser, behind a proxy of the pool if there is one. Returns (driver, proxy)."""
+    proxy = await proxy_pool.acquire(browser=True) if proxy_pool is not None else None
+    try:
+        driver = create_chrome_driver(build_chrome_options(proxy=proxy.address) if proxy is not None else None)
+    except Exception:
+        if proxy is not None:
+            await proxy_pool.release(proxy)
+        raise
+    return driver, proxy
+
+async def _close_browser(driver, proxy=None, proxy_pool=None):
+    """Quit the shared browser and return its proxy to the pool."""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug("Could not terminate browser process cleanly", error=type(e).__name__)
+    if proxy is not None:
+        await proxy_pool.release(proxy)
+
+async def run_batch(queries, settings):
+    """
+    Run several queries in one process, sharing one browser, one HTTP session and the result cache.
+
+    A query that fails is logged and recorded in the batch summary, and the batch continues
+    with the next query (in a new browser, in case the old one crashed).
+
+    Args:
+        queries (list): Query dictionaries from read_queries
+        settings (dict): Batch settings from resolve_settings
+
+    Returns:
+        list: Summary dictionary of every query
+    """
+    output_dir = settings['output_dir']
+    os.makedirs(output_dir, exist_ok=True)
+    deadline_at = time.monotonic() + settings['deadline'] if settings['deadline'] is not None else None
+    recorder = LatencyRecorder()
+    cache = ResultCache() if settings['cache'] else None
+    summaries = []
+
+    dns_cache_ttl = settings['dns_cache_ttl']
+    connector = aiohttp.TCPConnector(use_dns_cache=bool(dns_cache_ttl), ttl_dns_cache=dns_cache_ttl or None)
+    proxy_pool = ProxyPool.from_file(settings['proxies'], max_per_proxy=settings['max_per_proxy']) if settings['proxies'] else None
+    seen_filter = None
+    if settings['extract'] and settings['seen_filter']:
+        seen_filter = SeenFilter(os.path.join(output_dir, settings['seen_filter']), settings['seen_capacity'],
+                                 settings['seen_fp_rate'], suppress=settings['suppress_seen'],
+                                 skip_domains=settings['skip_seen_domains'])
+    driver = None
+    proxy = None  # Proxy of the browser
+    render_pool = None
+    if settings['extract'] and settings['render_browsers']:
+        # Browsers of the render fallback are started on demand and shared by all queries
+        from browser_pool import BrowserPool
+        render_pool = BrowserPool(settings['render_browsers'])
+    try:
+        async with aiohttp.ClientSession(connector=connector, trace_configs=[create_trace_config(recorder)]) as session:
+            for index, entry in enumerate(queries, 1):
+                directory = os.path.join(output_dir, query_directory_name(index, entry['query']))
+                delay = settings['query_delay'] or 0 if index > 1 else 0
+                if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                    logger.warning("Deadline reached, skipping query", query=entry['query'])
+                    summaries.append({'query': entry['query'], 'directory': directory, 'skipped': 'deadline'})
+                    continue
+                if delay:
+                    await asyncio.sleep(delay)
+                logger.info("Running query", query=entry['query'], number=f"{index}/{len(queries)}",
+                            pages=entry['pages'], results=entry['results'])
+                try:
+                    if driver is None:
+                        driver, proxy = await _start_browser(proxy_pool)
+                    summary = await run_query(entry, directory, settings, driver, session, cache, recorder, render_pool,
+                                              deadline=max(0, deadline_at - time.monotonic()) if deadline_at is not None else None,
+                                              proxy_pool=proxy_pool, seen_filter=seen_filter)
+                except Exception as e:
+                    logger.error("Query failed", query=entry['query'], error=str(e) or type(e).__name__)
+                    summary = {'query': entry['query'], 'directory': directory, 'error': str(e) or type(e).__name__}
+                    if driver is not None:
+                        if proxy is not None:
+                            proxy_pool.record(proxy, 0, failed=True)
+                        await _close_browser(driver, proxy, proxy_pool)
+                        driver = proxy = None
+                else:
+                    logger.info("Query finished", query=entry['query'], urls=summary['urls'], sites=summary['sites'],
+                                cached=summary['cached'], emails=summary['emails'], seconds=summary['seconds'])
+                    # A search without results through a proxy is most likely a CAPTCHA page.
+                    # The browser moves to another proxy when its proxy gets ejected.
+                    if proxy is not None:
+                        proxy_pool.record(proxy, summary['search_seconds'], failed=summary['urls'] == 0)
+                        if proxy_pool.is_ejected(proxy):
+                            await _close_browser(driver, proxy, proxy_pool)
+                            driver = proxy = None
+                summaries.append(summary)
+    finally:
+        if seen_filter is not None:
+            seen_filter.close()
+        if render_pool is not None:
+            await render_pool.close()
+        if driver is not None:
+            await _close_browser(driver, proxy, proxy_pool)
+    if proxy_pool is not None:
+        proxy_pool.log_stats()
+
+    if recorder.stages:
+        recorder.save_json(os.path.join(output_dir, "latency_report.json"))
+    summary_file = os.path.join(output_dir, "batch_summary.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'queries': summaries}, f, indent=2)
+    logger.info("Batch finished", queries=len(summaries), failed=sum(1 for summary in summaries if 'error' in summary),
+                summary=summary_file)
+    return summaries
+
+def parse_args(argv=None):
+    """Parse the command line options of the batch scraper."""
+    parser = argparse.ArgumentParser(description="Run many Google searches and email extractions without prompts")
+    parser.add_argument('queries', help="File with one query per line, or '-' for stdin. A line is the query, optionally "
+                                        "followed by tab-separated pages and results, or a JSON object with "
+                                        "'query', 'pages' and 'results'")
+    parser.add_argument('--config', help="JSON file with settings, overridden by the options below")
+    parser.add_argument('--pages', type=int, help="Default results pages per query (default: 1)")
+    parser.add_argument('--results', type=int, help="Default results per page (default: 100)")
+    parser.add_argument('--concurrency', type=int, help="Concurrent requests during email extraction (default: 15)")
+    parser.add_argument('--max-sites', type=int, help="Websites to check per query (default: all)")
+    parser.add_argument('--no-extract', dest='extract', action='store_const', const=False,
+                        help="Only collect the URLs, do not extract emails")
+    parser.add_argument('--output-dir', help="Output directory, with one subdirectory per query (default: batch_output)")
+    parser.add_argument('--json-format', choices=['json', 'jsonl'], help="Also write search_results.json (json, the default) "
+                                                                         "or only the streamed JSONL file (jsonl)")
+    parser.add_argument('--jsonl-compression', choices=['gzip', 'zstd'], help="Compress the JSONL files")
+    parser.add_argument('--parquet', action='store_const', const=True, help="Also write search_results.parquet")
+    parser.add_argument('--database', help="Results database, relative to the output directory (default: scraping_results.db)")
+    parser.add_argument('--no-database', dest='database', action='store_const', const='', help="Do not write a results database")
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=False,
+                        help="Check websites again when they are found by several queries")
+    parser.add_argument('--dns-cache-ttl', type=int, help="Seconds DNS lookups are cached, 0 to disable (default: 300)")
+    parser.add_argument('--query-delay', type=float, help="Seconds between queries (default: 5)")
+    parser.add_argument('--save-html', action='store_const', const=True, help="Save the first results page of every query")
+    parser.add_argument('--strip-param', dest='strip_params', action='append',
+                        help="Also remove this query parameter (wildcards allowed) before URLs are deduplicated. Can be repeated.")
+    parser.add_argument('--render-browsers', type=int,
+                        help="Render sites that return HTML but no emails in up to this many headless browsers (default: 0)")
+    parser.add_argument('--deadline', type=float, help="Seconds the whole batch may take. Sites are extracted in order of "
+                                                       "expected emails per second and later queries are skipped")
+    parser.add_argument('--proxies', help="File with one proxy URL per line, for the browser and the email extraction")
+    parser.add_argument('--max-per-proxy', type=int, help="Requests in flight per proxy (default: 8)")
+    parser.add_argument('--render-budget', type=float, help="Seconds per query during which renders may start (default: 120)")
+    parser.add_argument('--seen-filter', help="Bloom filter of the emails and domains delivered by earlier runs, relative to "
+                                              "the output directory. Emails found before are flagged as 'seen_emails'.")
+    parser.add_argument('--seen-capacity', type=int, help="Emails and domains a new seen filter is sized for (default: 10000000)")
+    parser.add_argument('--seen-fp-rate', type=float, help="False positive rate of a new seen filter (default: 0.001)")
+    parser.add_argument('--suppress-seen', action='store_const', const=True, help="Remove the emails found before from the results")
+    parser.add_argument('--skip-seen-domains', action='store_const', const=True,
+                        help="Do not fetch the sites of domains found before")
+    add_logging_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_level, args.log_format, args.quiet, args.log_file)
+
+    config = load_config(args.config) if args.config else None
+    settings = resolve_settings(config, {key: getattr(args, key) for key in DEFAULT_SETTINGS})
+    queries = read_queries(args.queries, settings['pages'], settings['results'])
+    if not queries:
+        logger.error("No queries to run", input=args.queries)
+        return 1
+
+    summaries = asyncio.run(run_batch(queries, settings))
+    return 1 if any('error' in summary for summary in summaries) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
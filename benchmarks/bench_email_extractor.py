@@ -0,0 +1,182 @@
+"""
+Throughput benchmark of the email extractor on a synthetic page corpus.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_email_extractor --pages 200 --json extractor_bench.jsonl
+
+Each corpus is scanned by email_extractor.extract_emails and, for comparison, by the
+validation chain that used to be inlined in extract_emails_from_url (with its list
+based duplicate check). Both must find the same emails.
+"""
+import re
+import json
+import base64
+import time
+import random
+import argparse
+from email_extractor import find_candidates, extract_emails
+from benchmarks.bench_utils import git_revision
+
+LEGACY_TLDS = ['com', 'org', 'net', 'edu', 'io', 'gov', 'co', 'info', 'biz', 'de', 'uk', 'fr', 'es', 'it', 'nl']
+
+def legacy_extract(text):
+    """The validation chain as it was inlined in extract_emails_from_url."""
+    emails = []
+    for email in re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text):
+        if (
+            '.' in email and
+            '@' in email and
+            not email.endswith('.png') and
+            not email.endswith('.jpg') and
+            not email.endswith('.gif') and
+            not email.endswith('.svg') and
+            not email.endswith('.js') and
+            not email.endswith('.css') and
+            len(email) < 100 and
+            len(email) > 5
+        ):
+            parts = email.split('@')
+            if len(parts) == 2:
+                username, domain_part = parts
+                if len(username) > 1 and '.' in domain_part and domain_part.split('.')[-1] in LEGACY_TLDS:
+                    email = email.lower()
+                    if email not in emails:
+                        emails.append(email)
+    return emails
+
+IMPLEMENTATIONS = [
+    ('extract_emails', extract_emails),
+    ('legacy', legacy_extract),
+]
+
+FILLER = ("<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+          "incididunt ut labore et dolore magna aliqua.</p>\n")
+
+def _retina_noise(rng):
+    name = rng.choice(['logo', 'icon', 'hero', 'banner', 'avatar', 'sprite'])
+    return (f'<img src="/img/{name}-{rng.randrange(10000)}@2x.png" '
+            f'srcset="/img/{name}@1x.png 1x, /img/{name}@2x.png 2x, /img/{name}@3x.webp 3x">\n')
+
+def _other_noise(rng):
+    return rng.choice([
+        '<style>@media (max-width: 600px) { .nav { display: none } } @import url("x.css");</style>\n',
+        f'<script src="/static/vendor@{rng.randrange(9)}.{rng.randrange(20)}.{rng.randrange(9)}.js"></script>\n',
+        f'<p>Follow us @company{rng.randrange(100)} on social media</p>\n',
+        f'<a href="git@github.com:org/repo{rng.randrange(100)}.git">source</a>\n',
+    ])
+
+def build_page(rng, size, emails=3, retina=50, noise=20, unique_emails=0, duplicate_emails=0, inline_image=0):
+    """
+    Build one synthetic HTML page of roughly size bytes.
+
+    Args:
+        rng (random.Random): Random source
+        size (int): Approximate page size in bytes
+        emails (int): Real contact emails spread over the page
+        retina (int): Retina image tags with '@2x.png' style names
+        noise (int): Other '@' strings (CSS at-rules, versioned scripts, handles, git URLs)
+        unique_emails (int): Extra distinct valid emails, such as a staff directory
+        duplicate_emails (int): Extra repetitions of the same few emails
+        inline_image (int): Size in bytes of an inline base64 image, 0 for none
+    """
+    parts = [f'<a href="mailto:{local}@example{rng.randrange(50)}.com">{local}</a>\n'
+             for local in rng.choices(['info', 'sales', 'support', 'jane.doe', 'office'], k=emails)]
+    parts += [_retina_noise(rng) for _ in range(retina)]
+    parts += [_other_noise(rng) for _ in range(noise)]
+    parts += [f'<td>staff{index}@example-corp.com</td>\n' for index in range(unique_emails)]
+    parts += [f'<span>contact@example{index % 3}.org</span>\n' for index in range(duplicate_emails)]
+    if inline_image:
+        data = base64.b64encode(rng.randbytes(inline_image * 3 // 4)).decode('ascii')
+        parts.append(f'<img src="data:image/png;base64,{data}">\n')
+
+    used = sum(len(part) for part in parts)
+    if used < size:
+        parts += [FILLER] * ((size - used) // len(FILLER) + 1)
+    rng.shuffle(parts)
+    return '<html><body>\n' + ''.join(parts) + '</body></html>'
+
+def build_corpora(pages=200, page_size=50000, seed=1):
+    """
+    Build the benchmark corpora.
+
+    Returns:
+        list: (name, description, list of pages) tuples
+    """
+    rng = random.Random(seed)
+    return [
+        ('typical', "Pages with a few emails and some '@' noise",
+         [build_page(rng, page_size, emails=3, retina=10, noise=5) for _ in range(pages)]),
+        ('no_at', "Pages without any '@'",
+         [build_page(rng, page_size, emails=0, retina=0, noise=0) for _ in range(pages)]),
+        ('retina_heavy', "Image galleries with thousands of '@2x.png' names",
+         [build_page(rng, page_size * 4, emails=2, retina=2000, noise=200) for _ in range(max(1, pages // 10))]),
+        ('directory', "Staff directories with thousands of distinct emails",
+         [build_page(rng, page_size * 4, emails=0, retina=0, noise=0, unique_emails=5000) for _ in range(max(1, pages // 20))]),
+        ('duplicates', "Pages repeating the same emails thousands of times",
+         [build_page(rng, page_size * 4, emails=0, retina=0, noise=0, duplicate_emails=5000) for _ in range(max(1, pages // 10))]),
+        ('inline_base64', "Pages with a 20 KB inline base64 image",
+         [build_page(rng, page_size, emails=2, retina=0, noise=0, inline_image=20000) for _ in range(max(1, pages // 50))]),
+    ]
+
+def benchmark_corpus(pages, func, repeat=3):
+    """
+    Time an extractor over a list of pages.
+
+    Returns:
+        dict: Best time, MB/s, regex hits/s and number of emails found
+    """
+    total_bytes = sum(len(page) for page in pages)
+    hits = sum(len(find_candidates(page)) for page in pages)
+    best = None
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = sum(len(func(page)) for page in pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'seconds': round(best, 4),
+        'mb_per_second': round(total_bytes / best / 1e6, 1) if best else None,
+        'hits': hits,
+        'hits_per_second': round(hits / best) if best else None,
+        'emails': found,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the email extractor on synthetic pages")
+    parser.add_argument('--pages', type=int, default=200, help="Pages in the typical corpus (default: 200)")
+    parser.add_argument('--page-size', type=int, default=50000, help="Typical page size in bytes (default: 50000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per measurement, the best is reported (default: 3)")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed of the corpus")
+    parser.add_argument('--json', help="Append the report as one JSON line to this file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{'corpus':<14} {'implementation':<16} {'MB':>7} {'seconds':>9} {'MB/s':>8} {'hits/s':>11} {'emails':>8}")
+    for name, description, pages in build_corpora(args.pages, args.page_size, args.seed):
+        megabytes = sum(len(page) for page in pages) / 1e6
+        emails = None
+        for implementation, func in IMPLEMENTATIONS:
+            result = benchmark_corpus(pages, func, args.repeat)
+            if emails is not None and result['emails'] != emails:
+                raise AssertionError(f"{implementation} found {result['emails']} emails in '{name}', expected {emails}")
+            emails = result['emails']
+            rows.append(dict(result, corpus=name, implementation=implementation, megabytes=round(megabytes, 2)))
+            print(f"{name:<14} {implementation:<16} {megabytes:>7.1f} {result['seconds']:>9.4f} "
+                  f"{result['mb_per_second']:>8} {result['hits_per_second']:>11} {result['emails']:>8}")
+
+    if args.json:
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'pages': args.pages,
+            'page_size': args.page_size,
+            'seed': args.seed,
+            'results': rows,
+        }
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + '\n')
+
+if __name__ == "__main__":
+    main()
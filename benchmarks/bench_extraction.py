@@ -0,0 +1,197 @@
+"""
+End-to-end benchmark of the email extraction stage against a local website farm.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extraction --sites 2000 --concurrency 50 --json bench.json
+
+The farm runs in its own process, so the reported CPU time and peak RSS belong to
+the scraper alone. With --proxies, the requests go through local stand-in proxies
+(also in their own process) and the report includes the health of every proxy:
+
+    python -m benchmarks.bench_extraction --proxies 4 --bad-proxies 1 --dead-proxies 1
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import socket
+import multiprocessing
+from async_google_scraper import scrape_websites_for_emails
+from proxy_pool import ProxyPool
+from scraper_logging import get_logger, configure_logging, add_logging_arguments
+from benchmarks.site_farm import FarmConfig, FarmConnector, build_sites, run_farm_process
+from benchmarks.stub_proxy import run_proxy_process
+from benchmarks.bench_utils import git_revision, peak_rss_mb
+
+logger = get_logger(__name__)
+
+def score_results(sites, results):
+    """
+    Compare the scraped emails with the emails seeded in the farm.
+
+    Error sites can never be scraped, so they are left out of the expected emails
+    and counted separately.
+
+    Returns:
+        dict: Expected, found and unexpected email counts, recall and error sites
+    """
+    expected = {site.url: set(site.emails) for site in sites if not site.error}
+    expected_count = sum(len(emails) for emails in expected.values())
+    found = 0
+    unexpected = 0
+    for result in results:
+        site_emails = expected.get(result.url, set())
+        for email in result.emails:
+            if email in site_emails:
+                found += 1
+            else:
+                unexpected += 1
+    return {
+        'expected_emails': expected_count,
+        'found_emails': found,
+        'unexpected_emails': unexpected,
+        'recall': round(found / expected_count, 4) if expected_count else 1.0,
+        'error_sites': sum(1 for site in sites if site.error),
+    }
+
+def _unused_port():
+    """Return a local port nobody listens on, for a proxy that refuses connections."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def run_benchmark(config, max_concurrent=10, connection_limit=100, proxies=None, dead_proxies=0, max_per_proxy=8):
+    """
+    Start the farm, scrape every site once and measure the run.
+
+    Args:
+        config (FarmConfig): Shape of the website farm
+        max_concurrent (int): Passed to scrape_websites_for_emails
+        connection_limit (int): Connection pool size of the aiohttp connector
+        proxies (list, optional): (latency, failure_rate) of each stand-in proxy to route
+            the requests through
+        dead_proxies (int): Proxies in the pool that refuse every connection
+        max_per_proxy (int): Requests in flight per proxy
+
+    Returns:
+        dict: The benchmark report
+    """
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    stop_event = context.Event()
+    farm = context.Process(target=run_farm_process, args=(config, port_queue, stop_event), daemon=True)
+    farm.start()
+    proxy_process = None
+    proxy_pool = None
+
+    try:
+        loop = asyncio.get_running_loop()
+        port = await loop.run_in_executor(None, port_queue.get, True, 30)
+        sites = build_sites(config)
+        urls = [site.url for site in sites]
+        logger.info("Site farm started", sites=len(sites), port=port)
+
+        if proxies or dead_proxies:
+            proxy_ports = []
+            if proxies:
+                proxy_process = context.Process(target=run_proxy_process, args=(port, proxies, port_queue, stop_event), daemon=True)
+                proxy_process.start()
+                proxy_ports = await loop.run_in_executor(None, port_queue.get, True, 30)
+            proxy_ports += [_unused_port() for _ in range(dead_proxies)]
+            proxy_pool = ProxyPool([f"http://127.0.0.1:{proxy_port}" for proxy_port in proxy_ports],
+                                   max_per_proxy=max_per_proxy, default_latency=max(config.latency, 0.01))
+            logger.info("Stand-in proxies started", proxies=len(proxy_ports), dead=dead_proxies)
+
+        connector = FarmConnector(port, limit=connection_limit)
+        rss_before = peak_rss_mb()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        results = await scrape_websites_for_emails(urls, max_concurrent=max_concurrent, connector=connector,
+                                                   proxy_pool=proxy_pool)
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+    finally:
+        stop_event.set()
+        farm.join(timeout=10)
+        if proxy_process is not None:
+            proxy_process.join(timeout=10)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': sys.version.split()[0],
+        'config': config.to_dict(),
+        'max_concurrent': max_concurrent,
+        'connection_limit': connection_limit,
+        'sites': len(urls),
+        'wall_seconds': round(wall_time, 3),
+        'sites_per_second': round(len(urls) / wall_time, 1) if wall_time else 0.0,
+        'cpu_seconds': round(cpu_time, 3),
+        'cpu_ms_per_site': round(cpu_time / len(urls) * 1000, 3) if urls else 0.0,
+        'peak_rss_mb_before': rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    report.update(score_results(sites, results))
+    if proxy_pool is not None:
+        report['proxies'] = proxy_pool.stats()
+    return report
+
+def print_report(report):
+    print(f"Revision:        {report['revision'] or 'unknown'}")
+    print(f"Sites:           {report['sites']} ({report['error_sites']} error sites)")
+    print(f"Wall time:       {report['wall_seconds']:.2f} s")
+    print(f"Throughput:      {report['sites_per_second']} sites/s")
+    print(f"CPU time:        {report['cpu_seconds']:.2f} s ({report['cpu_ms_per_site']} ms/site)")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS:        {report['peak_rss_mb']} MB (before run: {report['peak_rss_mb_before']} MB)")
+    print(f"Email recall:    {report['recall']:.2%} ({report['found_emails']}/{report['expected_emails']}, "
+          f"{report['unexpected_emails']} unexpected)")
+    for stats in report.get('proxies', []):
+        print(f"Proxy {stats['proxy']}: {stats['requests']} requests, {stats['success_rate']:.0%} success, "
+              f"{stats['latency_ms']} ms, {stats['ejections']} ejections")
+
+def main(argv=None):
+    defaults = FarmConfig()
+    parser = argparse.ArgumentParser(description="Benchmark email extraction against a local synthetic website farm")
+    parser.add_argument('--sites', type=int, default=defaults.sites, help=f"Number of virtual hosts (default: {defaults.sites})")
+    parser.add_argument('--seed', type=int, default=defaults.seed, help="Random seed of the farm layout")
+    parser.add_argument('--latency', type=float, default=defaults.latency, help=f"Response latency in seconds (default: {defaults.latency})")
+    parser.add_argument('--jitter', type=float, default=defaults.jitter, help="Latency jitter as a fraction of the latency")
+    parser.add_argument('--body-size', type=int, default=defaults.body_size, help=f"Page size in bytes (default: {defaults.body_size})")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help="Fraction of sites answering 500")
+    parser.add_argument('--redirect-rate', type=float, default=defaults.redirect_rate, help="Fraction of sites with a redirect chain")
+    parser.add_argument('--redirect-hops', type=int, default=defaults.redirect_hops, help="Length of the redirect chains")
+    parser.add_argument('--contact-rate', type=float, default=defaults.contact_rate, help="Fraction of sites with emails only on /contact")
+    parser.add_argument('--no-email-rate', type=float, default=defaults.no_email_rate, help="Fraction of sites without emails")
+    parser.add_argument('--concurrency', type=int, default=10, help="Maximum concurrent requests (default: 10)")
+    parser.add_argument('--connection-limit', type=int, default=100, help="Connection pool size (default: 100)")
+    parser.add_argument('--proxies', type=int, default=0, help="Route the requests through this many healthy stand-in proxies")
+    parser.add_argument('--bad-proxies', type=int, default=0, help="Stand-in proxies that rate-limit part of the requests")
+    parser.add_argument('--dead-proxies', type=int, default=0, help="Proxies in the pool that refuse every connection")
+    parser.add_argument('--proxy-latency', type=float, default=0.0, help="Latency added by each stand-in proxy in seconds")
+    parser.add_argument('--proxy-failure-rate', type=float, default=0.5, help="Fraction of requests the bad proxies answer with 429")
+    parser.add_argument('--max-per-proxy', type=int, default=8, help="Requests in flight per proxy (default: 8)")
+    parser.add_argument('--json', help="Append the report as one JSON line to this file")
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level, args.log_format, args.quiet, args.log_file)
+
+    config = FarmConfig(
+        sites=args.sites, seed=args.seed, latency=args.latency, jitter=args.jitter,
+        body_size=args.body_size, error_rate=args.error_rate, redirect_rate=args.redirect_rate,
+        redirect_hops=args.redirect_hops, contact_rate=args.contact_rate, no_email_rate=args.no_email_rate
+    )
+    proxies = ([(args.proxy_latency, 0.0)] * args.proxies +
+               [(args.proxy_latency, args.proxy_failure_rate)] * args.bad_proxies)
+    report = asyncio.run(run_benchmark(config, args.concurrency, args.connection_limit, proxies,
+                                       args.dead_proxies, args.max_per_proxy))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Micro-benchmark of the Google results page parser against the saved fixture corpus.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serp_parser --repeat 20 --json serp_bench.jsonl
+
+For every fixture and BeautifulSoup backend it reports the parse time, and the time,
+recall and extra (unexpected) URLs of each strategy on its own and of the full
+fallback chain used by the scrapers.
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from bs4 import BeautifulSoup, FeatureNotFound
+from serp_parser import STRATEGIES, parse_serp
+from benchmarks.bench_utils import git_revision
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serp_fixtures')
+
+# BeautifulSoup backends to compare, the ones that are not installed are skipped
+PARSERS = ['html.parser', 'lxml', 'html5lib']
+
+def load_corpus(fixture_dir=FIXTURE_DIR):
+    """
+    Load the fixture manifest and the HTML of every fixture.
+
+    Returns:
+        tuple: (manifest version, list of fixture dictionaries with an added 'html' key)
+    """
+    with open(os.path.join(fixture_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    fixtures = []
+    for fixture in manifest['fixtures']:
+        with open(os.path.join(fixture_dir, fixture['file']), encoding='utf-8') as f:
+            fixtures.append(dict(fixture, html=f.read()))
+    return manifest['version'], fixtures
+
+def available_parsers(parsers=PARSERS):
+    """Return the BeautifulSoup backends that are installed."""
+    available = []
+    for parser in parsers:
+        try:
+            BeautifulSoup('<p></p>', parser)
+        except FeatureNotFound:
+            continue
+        available.append(parser)
+    return available
+
+def _median_ms(func, repeat):
+    """Run func repeat times and return (median time in ms, last return value)."""
+    times = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 3), value
+
+def score_urls(urls, expected):
+    """Return found, extra and recall of extracted URLs against the expected URLs."""
+    expected = set(expected)
+    urls = set(urls)
+    found = len(urls & expected)
+    return {
+        'found': found,
+        'expected': len(expected),
+        'extra': len(urls - expected),
+        'recall': round(found / len(expected), 3) if expected else None,
+    }
+
+def _run_strategy(strategy, soup, require_query):
+    try:
+        if strategy.__name__ == 'parse_all_links':
+            results = strategy(soup, require_query=require_query)
+        else:
+            results = strategy(soup)
+    except Exception:
+        return []
+    return [result['url'] for result in results if 'google.com' not in result['url']]
+
+def benchmark_fixture(fixture, parser, repeat=10, require_query=True):
+    """
+    Time and score one fixture with one parser backend.
+
+    Args:
+        fixture (dict): Fixture from load_corpus
+        parser (str): BeautifulSoup backend
+        repeat (int): Number of timed runs, the median is reported
+        require_query (bool): Passed to the all_links strategy, as the URL scrapers do
+
+    Returns:
+        dict: Parse time, per-strategy and chain results
+    """
+    html = fixture['html']
+    expected = fixture['expected_urls']
+    parse_ms, soup = _median_ms(lambda: BeautifulSoup(html, parser), repeat)
+
+    strategies = {}
+    winner = None
+    for name, strategy in STRATEGIES:
+        strategy_ms, urls = _median_ms(lambda: _run_strategy(strategy, soup, require_query), repeat)
+        strategies[name] = dict(score_urls(urls, expected), ms=strategy_ms)
+        if winner is None and urls:
+            winner = name
+
+    chain_ms, results = _median_ms(lambda: parse_serp(html, parser, require_query=require_query), repeat)
+    chain = dict(score_urls([result['url'] for result in results], expected), ms=chain_ms, strategy=winner)
+
+    return {
+        'fixture': fixture['file'],
+        'layout': fixture['layout'],
+        'parser': parser,
+        'bytes': len(html.encode('utf-8')),
+        'parse_ms': parse_ms,
+        'strategies': strategies,
+        'chain': chain,
+    }
+
+def _format_recall(score):
+    if score['recall'] is None:
+        return f"  -   +{score['extra']}"
+    return f"{score['recall']:>5.0%} +{score['extra']}"
+
+def print_report(rows):
+    names = [name for name, _ in STRATEGIES]
+    header = f"{'fixture':<30} {'parser':<12} {'parse ms':>9} {'chain ms':>9} {'chain':>10}  " + \
+             '  '.join(f"{name:>14}" for name in names)
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['fixture']:<30} {row['parser']:<12} {row['parse_ms']:>9.2f} {row['chain']['ms']:>9.2f} "
+              f"{_format_recall(row['chain']):>10}  "
+              + '  '.join(f"{_format_recall(row['strategies'][name]):>14}" for name in names))
+    print("\nRecall of the expected URLs, +N is the number of unexpected URLs. "
+          "'chain' is parse_serp, which uses the first strategy that finds anything.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Google results page parser on the fixture corpus")
+    parser.add_argument('--repeat', type=int, default=10, help="Timed runs per measurement (default: 10)")
+    parser.add_argument('--parser', action='append', dest='parsers',
+                        help=f"BeautifulSoup backend, can be repeated (default: the installed ones of {', '.join(PARSERS)})")
+    parser.add_argument('--fixture', action='append', dest='fixtures', help="Only this fixture file, can be repeated")
+    parser.add_argument('--fixtures-dir', default=FIXTURE_DIR, help="Directory with manifest.json and the fixtures")
+    parser.add_argument('--json', help="Append the report as one JSON line to this file")
+    args = parser.parse_args(argv)
+
+    version, fixtures = load_corpus(args.fixtures_dir)
+    if args.fixtures:
+        fixtures = [fixture for fixture in fixtures if fixture['file'] in args.fixtures]
+    parsers = available_parsers(args.parsers or PARSERS)
+
+    rows = [benchmark_fixture(fixture, backend, args.repeat) for fixture in fixtures for backend in parsers]
+    print(f"Corpus version {version}, {len(fixtures)} fixtures, parsers: {', '.join(parsers)}\n")
+    print_report(rows)
+
+    if args.json:
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'corpus_version': version,
+            'repeat': args.repeat,
+            'results': rows,
+        }
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + '\n')
+
+if __name__ == "__main__":
+    main()
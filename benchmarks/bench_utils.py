@@ -0,0 +1,24 @@
+import sys
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is not reported there
+    resource = None
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_revision():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
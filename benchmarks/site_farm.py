@@ -0,0 +1,220 @@
+import random
+import socket
+import asyncio
+import aiohttp
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+
+# All virtual hosts live under this domain, e.g. site00042.farm.test
+FARM_DOMAIN = 'farm.test'
+
+# Local parts used for the seeded emails, spread over the scraper's categories
+EMAIL_LOCAL_PARTS = ['info', 'contact', 'sales', 'support', 'admin', 'jane', 'office', 'team']
+
+class FarmConfig:
+    """
+    Shape of the synthetic website farm.
+
+    The same config and seed always produce the same sites, so the benchmark can
+    compute the expected emails without asking the server.
+    """
+
+    def __init__(self, sites=1000, seed=1, latency=0.02, jitter=0.5, body_size=20000,
+                 error_rate=0.02, redirect_rate=0.1, redirect_hops=2,
+                 contact_rate=0.4, no_email_rate=0.2, emails_per_site=2):
+        self.sites = sites
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.body_size = body_size
+        self.error_rate = error_rate
+        self.redirect_rate = redirect_rate
+        self.redirect_hops = redirect_hops
+        self.contact_rate = contact_rate
+        self.no_email_rate = no_email_rate
+        self.emails_per_site = emails_per_site
+
+    def to_dict(self):
+        return dict(vars(self))
+
+class FarmSite:
+    """A single virtual host of the farm."""
+
+    def __init__(self, host, emails, email_page, redirects, error):
+        self.host = host
+        self.emails = emails
+        self.email_page = email_page  # 'home', 'contact' or None
+        self.redirects = redirects
+        self.error = error
+
+    @property
+    def url(self):
+        return f"http://{self.host}/"
+
+def build_sites(config):
+    """
+    Create the virtual hosts described by a config.
+
+    Returns:
+        list: FarmSite objects, in host order
+    """
+    rng = random.Random(config.seed)
+    sites = []
+    for index in range(config.sites):
+        host = f"site{index:05d}.{FARM_DOMAIN}"
+        error = rng.random() < config.error_rate
+        redirects = config.redirect_hops if rng.random() < config.redirect_rate else 0
+
+        roll = rng.random()
+        if roll < config.no_email_rate:
+            email_page = None
+        elif roll < config.no_email_rate + config.contact_rate:
+            email_page = 'contact'
+        else:
+            email_page = 'home'
+
+        emails = []
+        if email_page is not None:
+            local_parts = rng.sample(EMAIL_LOCAL_PARTS, min(config.emails_per_site, len(EMAIL_LOCAL_PARTS)))
+            emails = [f"{local}@site{index:05d}-mail.com" for local in local_parts]
+
+        sites.append(FarmSite(host, emails, email_page, redirects, error))
+    return sites
+
+def _render_page(site, title, with_emails, body_size):
+    """Build an HTML page padded to roughly body_size bytes."""
+    parts = [f"<html><head><title>{title} - {site.host}</title></head><body>",
+             '<nav><a href="/">Home</a> <a href="/contact">Contact</a></nav>',
+             # Retina image names look like emails and must be filtered out
+             '<img src="/static/logo@2x.png" alt="logo">']
+    if with_emails:
+        parts.extend(f'<p>Mail us: <a href="mailto:{email}">{email}</a></p>' for email in site.emails)
+    filler = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.</p>"
+    size = sum(len(part) for part in parts)
+    if size < body_size:
+        parts.append(filler * ((body_size - size) // len(filler) + 1))
+    parts.append("</body></html>")
+    return ''.join(parts)
+
+class SiteFarm:
+    """
+    aiohttp server that serves every virtual host of the farm on one local port.
+
+    The site is picked from the Host header (with or without 'www.'). Each response
+    waits for the configured latency first. Error sites answer 500 on every page,
+    redirecting sites send the homepage through a chain of 302 hops.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.sites = {site.host: site for site in build_sites(config)}
+        self._rng = random.Random(config.seed + 1)
+        self._pages = {}
+        self._runner = None
+        self.port = None
+
+    def _page(self, site, name):
+        key = (site.host, name)
+        page = self._pages.get(key)
+        if page is None:
+            page = self._pages[key] = _render_page(site, name.title(), site.email_page == name, self.config.body_size)
+        return page
+
+    async def _handle(self, request):
+        host = request.host.split(':')[0].lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        site = self.sites.get(host)
+        if site is None:
+            raise web.HTTPNotFound()
+
+        latency = self.config.latency * (1 + self.config.jitter * (2 * self._rng.random() - 1))
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        if site.error:
+            raise web.HTTPInternalServerError()
+
+        path = request.path
+        if path == '/' and site.redirects:
+            raise web.HTTPFound('/hop/1')
+        if path.startswith('/hop/'):
+            hop = int(path.rsplit('/', 1)[-1])
+            if hop < site.redirects:
+                raise web.HTTPFound(f"/hop/{hop + 1}")
+            path = '/'
+
+        if path == '/':
+            return web.Response(text=self._page(site, 'home'), content_type='text/html')
+        if path.rstrip('/') == '/contact':
+            return web.Response(text=self._page(site, 'contact'), content_type='text/html')
+        raise web.HTTPNotFound()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start serving. Returns the port the farm listens on."""
+        app = web.Application()
+        app.router.add_route('GET', '/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, backlog=1024)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+class FarmResolver(AbstractResolver):
+    """
+    aiohttp resolver that sends every host name to the local farm.
+
+    The port is rewritten as well, so the scraper can use plain http://siteN.farm.test/
+    URLs on port 80.
+    """
+
+    def __init__(self, port, address='127.0.0.1'):
+        self.port = port
+        self.address = address
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{
+            'hostname': host,
+            'host': self.address,
+            'port': self.port,
+            'family': socket.AF_INET,
+            'proto': 0,
+            'flags': socket.AI_NUMERICHOST,
+        }]
+
+    async def close(self):
+        pass
+
+class FarmConnector(aiohttp.TCPConnector):
+    """
+    Connector that sends every request to the local farm over plain HTTP.
+
+    The scraper requests contact pages on https, but the farm has no certificate, so
+    https requests are sent as http before a connection is picked. This also keeps them
+    as plain requests through the stand-in proxies, which do not support CONNECT.
+    """
+
+    def __init__(self, port, **kwargs):
+        super().__init__(resolver=FarmResolver(port), **kwargs)
+
+    async def connect(self, req, traces, timeout):
+        if req.url.scheme == 'https':
+            req.url = req.url.with_scheme('http')
+        return await super().connect(req, traces, timeout)
+
+def run_farm_process(config, port_queue, stop_event):
+    """Entry point of the farm process: serve until stop_event is set."""
+    async def serve():
+        farm = SiteFarm(config)
+        port_queue.put(await farm.start())
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, stop_event.wait)
+        await farm.stop()
+
+    asyncio.run(serve())
@@ -0,0 +1,83 @@
+import random
+import asyncio
+import aiohttp
+from aiohttp import web
+
+# Response headers passed back to the client
+FORWARDED_HEADERS = ('Content-Type', 'Location')
+
+class StubProxy:
+    """
+    Local stand-in for an HTTP forward proxy.
+
+    Every request is forwarded to one upstream port (such as the site farm) with its Host
+    header, so the proxy needs no DNS. Only plain HTTP is supported, not CONNECT. The proxy
+    can add latency and answer a fraction of the requests with 429, the way a rate-limited
+    egress does.
+    """
+
+    def __init__(self, upstream_port, upstream_host='127.0.0.1', latency=0.0, failure_rate=0.0, seed=1):
+        self.upstream = f"http://{upstream_host}:{upstream_port}"
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._session = None
+        self._runner = None
+        self.port = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise web.HTTPTooManyRequests()
+
+        headers = {'Host': request.host, 'User-Agent': request.headers.get('User-Agent', '')}
+        async with self._session.get(self.upstream + request.rel_url.path_qs, headers=headers, allow_redirects=False) as response:
+            body = await response.read()
+            return web.Response(status=response.status, body=body,
+                                headers={name: response.headers[name] for name in FORWARDED_HEADERS if name in response.headers})
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start serving. Returns the port the proxy listens on."""
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        app = web.Application()
+        app.router.add_route('GET', '/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, backlog=1024)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+def run_proxy_process(upstream_port, proxies, port_queue, stop_event):
+    """
+    Entry point of the proxy process: serve until stop_event is set.
+
+    Args:
+        upstream_port (int): Port every proxy forwards to
+        proxies (list): (latency, failure_rate) of each proxy
+        port_queue: Receives the list of proxy ports
+        stop_event: Set to stop the proxies
+    """
+    async def serve():
+        stubs = [StubProxy(upstream_port, latency=latency, failure_rate=failure_rate, seed=index)
+                 for index, (latency, failure_rate) in enumerate(proxies)]
+        port_queue.put([await stub.start() for stub in stubs])
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, stop_event.wait)
+        for stub in stubs:
+            await stub.stop()
+
+    asyncio.run(serve())
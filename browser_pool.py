@@ -0,0 +1,110 @@
+import asyncio
+from async_google_scraper import create_chrome_driver
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+class BrowserPool:
+    """
+    Bounded pool of Chrome browsers shared by concurrent tasks.
+
+    Browsers are started on demand, up to size, and reused afterwards. A task that needs a
+    browser while all of them are busy waits until one is released. A browser that failed
+    can be released with broken=True, it is then closed and replaced the next time one is
+    needed.
+
+    Example:
+        async with pool.browser() as driver:
+            urls = await scrape_google_urls(query, driver=driver)
+    """
+
+    def __init__(self, size=1, chrome_options=None, factory=None):
+        """
+        Args:
+            size (int): Maximum number of browsers
+            chrome_options (Options, optional): Chrome options, defaults to build_chrome_options()
+            factory (callable, optional): Called with chrome_options to start a browser,
+                defaults to create_chrome_driver
+        """
+        self.size = max(1, size)
+        self.chrome_options = chrome_options
+        self.factory = factory or create_chrome_driver
+        self._idle = []
+        self._started = 0
+        self._available = asyncio.Condition()
+        self._closed = False
+
+    async def acquire(self):
+        """Return an idle browser, start a new one, or wait for one to be released."""
+        async with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self.size:
+                    self._started += 1
+                    break
+                await self._available.wait()
+
+        # Start the browser outside the lock, it takes a while
+        try:
+            driver = await asyncio.to_thread(self.factory, self.chrome_options)
+        except Exception:
+            async with self._available:
+                self._started -= 1
+                self._available.notify()
+            raise
+        logger.debug("Browser started", browsers=self._started, size=self.size)
+        return driver
+
+    async def release(self, driver, broken=False):
+        """Return a browser to the pool. A broken browser is closed instead."""
+        if broken or self._closed:
+            # Free the slot first, so it is not lost if the caller is cancelled while quitting
+            async with self._available:
+                self._started -= 1
+                self._available.notify()
+            await asyncio.to_thread(_quit, driver)
+            return
+        async with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    def browser(self):
+        """
+        Async context manager that acquires a browser and releases it.
+
+        On an exception or a cancellation the browser is released as broken and closed.
+        """
+        return _PooledBrowser(self)
+
+    async def close(self):
+        """Close the idle browsers. Browsers still in use are closed when they are released."""
+        async with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+            self._available.notify_all()
+        for driver in idle:
+            await asyncio.to_thread(_quit, driver)
+
+class _PooledBrowser:
+    def __init__(self, pool):
+        self.pool = pool
+        self.driver = None
+
+    async def __aenter__(self):
+        self.driver = await self.pool.acquire()
+        return self.driver
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # Also after a cancellation: a worker thread started with asyncio.to_thread keeps
+        # driving the browser after its task is cancelled, so it cannot be handed out again
+        await self.pool.release(self.driver, broken=exc_type is not None)
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug("Could not terminate browser process cleanly", error=type(e).__name__)
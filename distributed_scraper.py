@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import sqlite3
+from abc import ABC, abstractmethod
+import logging
+import multiprocessing
+import aiohttp
+from async_google_scraper import extract_emails_from_url, save_results_to_csv, normalize_work_item
+from scraper_logging import get_logger, configure_logging, add_logging_arguments, ProgressRenderer
+
+logger = get_logger(__name__)
+
+class WorkQueue(ABC):
+    """
+    Interface for the shared work queue used by the coordinator and the workers.
+
+    Items move from 'pending' to 'leased' when a worker takes them, and from 'leased'
+    to 'done' when the worker acknowledges the result. A lease that is not acknowledged
+    before it expires is handed out again, so a crashed worker never loses work.
+    Items that keep expiring are marked 'failed' after max_attempts leases.
+
+    Backends implement the abstract methods, a backend that misses one cannot be created.
+    """
+
+    @abstractmethod
+    def push(self, urls):
+        """Add URLs to the queue. Returns the number of new items."""
+
+    @abstractmethod
+    def lease(self, worker_id, batch_size=10, lease_timeout=120):
+        """Lease up to batch_size items. Returns a list of (item_id, url) tuples."""
+
+    @abstractmethod
+    def ack(self, item_id, worker_id, result):
+        """Store the result for a leased item and mark it as done."""
+
+    @abstractmethod
+    def counts(self):
+        """Return a dictionary with the number of items per status."""
+
+    @abstractmethod
+    def results(self):
+        """Return the stored results of all finished items."""
+
+    def close(self):
+        """Release any resources held by the queue."""
+        pass
+
+    def is_drained(self):
+        """Check whether there is no pending or leased work left."""
+        counts = self.counts()
+        return counts.get('pending', 0) == 0 and counts.get('leased', 0) == 0
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Work queue stored in a single SQLite database file.
+
+    Several processes (or machines sharing the file) can use the same queue. Leasing
+    runs inside an immediate transaction so two workers never get the same item.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                updated_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_items_status ON work_items (status, lease_expires)")
+
+    def push(self, urls):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_items (url, updated_at) VALUES (?, ?)",
+                ((url, now) for url in urls)
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def lease(self, worker_id, batch_size=10, lease_timeout=120):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Give up on items whose leases keep expiring
+            self.conn.execute(
+                "UPDATE work_items SET status = 'failed', updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+
+            # Take pending items and items whose lease has expired
+            rows = self.conn.execute(
+                "SELECT id, url FROM work_items "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, batch_size)
+            ).fetchall()
+
+            self.conn.executemany(
+                "UPDATE work_items SET status = 'leased', worker_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                ((worker_id, now + lease_timeout, now, item_id) for item_id, _ in rows)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def ack(self, item_id, worker_id, result):
+        # A late ack from a worker whose lease was re-issued is still a valid result
+        self.conn.execute(
+            "UPDATE work_items SET status = 'done', worker_id = ?, lease_expires = NULL, "
+            "result = ?, updated_at = ? WHERE id = ? AND status != 'done'",
+            (worker_id, json.dumps(result), time.time(), item_id)
+        )
+
+    def counts(self):
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status").fetchall())
+        # Expired leases are waiting to be re-issued, so report them as pending
+        expired = self.conn.execute(
+            "SELECT COUNT(*) FROM work_items WHERE status = 'leased' AND lease_expires < ?",
+            (time.time(),)
+        ).fetchone()[0]
+        if expired:
+            counts['leased'] -= expired
+            counts['pending'] = counts.get('pending', 0) + expired
+        return counts
+
+    def results(self):
+        rows = self.conn.execute("SELECT result FROM work_items WHERE status = 'done' ORDER BY id")
+        return [json.loads(result) for (result,) in rows]
+
+    def close(self):
+        self.conn.close()
+
+# Queue backends by URI scheme. Other backends can be registered here.
+QUEUE_BACKENDS = {
+    'sqlite': SQLiteWorkQueue,
+}
+
+def open_work_queue(uri, **kwargs):
+    """
+    Open a work queue from a URI such as 'sqlite:///path/to/queue.db'.
+
+    A plain file path is treated as a SQLite database.
+
+    Args:
+        uri (str): Queue location
+        **kwargs: Extra options passed to the backend
+
+    Returns:
+        WorkQueue: The opened queue
+    """
+    scheme, separator, location = uri.partition('://')
+    if not separator:
+        return SQLiteWorkQueue(uri, **kwargs)
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown queue backend '{scheme}'. Available: {', '.join(QUEUE_BACKENDS)}")
+    # sqlite:///relative.db -> relative.db, sqlite:////abs/path.db -> /abs/path.db
+    if location.startswith('/'):
+        location = location[1:]
+    return QUEUE_BACKENDS[scheme](location, **kwargs)
+
+def read_work_items(path):
+    """Read URLs or domains, one per line, from a file or '-' for stdin."""
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [normalize_work_item(line) for line in handle if line.strip() and not line.startswith('#')]
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+async def run_worker(queue, worker_id=None, batch_size=10, max_concurrent=10, lease_timeout=120, poll_interval=1.0, exit_when_drained=True):
+    """
+    Lease URLs from the queue, extract emails from them and acknowledge the results.
+
+    Args:
+        queue (WorkQueue): The shared work queue
+        worker_id (str, optional): Identifier of this worker. Defaults to host name and process id.
+        batch_size (int): Number of items to lease at once
+        max_concurrent (int): Maximum number of concurrent requests
+        lease_timeout (float): Seconds before an unacknowledged lease is re-issued
+        poll_interval (float): Seconds to wait when the queue has no work available
+        exit_when_drained (bool): Stop when no pending or leased work is left
+
+    Returns:
+        int: Number of items processed by this worker
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    semaphore = asyncio.Semaphore(max_concurrent)
+    processed = 0
+
+    logger.info("Worker started", worker=worker_id)
+
+    async def process(session, item_id, url):
+        # The queue stores results as JSON, in the shape of the JSON outputs
+        result = await extract_emails_from_url(session, url, semaphore)
+        return item_id, result.to_dict()
+
+    async with aiohttp.ClientSession() as session:
+        while True:
+            items = queue.lease(worker_id, batch_size, lease_timeout)
+
+            if not items:
+                if exit_when_drained and queue.is_drained():
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+
+            tasks = [process(session, item_id, url) for item_id, url in items]
+            for task_result in asyncio.as_completed(tasks):
+                item_id, data = await task_result
+                queue.ack(item_id, worker_id, data)
+                processed += 1
+
+                if data['emails']:
+                    email_count = len(data['emails'])
+                    logger.debug("Found emails", worker=worker_id, url=data['url'], count=email_count)
+
+    logger.info("Worker finished", worker=worker_id, processed=processed)
+    return processed
+
+def wait_for_queue(queue, poll_interval=2.0):
+    """Block until the queue is drained, showing progress along the way."""
+    progress = ProgressRenderer(interval=max(poll_interval, 1.0))
+    while True:
+        counts = queue.counts()
+        finished = counts.get('done', 0) + counts.get('failed', 0)
+        progress.update(finished, sum(counts.values()), leased=counts.get('leased', 0), failed=counts.get('failed', 0))
+        if queue.is_drained():
+            progress.close()
+            return counts
+        time.sleep(poll_interval)
+
+def _worker_process_main(queue_uri, worker_id, batch_size, max_concurrent, lease_timeout, log_level='INFO'):
+    """Entry point of a local worker process."""
+    # Spawned processes start without the parent's logging configuration
+    configure_logging(log_level)
+    queue = open_work_queue(queue_uri)
+    try:
+        asyncio.run(run_worker(queue, worker_id, batch_size, max_concurrent, lease_timeout))
+    finally:
+        queue.close()
+
+def run_local(urls, queue_uri, num_workers=2, batch_size=10, max_concurrent=10, lease_timeout=120):
+    """
+    Run a coordinator and several local worker processes against one queue.
+
+    Args:
+        urls (list): URLs to push into the queue
+        queue_uri (str): Queue location
+        num_workers (int): Number of local worker processes
+        batch_size (int): Number of items each worker leases at once
+        max_concurrent (int): Maximum number of concurrent requests per worker
+        lease_timeout (float): Seconds before an unacknowledged lease is re-issued
+
+    Returns:
+        list: The collected results
+    """
+    queue = open_work_queue(queue_uri)
+    try:
+        added = queue.push(urls)
+        logger.info("Pushed items", added=added, queue=queue_uri)
+
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(
+                target=_worker_process_main,
+                args=(queue_uri, f"local-{index + 1}", batch_size, max_concurrent, lease_timeout,
+                      logging.getLevelName(logging.getLogger().getEffectiveLevel()))
+            )
+            for index in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            wait_for_queue(queue)
+        finally:
+            for worker in workers:
+                worker.join(timeout=lease_timeout)
+
+        return queue.results()
+    finally:
+        queue.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed email extraction with a shared work queue")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = subparsers.add_parser('coordinator', help="Push URLs or domains into the queue and collect results")
+    coordinator.add_argument('input', help="File with one URL or domain per line, or '-' for stdin")
+    coordinator.add_argument('--queue', default='work_queue.db', help="Queue location (default: work_queue.db)")
+    coordinator.add_argument('--no-wait', action='store_true', help="Only push the items, do not wait for the results")
+
+    worker = subparsers.add_parser('worker', help="Lease items from the queue and extract emails")
+    worker.add_argument('--queue', default='work_queue.db', help="Queue location (default: work_queue.db)")
+    worker.add_argument('--worker-id', help="Worker identifier (default: host name and process id)")
+    worker.add_argument('--forever', action='store_true', help="Keep polling for work when the queue is empty")
+
+    local = subparsers.add_parser('local', help="Run a coordinator and several local worker processes")
+    local.add_argument('input', help="File with one URL or domain per line, or '-' for stdin")
+    local.add_argument('--queue', default='work_queue.db', help="Queue location (default: work_queue.db)")
+    local.add_argument('--workers', type=int, default=2, help="Number of worker processes (default: 2)")
+
+    status = subparsers.add_parser('status', help="Show the queue status")
+    status.add_argument('--queue', default='work_queue.db', help="Queue location (default: work_queue.db)")
+
+    for subparser in (worker, local):
+        subparser.add_argument('--batch-size', type=int, default=10, help="Items leased at once (default: 10)")
+        subparser.add_argument('--concurrency', type=int, default=10, help="Concurrent requests per worker (default: 10)")
+        subparser.add_argument('--lease-timeout', type=float, default=120, help="Seconds before a lease is re-issued (default: 120)")
+
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level, args.log_format, args.quiet, args.log_file)
+
+    if args.command == 'worker':
+        queue = open_work_queue(args.queue)
+        try:
+            asyncio.run(run_worker(queue, args.worker_id, args.batch_size, args.concurrency,
+                                   args.lease_timeout, exit_when_drained=not args.forever))
+        finally:
+            queue.close()
+        return
+
+    if args.command == 'local':
+        results = run_local(read_work_items(args.input), args.queue, args.workers,
+                            args.batch_size, args.concurrency, args.lease_timeout)
+        save_results_to_csv(results)
+        return
+
+    queue = open_work_queue(args.queue)
+    try:
+        if args.command == 'status':
+            for state, count in sorted(queue.counts().items()):
+                print(f"{state}: {count}")
+            return
+
+        added = queue.push(read_work_items(args.input))
+        logger.info("Pushed items", added=added, queue=args.queue)
+        if not args.no_wait:
+            wait_for_queue(queue)
+            save_results_to_csv(queue.results())
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
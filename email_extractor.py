@@ -0,0 +1,98 @@
+import re
+
+# Regular expression for email extraction
+EMAIL_REGEX = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+
+# The part of an email from the '@' on, with the top-level domain as its group. The
+# domain does not depend on where the username starts, so this finds the same '@'s and
+# ends as EMAIL_REGEX, and the username is added by walking back from the '@'.
+EMAIL_DOMAIN_PATTERN = re.compile(r'@[a-zA-Z0-9.-]+\.([a-zA-Z]{2,})')
+
+# Characters of the username part of EMAIL_REGEX
+USERNAME_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-'
+_USERNAME_CHAR_SET = frozenset(USERNAME_CHARS)
+
+# Top-level domains accepted for an email. This also rejects file names that look like
+# emails, such as retina images ('logo@2x.png') or scripts ('app@1.2.js').
+VALID_TLDS = frozenset(['com', 'org', 'net', 'edu', 'io', 'gov', 'co', 'info', 'biz', 'de', 'uk', 'fr', 'es', 'it', 'nl'])
+
+# Email categorization patterns, checked in order against the part before the '@'
+EMAIL_CATEGORY_KEYWORDS = {
+    'contact': ['contact', 'info', 'inquiries', 'enquiries', 'general'],
+    'support': ['support', 'help', 'service', 'services', 'customer'],
+    'sales': ['sales', 'order', 'orders', 'business', 'marketing'],
+    'admin': ['admin', 'administrator', 'webmaster', 'hostmaster', 'postmaster'],
+    'personal': ['john', 'jane', 'david', 'mike', 'sarah', 'jennifer'],
+    'other': []  # Default category
+}
+
+def find_candidates(text, tlds=None):
+    """
+    Return every match of the email regex, the same as re.findall(EMAIL_REGEX, text)
+    but in linear time.
+
+    Only the '@'s followed by a domain are looked at. The username of each one runs back
+    to the start of its run of username characters, but not into the previous match,
+    where re.findall resumes scanning. Long runs without an '@' such as inline base64
+    images are never scanned character by character in Python.
+
+    Args:
+        text (str): Page content
+        tlds (set, optional): Only return the matches with one of these top-level domains
+
+    Returns:
+        list: The matches in the order they appear
+    """
+    candidates = []
+    previous_end = 0  # No username starts before the end of the previous match
+    for match in EMAIL_DOMAIN_PATTERN.finditer(text):
+        at, end = match.span()
+        if at > previous_end and text[at - 1] in _USERNAME_CHAR_SET:
+            if tlds is None or match.group(1) in tlds:
+                run = text[previous_end:at]
+                candidates.append(text[previous_end + len(run.rstrip(USERNAME_CHARS)):end])
+            previous_end = end
+        else:
+            # No username: re.findall would not match here and moves on past the '@'
+            previous_end = at + 1
+    return candidates
+
+def is_valid_email(candidate):
+    """
+    Check a regex match against the validation rules.
+
+    The match must end in one of VALID_TLDS (case-sensitive, like the original checks),
+    be 6 to 99 characters long and have at least two characters before the '@'.
+    """
+    return candidate.rpartition('.')[2] in VALID_TLDS and 5 < len(candidate) < 100 and candidate.index('@') > 1
+
+def extract_emails(text):
+    """
+    Find the valid email addresses in a page.
+
+    Args:
+        text (str): Page content
+
+    Returns:
+        list: Unique lowercase emails in the order they first appear
+    """
+    emails = []
+    seen = set()
+    # Matches with another top-level domain (retina images, scripts) are dropped by the scan
+    for candidate in find_candidates(text, VALID_TLDS):
+        if not is_valid_email(candidate):
+            continue
+        email = candidate.lower()
+        if email not in seen:
+            seen.add(email)
+            emails.append(email)
+    return emails
+
+def categorize_email(email):
+    """Return the category of an email based on the keywords in its username."""
+    username = email.split('@', 1)[0].lower()
+    for category, keywords in EMAIL_CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in username:
+                return category
+    return 'other'
@@ -0,0 +1,674 @@
+import io
+import csv
+import gzip
+import json
+import time
+import heapq
+import importlib.util
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from scraper_logging import get_logger
+from site_result import SiteResult, as_site_result
+
+logger = get_logger(__name__)
+
+# The optional packages are only imported when their export is used, so runs that do not
+# write Excel, Parquet or zstd files do not pay for importing them
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+if not OPENPYXL_AVAILABLE:
+    logger.warning("openpyxl not installed, Excel export will be skipped. To enable it: pip install openpyxl")
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+ZSTD_AVAILABLE = importlib.util.find_spec('zstandard') is not None
+
+# Field names of the main results CSV
+CSV_FIELDNAMES = [
+    'id',
+    'url',
+    'domain',
+    'has_email',
+    'email_count',
+    'domain_match_count',
+    'pages_checked',
+    'status',
+    'error',
+    'contact_emails',
+    'support_emails',
+    'sales_emails',
+    'admin_emails',
+    'personal_emails',
+    'other_emails',
+    'all_emails',
+    'timestamp'
+]
+
+# File name suffixes of the supported JSONL compressions
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Email categories in the order of their Excel sheets
+EMAIL_CATEGORIES = ['contact', 'support', 'sales', 'admin', 'personal', 'other']
+
+def result_domain(result):
+    """Return the domain (network location) of a result's URL, or '' if it cannot be parsed."""
+    if isinstance(result, SiteResult):
+        return result.domain
+    try:
+        return urlparse(result['url']).netloc
+    except:
+        return ''
+
+def build_csv_row(row_id, result, timestamp, domain=None):
+    """
+    Build a row of the main results CSV from a single result.
+
+    Args:
+        row_id (int): Row number
+        result (SiteResult): Result of a site, or a result dictionary
+        timestamp (str): Timestamp to store in the row
+        domain (str, optional): Already parsed domain of the result
+
+    Returns:
+        dict: The CSV row
+    """
+    result = as_site_result(result)
+    if domain is None:
+        domain = result.domain
+
+    emails = result.emails
+    categorized = result.categorized_emails()
+
+    return {
+        'id': row_id,
+        'url': result.url,
+        'domain': domain,
+        'has_email': 'Yes' if emails else 'No',
+        'email_count': len(emails),
+        'domain_match_count': result.domain_matches,
+        'pages_checked': result.pages_checked,
+        'status': result.status,
+        'error': result.error if result.error is not None else '',
+        'contact_emails': '; '.join(categorized.get('contact', [])),
+        'support_emails': '; '.join(categorized.get('support', [])),
+        'sales_emails': '; '.join(categorized.get('sales', [])),
+        'admin_emails': '; '.join(categorized.get('admin', [])),
+        'personal_emails': '; '.join(categorized.get('personal', [])),
+        'other_emails': '; '.join(categorized.get('other', [])),
+        'all_emails': '; '.join(emails) if emails else '',
+        'timestamp': timestamp
+    }
+
+def build_emails_only_rows(result, domain=None):
+    """
+    Build the rows of the emails-only CSV for a single result.
+
+    Args:
+        result (SiteResult): Result of a site, or a result dictionary
+        domain (str, optional): Already parsed domain of the result
+
+    Returns:
+        list: Rows of [domain, email, category, domain match]
+    """
+    result = as_site_result(result)
+    rows = []
+    if not result.emails:
+        return rows
+
+    if domain is None:
+        domain = result.domain
+    bare_domain = domain.replace('www.', '')
+    for email, category in result.email_categories():
+        if category is None:
+            # Emails of old result files that are missing from the categories
+            rows.append([domain, email, 'Uncategorized', 'Unknown'])
+            continue
+        is_domain_match = email.split('@')[1] in (domain, bare_domain)
+        rows.append([
+            domain,
+            email,
+            category.title(),
+            'Yes' if is_domain_match else 'No'
+        ])
+
+    return rows
+
+class ResultSummary:
+    """
+    Running aggregates over a stream of results.
+
+    The summary is updated one result at a time, so the final report can be written
+    without keeping all results in memory.
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.total_sites = 0
+        self.sites_with_emails = 0
+        self.total_emails = 0
+        self.domain_matches = 0
+        self.category_counts = {}
+        # Min-heap of (email count, -sequence, domain) for the top domains
+        self._top_domains = []
+
+    def add(self, result, domain=None):
+        """Update the aggregates with a single result."""
+        result = as_site_result(result)
+        emails = result.emails
+
+        self.total_sites += 1
+        self.total_emails += len(emails)
+        self.domain_matches += result.domain_matches
+
+        for _, category in result.email_categories():
+            if category is not None:
+                self.category_counts[category] = self.category_counts.get(category, 0) + 1
+
+        if emails:
+            self.sites_with_emails += 1
+            # Earlier results win ties, like a stable sort over the full list
+            if domain is None:
+                domain = result.domain
+            entry = (len(emails), -self.total_sites, domain)
+            if len(self._top_domains) < self.top_n:
+                heapq.heappush(self._top_domains, entry)
+            elif entry > self._top_domains[0]:
+                heapq.heapreplace(self._top_domains, entry)
+
+    def top_domains(self):
+        """Return (domain, email count) tuples for the domains with most emails."""
+        return [(domain, count) for count, _, domain in sorted(self._top_domains, reverse=True)]
+
+    def sorted_categories(self):
+        """Return (category, count) tuples sorted by count, highest first."""
+        return sorted(self.category_counts.items(), key=lambda x: x[1], reverse=True)
+
+    def summary_table(self, date):
+        """
+        Build the metric/value table of the Excel summary sheet.
+
+        Args:
+            date (str): Date to show in the table
+
+        Returns:
+            dict: Lists of 'Metric' names and their 'Value's
+        """
+        total_sites = self.total_sites
+        sites_with_emails = self.sites_with_emails
+        total_emails = self.total_emails
+
+        summary_data = {
+            'Metric': [
+                'Date',
+                'Total websites scraped',
+                'Websites with emails',
+                'Success rate',
+                'Total emails found',
+                'Domain-matching emails',
+                'Average emails per website',
+                'Average emails per website with emails'
+            ],
+            'Value': [
+                date,
+                total_sites,
+                sites_with_emails,
+                f"{sites_with_emails/total_sites*100:.1f}%" if total_sites > 0 else "0%",
+                total_emails,
+                self.domain_matches,
+                f"{total_emails/total_sites:.2f}" if total_sites > 0 else "0",
+                f"{total_emails/sites_with_emails:.2f}" if sites_with_emails > 0 else "0"
+            ]
+        }
+
+        # Add category breakdowns
+        for category, count in self.sorted_categories():
+            summary_data['Metric'].append(f'{category.title()} emails')
+            summary_data['Value'].append(count)
+
+        return summary_data
+
+    def write_report(self, filename, timestamp, latency_recorder=None):
+        """
+        Write the plain text summary report.
+
+        Args:
+            filename (str): Name of the report file
+            timestamp (str): Date to show in the report
+            latency_recorder (LatencyRecorder, optional): Adds latency percentiles per stage and host
+        """
+        total_sites = self.total_sites
+        sites_with_emails = self.sites_with_emails
+        total_emails = self.total_emails
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"Email Scraping Summary\n")
+            f.write(f"====================\n\n")
+            f.write(f"Date: {timestamp}\n")
+            f.write(f"Total websites scraped: {total_sites}\n")
+
+            # Calculate percentage safely
+            email_percentage = sites_with_emails/total_sites*100 if total_sites > 0 else 0
+            f.write(f"Websites with emails: {sites_with_emails} ({email_percentage:.1f}%)\n")
+
+            f.write(f"Total emails found: {total_emails}\n")
+
+            # Count domain-matching emails
+            domain_match_percentage = self.domain_matches/total_emails*100 if total_emails > 0 else 0
+            f.write(f"Domain-matching emails: {self.domain_matches} ({domain_match_percentage:.1f}%)\n")
+
+            # Calculate averages safely
+            avg_per_site = total_emails/total_sites if total_sites > 0 else 0
+            avg_per_site_with_emails = total_emails/sites_with_emails if sites_with_emails > 0 else 0
+
+            f.write(f"Average emails per website: {avg_per_site:.2f}\n")
+            f.write(f"Average emails per website with emails: {avg_per_site_with_emails:.2f}\n\n")
+
+            # Write email breakdown by category
+            f.write(f"Email breakdown by category:\n")
+            for category, count in self.sorted_categories():
+                percentage = count/total_emails*100 if total_emails > 0 else 0
+                f.write(f"- {category.title()}: {count} ({percentage:.1f}%)\n")
+
+            f.write(f"\nTop domains with most emails:\n")
+            for i, (domain, count) in enumerate(self.top_domains(), 1):
+                f.write(f"{i}. {domain}: {count} emails\n")
+
+            if latency_recorder is not None:
+                latency_recorder.write_report(f)
+
+def _header_row(worksheet, columns):
+    """Build a bold header row for a write-only worksheet."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    header_font = Font(bold=True)
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = header_font
+        cells.append(cell)
+    return cells
+
+class StreamingExcelExporter:
+    """
+    Write the Excel workbook row by row with openpyxl's write-only mode.
+
+    Rows are appended to the "Full Results", per-category and "All Emails" sheets as
+    results arrive, so the workbook object graph never has to be held in memory. The
+    "Summary" sheet is filled from the running aggregates when the export is closed.
+    Category sheets are only created once they get their first row.
+    """
+
+    def __init__(self, filename="google_results_with_emails.xlsx", timestamp=None):
+        from openpyxl import Workbook
+
+        self.filename = filename
+        self.timestamp = timestamp
+        self.count = 0
+        self.thread = None
+        self._workbook = Workbook(write_only=True)
+        self._full_results = self._create_sheet('Full Results', CSV_FIELDNAMES)
+        self._summary = self._workbook.create_sheet('Summary')
+        self._category_sheets = {}
+        self._all_emails = None
+
+    def _create_sheet(self, title, columns, index=None):
+        worksheet = self._workbook.create_sheet(title, index)
+        worksheet.append(_header_row(worksheet, columns))
+        return worksheet
+
+    def _category_sheet(self, category):
+        worksheet = self._category_sheets.get(category)
+        if worksheet is None:
+            # Keep the category sheets in their usual order after "Full Results" and "Summary"
+            index = 2 + sum(1 for other in EMAIL_CATEGORIES[:EMAIL_CATEGORIES.index(category)] if other in self._category_sheets)
+            worksheet = self._create_sheet(f'{category.title()} Emails', ['Domain', 'URL', 'Email'], index)
+            self._category_sheets[category] = worksheet
+        return worksheet
+
+    def write(self, result, domain=None):
+        """Append the rows for a single result to every sheet."""
+        self.count += 1
+        result = as_site_result(result)
+        if domain is None:
+            domain = result.domain
+
+        timestamp = self.timestamp or time.strftime("%Y-%m-%d %H:%M:%S")
+        row = build_csv_row(self.count, result, timestamp, domain)
+        self._full_results.append([row[field] for field in CSV_FIELDNAMES])
+
+        for category, emails in result.categorized_emails().items():
+            if category not in EMAIL_CATEGORIES:
+                continue
+            worksheet = self._category_sheet(category)
+            for email in emails:
+                worksheet.append([domain, result.url, email])
+
+        if result.emails:
+            if self._all_emails is None:
+                self._all_emails = self._create_sheet('All Emails', ['Domain', 'Email', 'Domain Match'])
+            bare_domain = domain.replace('www.', '')
+            for email in result.emails:
+                is_domain_match = domain in email or bare_domain in email
+                self._all_emails.append([domain, email, 'Yes' if is_domain_match else 'No'])
+
+    def _save(self):
+        try:
+            self._workbook.save(self.filename)
+            logger.info("Excel workbook saved", file=self.filename)
+        except Exception as e:
+            logger.warning("Could not save Excel file", file=self.filename, error=str(e))
+
+    def close(self, summary, background=False):
+        """
+        Fill the summary sheet and save the workbook.
+
+        Args:
+            summary (ResultSummary): Aggregates for the summary sheet
+            background (bool): Save the workbook in a background thread. Use wait() to join it.
+
+        Returns:
+            threading.Thread: The background thread, or None
+        """
+        summary_data = summary.summary_table(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._summary.append(_header_row(self._summary, ['Metric', 'Value']))
+        for metric, value in zip(summary_data['Metric'], summary_data['Value']):
+            self._summary.append([metric, value])
+
+        if not background:
+            self._save()
+            return None
+
+        # Not a daemon thread, so the interpreter still waits for the file to be complete
+        self.thread = threading.Thread(target=self._save, name='excel-writer')
+        self.thread.start()
+        return self.thread
+
+    def wait(self):
+        """Wait for a background save to finish."""
+        if self.thread is not None:
+            self.thread.join()
+
+def open_text_output(filename, compression=None):
+    """
+    Open a text file for writing, optionally compressed.
+
+    Args:
+        filename (str): Name of the file
+        compression (str, optional): None, 'gzip' or 'zstd'
+
+    Returns:
+        file: A text file object
+    """
+    if compression is None:
+        return open(filename, 'w', newline='', encoding='utf-8')
+    if compression == 'gzip':
+        return gzip.open(filename, 'wt', newline='', encoding='utf-8')
+    if compression == 'zstd':
+        import zstandard
+        writer = zstandard.ZstdCompressor(level=3).stream_writer(open(filename, 'wb'))
+        return io.TextIOWrapper(writer, encoding='utf-8', newline='')
+    raise ValueError(f"Unsupported compression '{compression}'. Use one of: {', '.join(COMPRESSION_SUFFIXES)}")
+
+def resolve_compression(filename, compression):
+    """
+    Check that a compression is available and add its suffix to the file name.
+
+    Falls back to gzip when zstd is requested but the zstandard package is not installed.
+
+    Returns:
+        tuple: (filename, compression)
+    """
+    if compression == 'zstd' and not ZSTD_AVAILABLE:
+        logger.warning("zstandard not installed, using gzip instead. To enable zstd: pip install zstandard")
+        compression = 'gzip'
+    suffix = COMPRESSION_SUFFIXES.get(compression)
+    if suffix and not filename.endswith(suffix):
+        filename += suffix
+    return filename, compression
+
+class _BatchedFileExporter:
+    """Base class for exporters that buffer lines and flush them in batches."""
+
+    def __init__(self, filename, batch_size=50, flush_interval=5.0, compression=None):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._file = open_text_output(filename, compression)
+
+    def _add(self, item):
+        self._buffer.append(item)
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def flush(self):
+        """Write the buffered items and flush the file so it is readable mid-run."""
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Flush the remaining items and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+class StreamingCSVExporter(_BatchedFileExporter):
+    """Write the main results CSV one result at a time."""
+
+    def __init__(self, filename="google_results_with_emails.csv", batch_size=50, flush_interval=5.0, timestamp=None):
+        super().__init__(filename, batch_size, flush_interval)
+        self.timestamp = timestamp
+        self._writer = csv.DictWriter(self._file, fieldnames=CSV_FIELDNAMES)
+        self._writer.writeheader()
+
+    def write(self, result, domain=None):
+        self.count += 1
+        timestamp = self.timestamp or time.strftime("%Y-%m-%d %H:%M:%S")
+        self._add(build_csv_row(self.count, result, timestamp, domain))
+
+    def _write_batch(self, batch):
+        self._writer.writerows(batch)
+
+class StreamingEmailsOnlyExporter(_BatchedFileExporter):
+    """Write the simplified domain/email CSV one result at a time."""
+
+    def __init__(self, filename="emails_only.csv", batch_size=50, flush_interval=5.0):
+        super().__init__(filename, batch_size, flush_interval)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['Domain', 'Email', 'Category', 'Domain Match'])
+
+    def write(self, result, domain=None):
+        self.count += 1
+        for row in build_emails_only_rows(result, domain):
+            self._add(row)
+
+    def _write_batch(self, batch):
+        self._writer.writerows(batch)
+
+class StreamingJSONLExporter(_BatchedFileExporter):
+    """
+    Write results as newline-delimited JSON, one object per line.
+
+    With compression='gzip' or 'zstd' the file is compressed on the fly. Every flush
+    ends a compressed block, so the part written so far can be read mid-run.
+    """
+
+    def __init__(self, filename="search_results.jsonl", batch_size=50, flush_interval=5.0, compression=None):
+        filename, compression = resolve_compression(filename, compression)
+        super().__init__(filename, batch_size, flush_interval, compression)
+
+    def write(self, result, domain=None):
+        self.count += 1
+        # Results become dictionaries only here, at the JSON boundary
+        self._add(json.dumps(result.to_dict() if isinstance(result, SiteResult) else result))
+
+    def _write_batch(self, batch):
+        self._file.write('\n'.join(batch))
+        self._file.write('\n')
+
+def parquet_schema():
+    """Return the columns of the Parquet export, one row per (url, email, category)."""
+    import pyarrow as pa
+    return pa.schema([
+        ('url', pa.string()),
+        ('domain', pa.string()),
+        ('email', pa.string()),
+        ('category', pa.string()),
+        ('domain_match', pa.bool_()),
+        ('status', pa.string()),
+        ('pages_checked', pa.int32()),
+        ('error', pa.string()),
+    ])
+
+class StreamingParquetExporter:
+    """
+    Write results to a columnar Parquet file with one row per (url, email, category).
+
+    Sites without emails get a single row with empty email and category, so site
+    counts and error rates can still be computed from the file. Rows are written as
+    one row group per batch, so memory stays bounded.
+    """
+
+    def __init__(self, filename="search_results.parquet", batch_size=5000, flush_interval=None):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.count = 0
+        import pyarrow.parquet as pq
+
+        self._schema = parquet_schema()
+        self._columns = {name: [] for name in self._schema.names}
+        self._rows = 0
+        self._writer = pq.ParquetWriter(filename, self._schema, compression='zstd')
+
+    def _add_row(self, result, domain, email, category, domain_match):
+        columns = self._columns
+        columns['url'].append(result.url)
+        columns['domain'].append(domain)
+        columns['email'].append(email)
+        columns['category'].append(category)
+        columns['domain_match'].append(domain_match)
+        columns['status'].append(result.status)
+        columns['pages_checked'].append(result.pages_checked)
+        columns['error'].append(result.error)
+        self._rows += 1
+
+    def write(self, result, domain=None):
+        self.count += 1
+        result = as_site_result(result)
+        if domain is None:
+            domain = result.domain
+        bare_domain = domain.replace('www.', '')
+
+        # Emails that are missing from the categories get a row without a category
+        for email, category in result.email_categories():
+            self._add_row(result, domain, email, category, email.split('@')[-1] in (domain, bare_domain))
+        if not result.emails:
+            self._add_row(result, domain, None, None, None)
+
+        if self._rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a row group."""
+        if self._rows:
+            import pyarrow as pa
+            self._writer.write_table(pa.Table.from_pydict(self._columns, schema=self._schema))
+            self._columns = {name: [] for name in self._schema.names}
+            self._rows = 0
+
+    def close(self):
+        """Write the remaining rows and finish the file."""
+        if self._writer is None:
+            return
+        self.flush()
+        self._writer.close()
+        self._writer = None
+
+class StreamingExport:
+    """
+    Incremental export of results as they arrive.
+
+    Writes the main CSV, the emails-only CSV, a JSONL file (optionally gzip or zstd
+    compressed) and optionally a Parquet file while the scrape is running.
+    Every result is visited once: its domain is parsed a single time and shared by all
+    outputs, the summary aggregates are updated, and the Excel rows are appended to a
+    write-only workbook. The summary report is written and the workbook saved when the
+    export is closed, optionally in a background thread (excel_background=True).
+    Pass it to scrape_websites_for_emails through the exporters argument.
+    """
+
+    def __init__(self, filename="google_results_with_emails.csv", emails_only_filename="emails_only.csv",
+                 jsonl_filename="search_results.jsonl", summary_filename="email_scraping_summary.txt",
+                 excel_filename=None, parquet_filename=None, jsonl_compression=None,
+                 excel_background=False, latency_recorder=None, batch_size=50, flush_interval=5.0, timestamp=None):
+        self.timestamp = timestamp
+        self.latency_recorder = latency_recorder
+        self.summary = ResultSummary()
+        self.summary_filename = summary_filename
+        self.closed = False
+        self.exporters = [StreamingCSVExporter(filename, batch_size, flush_interval, timestamp)]
+        if emails_only_filename:
+            self.exporters.append(StreamingEmailsOnlyExporter(emails_only_filename, batch_size, flush_interval))
+        if jsonl_filename:
+            self.exporters.append(StreamingJSONLExporter(jsonl_filename, batch_size, flush_interval, jsonl_compression))
+        if parquet_filename:
+            if PYARROW_AVAILABLE:
+                self.exporters.append(StreamingParquetExporter(parquet_filename, max(batch_size, 5000)))
+            else:
+                logger.warning("pyarrow not installed, Parquet export will be skipped. To enable it: pip install pyarrow")
+
+        # Excel rows are streamed into a write-only workbook that is saved on close
+        self.excel_background = excel_background
+        self.excel = StreamingExcelExporter(excel_filename, timestamp) if excel_filename and OPENPYXL_AVAILABLE else None
+
+    def write(self, result):
+        """Export a single result."""
+        result = as_site_result(result)
+        domain = result.domain
+        self.summary.add(result, domain)
+        for exporter in self.exporters:
+            exporter.write(result, domain)
+        if self.excel is not None:
+            self.excel.write(result, domain)
+
+    def flush(self):
+        """Flush all buffered output to disk."""
+        for exporter in self.exporters:
+            exporter.flush()
+
+    def close(self):
+        """Flush and close all files and write the summary report and Excel workbook."""
+        if self.closed:
+            return
+        self.closed = True
+
+        for exporter in self.exporters:
+            exporter.close()
+            logger.info("Results saved", file=exporter.filename, results=exporter.count)
+
+        if self.excel is not None:
+            self.excel.close(self.summary, self.excel_background)
+
+        if self.summary_filename:
+            self.summary.write_report(self.summary_filename, self.timestamp or time.strftime("%Y-%m-%d %H:%M:%S"),
+                                      self.latency_recorder)
+            logger.info("Summary report saved", file=self.summary_filename)
+
+    def wait(self):
+        """Wait for a background Excel save to finish."""
+        if self.excel is not None:
+            self.excel.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,14 +1,64 @@
+import os
+import re
 import time
+import collections
 import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import WebDriverException
+from serp_parser import parse_serp
+from scraper_logging import get_logger, configure_logging
+
+logger = get_logger(__name__)
+
+# True once the page started by GoogleScraper._load_page has replaced the previous one and finished loading
+PAGE_READY_SCRIPT = "return !window.__serpPending && document.readyState === 'complete';"
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:60] or 'query'
+
+class _QueryState:
+    """Progress of one query in GoogleScraper.search_many."""
+    
+    def __init__(self, query):
+        self.query = query
+        self.page = 0
+        self.results = []
+        self.seen = set()
+        self.loading = False
+        self.load_started = None
+        self.next_load_at = 0.0
+        self.started = time.perf_counter()
+        self.page_seconds = []
+        self.error = None
+    
+    def summary(self):
+        return {
+            'query': self.query,
+            'results': self.results,
+            'pages': len(self.page_seconds),
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'page_seconds': self.page_seconds,
+            'error': self.error,
+        }
 
 class GoogleScraper:
-    def __init__(self, headless=True):
-        """Initialize the Google Scraper with required configurations."""
+    def __init__(self, headless=True, page_delay=1.0, page_timeout=15.0, dump_html=None):
+        """Initialize the Google Scraper with required configurations.
+        
+        Args:
+            headless (bool): Run Chrome without a window
+            page_delay (float): Seconds between two results pages loaded in the same tab,
+                to avoid being detected as a bot
+            page_timeout (float): Seconds to wait for a results page to finish loading
+            dump_html (str, optional): Directory to save the HTML of every results page in,
+                for debugging. None disables it.
+        """
+        self.page_delay = page_delay
+        self.page_timeout = page_timeout
+        self.dump_html = dump_html
+        
         # Configure Chrome options
         self.chrome_options = Options()
         if headless:
@@ -25,186 +75,155 @@ class GoogleScraper:
         # Initialize the Chrome driver
         self.driver = webdriver.Chrome(options=self.chrome_options)
         
-    def search(self, query, num_results=10):
+    def search(self, query, num_results=10, per_page=10):
         """Perform a Google search and extract URLs.
         
+        Loads as many results pages as needed to collect num_results results.
+        
         Args:
             query (str): The search term to use in Google
             num_results (int): Maximum number of results to extract
+            per_page (int): Results requested per page (Google's num parameter, up to 100)
             
         Returns:
-            list: A list of dictionaries containing extracted URLs and titles
+            list: A list of dictionaries containing extracted URLs, titles, ranks and page numbers
         """
-        # Format the search query for URL
-        formatted_query = query.replace(' ', '+')
-        search_url = f"https://www.google.com/search?q={formatted_query}"
-        
-        # Open the search URL
-        self.driver.get(search_url)
-        print("Navigating to Google search page...")
-        
-        # Wait for the page to load
-        time.sleep(3)
-        
-        # Get the page source and parse with BeautifulSoup
-        page_html = self.driver.page_source
-        soup = BeautifulSoup(page_html, 'html.parser')
-        
-        # Extract search results
-        results = []
-        
-        # Save HTML for debugging (optional)
-        with open("google_source.html", "w", encoding="utf-8") as f:
-            f.write(page_html)
-        print("Saved HTML source to google_source.html for debugging")
+        pages = min(10, -(-num_results // per_page))
+        for result in self.search_many([query], pages=pages, per_page=per_page, num_results=num_results):
+            if result['error']:
+                logger.warning("Search failed", query=query, error=result['error'])
+            return result['results']
+        return []
+    
+    def search_many(self, queries, pages=1, per_page=10, num_results=None, tabs=1):
+        """Search several queries with this instance's browser and yield the results per query.
         
-        # Try multiple selector strategies to find search results
-        print("Extracting information from search results...")
+        Every query is paginated with Google's start parameter until pages pages are loaded,
+        num_results results are collected or a page has no new results. With tabs > 1 that
+        many queries are loaded at the same time, in tabs of the same browser. Results are
+        yielded as soon as a query is done, so with several tabs the order of the queries
+        can change.
         
-        # Method 1: Try the original selectors from info.txt
-        try:
-            organic_results = soup.find("div", {"class": "dURPMd"}).find_all("div", {"class": "Ww4FFb"})
-            print(f"Method 1: Found {len(organic_results)} results")
-            
-            for result in organic_results[:num_results]:
-                data = {}
-                
-                # Extract title
-                try:
-                    data["title"] = result.find("h3").text
-                except:
-                    data["title"] = None
-                
-                # Extract URL
-                try:
-                    url = result.find("a").get('href')
-                    # Clean URL if necessary
-                    if url.startswith('/url?q='):
-                        url = url.split('/url?q=')[1].split('&')[0]
-                    data["url"] = url
-                except:
-                    data["url"] = None
-                
-                # Add result if URL exists
-                if data["url"]:
-                    results.append(data)
-                
-        except Exception as e:
-            print(f"Method 1 failed: {e}")
+        Args:
+            queries (list): Search terms
+            pages (int): Maximum number of results pages per query
+            per_page (int): Results requested per page (Google's num parameter, up to 100)
+            num_results (int, optional): Maximum number of results per query
+            tabs (int): Number of queries loaded at the same time
             
-        # Method 2: Try finding all search result blocks with class "g"
-        if not results:
-            try:
-                search_divs = soup.find_all("div", class_="g")
-                print(f"Method 2: Found {len(search_divs)} results")
+        Yields:
+            dict: {'query', 'results' (dictionaries with 'title', 'url', 'rank' and 'page'),
+                'pages' (pages loaded), 'seconds', 'page_seconds' (load time of every page),
+                'error' (None, or the error that stopped the query)}
+        """
+        pending = collections.deque(queries)
+        handles = self._open_tabs(max(1, tabs))
+        active = {}
+        try:
+            while pending or active:
+                # Give every idle tab the next query
+                for handle in handles:
+                    if handle not in active and pending:
+                        active[handle] = _QueryState(pending.popleft())
                 
-                for div in search_divs[:num_results]:
-                    data = {}
-                    
-                    # Extract title
-                    try:
-                        h3 = div.find("h3")
-                        if h3:
-                            data["title"] = h3.text
-                        else:
-                            # Try alternative title patterns
-                            a_tag = div.find("a")
-                            if a_tag:
-                                h3_like = a_tag.find(["h3", "h4", "div", "span"])
-                                if h3_like:
-                                    data["title"] = h3_like.text
-                    except:
-                        data["title"] = None
-                    
-                    # Extract URL
+                progressed = False
+                now = time.perf_counter()
+                for handle, state in list(active.items()):
                     try:
-                        a_tag = div.find("a")
-                        if a_tag and a_tag.get('href'):
-                            url = a_tag.get('href')
-                            if url.startswith('http'):
-                                data["url"] = url
-                    except:
-                        data["url"] = None
+                        if not state.loading:
+                            if now >= state.next_load_at:
+                                self._load_page(handle, state, per_page)
+                                progressed = True
+                            continue
+                        
+                        self._switch_to(handle)
+                        timed_out = now - state.load_started > self.page_timeout
+                        if not timed_out and not self.driver.execute_script(PAGE_READY_SCRIPT):
+                            continue
+                        if timed_out:
+                            logger.warning("Results page did not finish loading", query=state.query, page=state.page + 1)
+                        progressed = True
+                        done = self._collect_page(state, per_page, pages, num_results)
+                    except WebDriverException as e:
+                        state.error = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+                        done = True
                     
-                    # Add result if URL exists
-                    if data.get("url"):
-                        results.append(data)
-            except Exception as e:
-                print(f"Method 2 failed: {e}")
-        
-        # Method 3: Try another common pattern with "yuRUbf" class
-        if not results:
-            try:
-                search_results = soup.find_all("div", {"class": "yuRUbf"})
-                print(f"Method 3: Found {len(search_results)} results")
+                    if done:
+                        del active[handle]
+                        logger.info("Query finished", query=state.query, results=len(state.results),
+                                    pages=len(state.page_seconds), seconds=round(time.perf_counter() - state.started, 2))
+                        yield state.summary()
                 
-                for result in search_results[:num_results]:
-                    data = {}
-                    
-                    # Extract title
-                    try:
-                        h3 = result.find("h3")
-                        if h3:
-                            data["title"] = h3.text
-                    except:
-                        data["title"] = None
-                    
-                    # Extract URL
-                    try:
-                        url = result.find("a").get('href')
-                        if url.startswith('http'):
-                            data["url"] = url
-                    except:
-                        data["url"] = None
-                    
-                    # Add result if URL exists
-                    if data.get("url"):
-                        results.append(data)
-            except Exception as e:
-                print(f"Method 3 failed: {e}")
+                if not progressed:
+                    time.sleep(0.05)
+        finally:
+            self._close_tabs(handles)
+    
+    def _open_tabs(self, count):
+        """Open extra tabs so count pages can load at the same time. Returns the window handles."""
+        handles = [self.driver.current_window_handle]
+        for _ in range(count - 1):
+            self.driver.switch_to.new_window('tab')
+            handles.append(self.driver.current_window_handle)
+        self._current_handle = handles[-1]
+        return handles
+    
+    def _close_tabs(self, handles):
+        """Close the extra tabs and return to the first one."""
+        try:
+            for handle in handles[1:]:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(handles[0])
+            self._current_handle = handles[0]
+        except WebDriverException as e:
+            logger.debug("Could not close the extra tabs", error=type(e).__name__)
+    
+    def _switch_to(self, handle):
+        if self._current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self._current_handle = handle
+    
+    def _load_page(self, handle, state, per_page):
+        """Start loading the next results page of a query in a tab, without waiting for it."""
+        self._switch_to(handle)
+        formatted_query = state.query.replace(' ', '+')
+        search_url = f"https://www.google.com/search?q={formatted_query}&num={per_page}&start={state.page * per_page}"
+        logger.debug("Navigating to Google search page", query=state.query, page=state.page + 1)
+        # The flag only exists on the current document, so the page is ready once it is gone
+        self.driver.execute_script("window.__serpPending = true; window.location.href = arguments[0];", search_url)
+        state.loading = True
+        state.load_started = time.perf_counter()
+    
+    def _collect_page(self, state, per_page, pages, num_results):
+        """Parse the loaded results page of a query. Returns True when the query is done."""
+        page_html = self.driver.page_source
+        state.loading = False
+        state.page_seconds.append(round(time.perf_counter() - state.load_started, 3))
+        state.page += 1
         
-        # Method 4: Most generic approach
-        if not results:
-            try:
-                all_links = soup.find_all("a")
-                print(f"Method 4: Found {len(all_links)} links")
-                
-                result_count = 0
-                for link in all_links:
-                    if result_count >= num_results:
-                        break
-                        
-                    href = link.get('href')
-                    if href and href.startswith('http') and 'google' not in href:
-                        data = {}
-                        data["url"] = href
-                        
-                        # Try to find title near the link
-                        try:
-                            # Check nearby h3 tags
-                            parent = link.parent
-                            h3 = parent.find("h3")
-                            if h3:
-                                data["title"] = h3.text
-                            else:
-                                # Use link text as fallback title
-                                data["title"] = link.text.strip()
-                                if not data["title"]:
-                                    data["title"] = href
-                        except:
-                            data["title"] = href
-                        
-                        # Add result if not already in results
-                        if data["url"] and not any(r.get("url") == data["url"] for r in results):
-                            results.append(data)
-                            result_count += 1
-            except Exception as e:
-                print(f"Method 4 failed: {e}")
+        # Save HTML for debugging (optional)
+        if self.dump_html:
+            os.makedirs(self.dump_html, exist_ok=True)
+            filename = os.path.join(self.dump_html, f"{_slug(state.query)}-page{state.page}.html")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(page_html)
+            logger.debug("Saved HTML source for debugging", file=filename)
         
-        # Remove any remaining Google-related URLs
-        results = [result for result in results if 'google.com' not in result.get("url", "")]
+        new_results = 0
+        for result in parse_serp(page_html):
+            if result['url'] in state.seen:
+                continue
+            if num_results is not None and len(state.results) >= num_results:
+                break
+            state.seen.add(result['url'])
+            state.results.append(dict(result, rank=len(state.results) + 1, page=state.page))
+            new_results += 1
         
-        return results
+        if new_results == 0 or state.page >= pages or (num_results is not None and len(state.results) >= num_results):
+            return True
+        state.next_load_at = time.perf_counter() + self.page_delay
+        return False
     
     def save_to_csv(self, results, filename="google_results.csv"):
         """Save the extracted results to a CSV file.
@@ -215,7 +234,7 @@ class GoogleScraper:
         """
         df = pd.DataFrame(results)
         df.to_csv(filename, index=False, encoding='utf-8')
-        print(f"Results saved to {filename}")
+        logger.info("Results saved", file=filename, results=len(results))
     
     def close(self):
         """Close the browser and release resources."""
@@ -223,7 +242,7 @@ class GoogleScraper:
             try:
                 self.driver.quit()
             except Exception as e:
-                print(f"Note: Could not terminate browser process cleanly, but this is normal. Error: {type(e).__name__}")
+                logger.debug("Could not terminate browser process cleanly, this is normal", error=type(e).__name__)
             
     def __del__(self):
         """Destructor to ensure browser is closed."""
@@ -231,6 +250,8 @@ class GoogleScraper:
 
 
 def main():
+    configure_logging()
+
     # Example usage
     query = input("Enter search term: ")
     num_results = int(input("Enter number of results to extract (default 10): ") or "10")
@@ -240,7 +261,7 @@ def main():
     
     try:
         # Perform the search and get results
-        print(f"Searching for: {query}")
+        logger.info("Searching", query=query)
         results = scraper.search(query, num_results)
         
         # Print the results
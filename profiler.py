@@ -0,0 +1,268 @@
+import os
+import sys
+import pstats
+import cProfile
+import threading
+import contextlib
+import contextvars
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Pipeline stages in the order they are reported
+STAGES = ['serp_browser', 'serp_parse', 'fetch', 'extraction', 'export']
+
+# Returned by stage() while profiling is off, so the disabled case costs one function call
+_NULL_STAGE = contextlib.nullcontext()
+
+# The profiler started by start_profiling(), if any
+_active = None
+
+# Stages the current task is in, innermost last. Every asyncio task has its own copy, so
+# concurrent tasks cannot leave each other's stages.
+_stage_stack = contextvars.ContextVar('profiler_stage_stack', default=())
+
+class StageProfiler:
+    """
+    Profiles the pipeline and attributes the time to the stage that is running.
+
+    Stages are marked with the stage() context manager and can be nested, the innermost
+    stage gets the time. Each asyncio task has its own stack of stages, and a task that
+    leaves a stage goes back to its own outer stage. The profile is per thread though:
+    the stage entered or returned to last also gets the time of whatever else the event
+    loop runs before the next stage change.
+
+    Work handed to a worker thread (asyncio.to_thread) is not seen by stage(), which only
+    profiles the event loop thread waiting for it. Such functions are wrapped with call(),
+    which profiles them in their own thread and adds them to the stage.
+
+    Modes:
+        'cprofile': Deterministic profile per stage, written as <stage>.pstats
+        'sample': Samples the stacks of the main thread and of the worker threads in
+            call() at a fixed interval, written as
+            <stage>.collapsed (one "frame;frame;frame count" line per stack, the input
+            format of flamegraph.pl and speedscope)
+    """
+
+    def __init__(self, mode='cprofile', output_dir='profiles', interval=0.005):
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self._current = None  # Stage that gets the time right now
+        self._profiles = {}
+        self._samples = {}
+        self._sample_counts = {}
+        self._thread_profiles = {}  # Stage -> profiles of worker threads
+        self._threads = {}  # Worker thread id -> stage, for the sampler
+        self._lock = threading.Lock()
+        self._thread_id = threading.get_ident()
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Attribute the time spent in the with block to a stage."""
+        outer = _stage_stack.get()
+        _stage_stack.set(outer + (name,))
+        self._switch(name)
+        try:
+            yield
+        finally:
+            _stage_stack.set(outer)
+            self._switch(outer[-1] if outer else None)
+
+    def call(self, name, func, *args):
+        """
+        Call func(*args) and attribute its time to a stage, also in a worker thread.
+
+        Example:
+            page_html = await asyncio.to_thread(profiler.call, 'serp_browser', load_page, url)
+        """
+        if threading.get_ident() == self._thread_id:
+            with self.stage(name):
+                return func(*args)
+        if self._stopped.is_set():
+            return func(*args)
+        if self.mode == 'sample':
+            thread_id = threading.get_ident()
+            self._threads[thread_id] = name
+            try:
+                return func(*args)
+            finally:
+                del self._threads[thread_id]
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            with self._lock:
+                self._thread_profiles.setdefault(name, []).append(profile)
+
+    def _switch(self, name):
+        if self._stopped.is_set() or name == self._current:
+            return
+        if self.mode == 'cprofile':
+            if self._current is not None:
+                self._profiles[self._current].disable()
+            if name is not None:
+                profile = self._profiles.get(name)
+                if profile is None:
+                    profile = self._profiles[name] = cProfile.Profile()
+                profile.enable()
+        self._current = name
+
+    def start(self):
+        if self.mode == 'sample':
+            self._sampler = threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self._switch(None)
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self.interval):
+            threads = dict(self._threads)
+            if self._current is not None:
+                threads[self._thread_id] = self._current
+            if not threads:
+                continue
+            frames_by_thread = sys._current_frames()
+            for thread_id, stage in threads.items():
+                frame = frames_by_thread.get(thread_id)
+                if frame is not None:
+                    self._add_sample(stage, frame)
+
+    def _add_sample(self, stage, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        key = ';'.join(reversed(frames))
+        samples = self._samples.setdefault(stage, {})
+        samples[key] = samples.get(key, 0) + 1
+        self._sample_counts[stage] = self._sample_counts.get(stage, 0) + 1
+
+    def _ordered_stages(self):
+        if self.mode == 'cprofile':
+            names = list(self._profiles) + [stage for stage in self._thread_profiles if stage not in self._profiles]
+        else:
+            names = list(self._samples)
+        return [stage for stage in STAGES if stage in names] + [stage for stage in names if stage not in STAGES]
+
+    def _stats(self, stage):
+        """Combined statistics of a stage's event loop and worker thread profiles."""
+        profiles = ([self._profiles[stage]] if stage in self._profiles else []) + self._thread_profiles.get(stage, [])
+        return pstats.Stats(*profiles)
+
+    def save(self):
+        """
+        Write one profile file per stage.
+
+        Returns:
+            list: The written file names
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        filenames = []
+        for stage in self._ordered_stages():
+            if self.mode == 'cprofile':
+                filename = os.path.join(self.output_dir, f"{stage}.pstats")
+                self._stats(stage).dump_stats(filename)
+            else:
+                filename = os.path.join(self.output_dir, f"{stage}.collapsed")
+                with open(filename, 'w', encoding='utf-8') as f:
+                    for stack, count in sorted(self._samples[stage].items()):
+                        f.write(f"{stack} {count}\n")
+            filenames.append(filename)
+        logger.info("Profiles saved", directory=self.output_dir, stages=len(filenames))
+        return filenames
+
+    def hot_functions(self, stage, top_n=10):
+        """
+        Return the functions with the most time of their own in a stage.
+
+        Returns:
+            list: (function, own seconds or samples, total seconds or samples) tuples
+        """
+        if self.mode == 'cprofile':
+            stats = self._stats(stage).stats
+            rows = [
+                (f"{name} ({os.path.basename(filename)}:{line})", tottime, cumtime)
+                for (filename, line, name), (calls, primitive, tottime, cumtime, callers) in stats.items()
+            ]
+        else:
+            own = {}
+            total = {}
+            for stack, count in self._samples[stage].items():
+                frames = stack.split(';')
+                own[frames[-1]] = own.get(frames[-1], 0) + count
+                for frame in set(frames):
+                    total[frame] = total.get(frame, 0) + count
+            rows = [(frame, count, total[frame]) for frame, count in own.items()]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:top_n]
+
+    def print_summary(self, top_n=10, stream=None):
+        """Print the hottest functions of every stage."""
+        stream = stream or sys.stdout
+        unit = 'seconds' if self.mode == 'cprofile' else f"samples of {self.interval * 1000:g} ms"
+        for stage in self._ordered_stages():
+            if self.mode == 'cprofile':
+                stats = self._stats(stage)
+                header = f"{stats.total_tt:.3f} s in {stats.total_calls} calls"
+            else:
+                header = f"{self._sample_counts.get(stage, 0)} samples"
+            stream.write(f"\n{stage}: {header} (own / total {unit})\n")
+            for function, own, total in self.hot_functions(stage, top_n):
+                if self.mode == 'cprofile':
+                    stream.write(f"  {own:9.4f} {total:9.4f}  {function}\n")
+                else:
+                    stream.write(f"  {own:9d} {total:9d}  {function}\n")
+        stream.flush()
+
+def start_profiling(mode='cprofile', output_dir='profiles', interval=0.005):
+    """Start profiling the pipeline stages. Returns the StageProfiler."""
+    global _active
+    _active = StageProfiler(mode, output_dir, interval)
+    _active.start()
+    return _active
+
+def stop_profiling(top_n=10):
+    """Stop profiling, write the per-stage profiles and print the hot function summary."""
+    global _active
+    profiler, _active = _active, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    profiler.save()
+    profiler.print_summary(top_n)
+    return profiler
+
+def call_in_stage(name, func, *args):
+    """
+    Call func(*args) as part of a pipeline stage. Unlike stage(), this also profiles
+    functions that run in a worker thread.
+
+    Example:
+        await asyncio.to_thread(call_in_stage, 'serp_browser', driver.get, search_url)
+    """
+    if _active is None:
+        return func(*args)
+    return _active.call(name, func, *args)
+
+def stage(name):
+    """
+    Mark a pipeline stage for the profiler.
+
+    Example:
+        with stage('serp_parse'):
+            results = parse_serp(page_html)
+    """
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name)
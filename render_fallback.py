@@ -0,0 +1,204 @@
+import time
+import asyncio
+from browser_pool import BrowserPool
+from email_extractor import extract_emails, categorize_email
+from profiler import stage as profile_stage
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Returned by _next_result when the static results are exhausted
+_RESULTS_EXHAUSTED = object()
+
+async def _next_result(result_iterator):
+    try:
+        return await anext(result_iterator)
+    except StopAsyncIteration:
+        return _RESULTS_EXHAUSTED
+
+class RenderFallback:
+    """
+    Second extraction tier that scans the rendered DOM of sites in a headless browser.
+
+    Sites that render their contact details with JavaScript return HTML but no emails to
+    the static fetch. Those sites, and only those, are loaded again in a small pool of
+    browsers. The tier is bounded twice: at most 'browsers' pages render at the same time,
+    and no render starts after 'budget' seconds, so the static results keep flowing at
+    full speed and a slow tier cannot stretch a run. Sites that miss the budget are passed
+    on unchanged, with their 'render' metadata set to 'skipped'.
+
+    Example:
+        fallback = RenderFallback(browsers=2, budget=120)
+        try:
+            results = await scrape_websites_for_emails(urls, render_fallback=fallback)
+        finally:
+            await fallback.close()
+    """
+
+    def __init__(self, browsers=1, budget=120.0, page_timeout=15.0, settle=1.0, chrome_options=None, pool=None):
+        """
+        Args:
+            browsers (int): Maximum number of pages rendered at the same time
+            budget (float): Seconds after the first render during which renders may start
+            page_timeout (float): Seconds a page may take to load
+            settle (float): Seconds to wait after the page has loaded, for scripts that fill
+                in the page afterwards
+            chrome_options (Options, optional): Chrome options, defaults to build_chrome_options()
+            pool (BrowserPool, optional): Pool to borrow browsers from instead of starting one.
+                It is left open by close().
+        """
+        self.budget = budget
+        self.page_timeout = page_timeout
+        self.settle = settle
+        self.pool = pool or BrowserPool(browsers, chrome_options)
+        self._owns_pool = pool is None
+        self._slots = asyncio.Semaphore(max(1, browsers))
+        self._started = None
+        self.deadline = None  # time.monotonic() value set by a run with a deadline
+        self.rendered = 0
+        self.skipped = 0
+        self.emails_found = 0
+
+    def wants(self, result):
+        """Return True if a static result returned HTML without any emails."""
+        return (not result.emails and not result.error and result.html_pages > 0
+                and result.get_extra('render') is None)
+
+    def remaining(self):
+        """Seconds left in the budget, the full budget before the first render."""
+        now = time.monotonic()
+        remaining = self.budget if self._started is None else self.budget - (now - self._started)
+        if self.deadline is not None:
+            remaining = min(remaining, self.deadline - now)
+        return remaining
+
+    async def render(self, result):
+        """
+        Load the site of a result in a browser and add the emails of the rendered page.
+
+        Args:
+            result (SiteResult): Result of the static fetch, updated in place
+
+        Returns:
+            SiteResult: The same result
+        """
+        if self._started is None:
+            self._started = time.monotonic()
+
+        # Wait for a free browser, but not past the end of the budget
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0, self.remaining()))
+        except asyncio.TimeoutError:
+            return self._skip(result)
+        try:
+            if self.remaining() <= 0:
+                return self._skip(result)
+
+            start = time.monotonic()
+            try:
+                async with self.pool.browser() as driver:
+                    html = await asyncio.to_thread(self._load, driver, result.url)
+            except Exception as e:
+                result.set_extra('render', 'failed')
+                logger.debug("Could not render page", url=result.url, error=str(e) or type(e).__name__)
+                return result
+        finally:
+            self._slots.release()
+
+        with profile_stage('extraction'):
+            emails = self._add_emails(result, extract_emails(html))
+        seconds = round(time.monotonic() - start, 3)
+        result.set_extra('render', 'done')
+        result.set_extra('render_seconds', seconds)
+        self.rendered += 1
+        self.emails_found += emails
+        logger.debug("Rendered page", url=result.url, emails=emails, seconds=seconds)
+        return result
+
+    def _load(self, driver, url):
+        """Load a page and return its DOM once scripts had time to run. Runs in a worker thread."""
+        driver.set_page_load_timeout(self.page_timeout)
+        driver.get(url)
+        deadline = time.monotonic() + self.page_timeout
+        while driver.execute_script("return document.readyState") != 'complete':
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        if self.settle:
+            time.sleep(self.settle)
+        return driver.page_source
+
+    def _add_emails(self, result, page_emails):
+        """Merge emails found in the rendered page into a result and return how many are new."""
+        domain = result.domain
+        base_domain = '.'.join(domain.split('.')[-2:]) if len(domain.split('.')) > 1 else domain
+        seen = set(result.emails)
+        added = 0
+        for email in page_emails:
+            if email in seen:
+                continue
+            seen.add(email)
+            result.add_email(email, categorize_email(email))
+            added += 1
+            if base_domain in email.split('@')[1]:
+                result.domain_matches += 1
+        return added
+
+    def _skip(self, result):
+        result.set_extra('render', 'skipped')
+        self.skipped += 1
+        return result
+
+    async def iter_results(self, results):
+        """
+        Pass static results through and send the ones without emails to the browsers.
+
+        Results that are not rendered are yielded as soon as they arrive. Rendered results
+        are yielded when their render finishes, so the order can change.
+
+        Args:
+            results: Async iterable of results, such as iter_site_results()
+
+        Yields:
+            SiteResult: The URL, the extracted emails and the metadata of a site
+        """
+        result_iterator = aiter(results)
+        next_result = None  # Pending read from results
+        exhausted = False
+        pending = set()
+
+        try:
+            while True:
+                if not exhausted and next_result is None:
+                    next_result = asyncio.ensure_future(_next_result(result_iterator))
+                waiting = pending if next_result is None else pending | {next_result}
+                if not waiting:
+                    return
+
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is next_result:
+                        result, next_result = task.result(), None
+                        if result is _RESULTS_EXHAUSTED:
+                            exhausted = True
+                        elif self.wants(result):
+                            pending.add(asyncio.ensure_future(self.render(result)))
+                        else:
+                            yield result
+                    else:
+                        pending.discard(task)
+                        yield task.result()
+        finally:
+            # Cancel the remaining work when the consumer stops early
+            for task in pending:
+                task.cancel()
+            if next_result is not None:
+                next_result.cancel()
+            if self.rendered or self.skipped:
+                logger.info("Render fallback finished", rendered=self.rendered, skipped=self.skipped,
+                            emails=self.emails_found)
+
+    async def close(self):
+        """Close the browsers, unless the pool was passed in."""
+        if self._owns_pool:
+            await self.pool.close()
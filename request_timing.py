@@ -0,0 +1,200 @@
+import math
+import time
+import json
+import aiohttp
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Stages in the order they are reported
+STAGES = ['dns', 'connect', 'ttfb', 'body', 'regex', 'categorize']
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets.
+
+    Memory stays constant no matter how many samples are added. Percentiles are
+    reported as the upper bound of the bucket they fall in (within 10% of the real value).
+    """
+
+    # Bucket i holds values up to MIN_VALUE * GROWTH ** i seconds
+    MIN_VALUE = 0.0001
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Add a single sample in seconds."""
+        if seconds <= self.MIN_VALUE:
+            index = 0
+        else:
+            index = math.ceil(math.log(seconds / self.MIN_VALUE, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.MIN_VALUE * self.GROWTH ** index, self.max)
+        return self.max
+
+    def stats(self):
+        """Return count, mean, p50, p95, p99 and max in milliseconds."""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p95_ms': round(self.percentile(95) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+class LatencyRecorder:
+    """
+    Collects latency histograms per stage and per host.
+
+    Stages are 'dns', 'connect' (TCP and TLS), 'ttfb' (request sent until response
+    headers), 'body' (reading the response body), 'regex' (scanning for and validating
+    emails) and 'categorize' (deduplicating and categorizing the matches).
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.hosts = {}
+
+    def record(self, stage, seconds, host=None):
+        """Record a sample for a stage, and for the host if given."""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.add(seconds)
+
+        if host:
+            host_stages = self.hosts.get(host)
+            if host_stages is None:
+                host_stages = self.hosts[host] = {}
+            histogram = host_stages.get(stage)
+            if histogram is None:
+                histogram = host_stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    def stage_stats(self):
+        """Return the statistics of every stage."""
+        ordered = [stage for stage in STAGES if stage in self.stages]
+        ordered += [stage for stage in self.stages if stage not in STAGES]
+        return {stage: self.stages[stage].stats() for stage in ordered}
+
+    def host_stats(self, top_n=None):
+        """
+        Return the statistics of every stage per host.
+
+        Args:
+            top_n (int, optional): Only the hosts with the highest total time to first byte
+
+        Returns:
+            dict: Host name to stage statistics
+        """
+        hosts = sorted(
+            self.hosts.items(),
+            key=lambda item: item[1]['ttfb'].total if 'ttfb' in item[1] else 0.0,
+            reverse=True
+        )
+        if top_n is not None:
+            hosts = hosts[:top_n]
+        return {host: {stage: histogram.stats() for stage, histogram in stages.items()} for host, stages in hosts}
+
+    def to_dict(self, top_hosts=None):
+        """Return all statistics as a JSON-serializable dictionary."""
+        return {'stages': self.stage_stats(), 'hosts': self.host_stats(top_hosts)}
+
+    def write_report(self, f, top_hosts=10):
+        """Write the latency section of the text summary report to an open file."""
+        if not self.stages:
+            return
+        f.write(f"\nLatency by stage (p50 / p95 / p99 ms):\n")
+        for stage, stats in self.stage_stats().items():
+            f.write(f"- {stage}: {stats['p50_ms']} / {stats['p95_ms']} / {stats['p99_ms']} "
+                    f"({stats['count']} samples)\n")
+
+        f.write(f"\nSlowest hosts by time to first byte (p50 / p95 / p99 ms):\n")
+        for i, (host, stages) in enumerate(self.host_stats(top_hosts).items(), 1):
+            stats = stages.get('ttfb')
+            if stats:
+                f.write(f"{i}. {host}: {stats['p50_ms']} / {stats['p95_ms']} / {stats['p99_ms']}\n")
+
+    def save_json(self, filename="latency_report.json"):
+        """Save the statistics as JSON."""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logger.info("Latency report saved", file=filename)
+
+def add_site_timing(timings, stage, seconds):
+    """Add time spent in a stage to the per-site timings stored in the result metadata."""
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+def create_trace_config(recorder):
+    """
+    Create an aiohttp TraceConfig that records DNS, connect and TTFB times.
+
+    Pass a dictionary as trace_request_ctx to session.get() to also add the times
+    to that dictionary (in milliseconds).
+
+    Args:
+        recorder (LatencyRecorder): Recorder to store the samples in
+
+    Returns:
+        aiohttp.TraceConfig: The trace configuration for the ClientSession
+    """
+    async def on_request_start(session, context, params):
+        context.host = params.url.host
+        context.request_start = time.perf_counter()
+
+    async def on_dns_resolvehost_start(session, context, params):
+        context.dns_start = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, context, params):
+        elapsed = time.perf_counter() - context.dns_start
+        recorder.record('dns', elapsed, params.host)
+        add_site_timing(context.trace_request_ctx, 'dns', elapsed)
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_start = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        elapsed = time.perf_counter() - context.connect_start
+        recorder.record('connect', elapsed, getattr(context, 'host', None))
+        add_site_timing(context.trace_request_ctx, 'connect', elapsed)
+
+    async def on_request_headers_sent(session, context, params):
+        context.headers_sent = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        # Fired once the response headers have been received. Time to first byte is
+        # measured from the moment the request was sent, so it excludes DNS and connect.
+        elapsed = time.perf_counter() - getattr(context, 'headers_sent', context.request_start)
+        recorder.record('ttfb', elapsed, context.host)
+        add_site_timing(context.trace_request_ctx, 'ttfb', elapsed)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_headers_sent.append(on_request_headers_sent)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
@@ -0,0 +1,372 @@
+import json
+import time
+import sqlite3
+import argparse
+from urllib.parse import urlparse
+from scraper_logging import get_logger, configure_logging, add_logging_arguments
+from site_result import as_site_result, matches_site_domain
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    sites INTEGER NOT NULL DEFAULT 0,
+    emails INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    domain TEXT NOT NULL,
+    status TEXT,
+    error TEXT,
+    pages_checked INTEGER NOT NULL DEFAULT 0,
+    domain_matches INTEGER NOT NULL DEFAULT 0,
+    email_count INTEGER NOT NULL DEFAULT 0,
+    first_run_id INTEGER REFERENCES runs (id),
+    last_run_id INTEGER REFERENCES runs (id),
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS emails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL REFERENCES sites (id),
+    email TEXT NOT NULL,
+    category TEXT NOT NULL,
+    domain_match INTEGER NOT NULL DEFAULT 0,
+    first_run_id INTEGER REFERENCES runs (id),
+    last_run_id INTEGER REFERENCES runs (id),
+    UNIQUE (site_id, email)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sites_domain ON sites (domain);
+CREATE INDEX IF NOT EXISTS idx_emails_email ON emails (email);
+CREATE INDEX IF NOT EXISTS idx_emails_category ON emails (category);
+"""
+
+def normalize_domain(value):
+    """Lowercase a domain or URL and strip the scheme, port and a leading 'www.'."""
+    value = value.strip().lower()
+    if '://' in value:
+        value = urlparse(value).netloc
+    value = value.split(':')[0]
+    if value.startswith('www.'):
+        value = value[4:]
+    return value
+
+class ResultDatabase:
+    """
+    SQLite database of scraping results that is kept across runs.
+
+    Results are stored in normalized tables: 'runs' has one row per scraping run,
+    'sites' one row per URL and 'emails' one row per (site, email) with its category.
+    Sites and emails are upserted, so a later successful scrape of a site replaces what an
+    earlier run found, and the emails the site no longer has are deleted. A failed scrape
+    keeps the stored emails and status of the site.
+
+    The database can be passed to scrape_websites_for_emails as an exporter: results are
+    buffered and written in batches, one transaction per batch.
+    """
+
+    def __init__(self, path="scraping_results.db", query=None, batch_size=200):
+        self.path = path
+        self.query = query
+        self.batch_size = batch_size
+        self.run_id = None
+        self._buffer = []
+        self._sites = 0
+        self._emails = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def start_run(self, query=None):
+        """
+        Start a new run. Called automatically on the first write.
+
+        Returns:
+            int: The run id
+        """
+        if query is not None:
+            self.query = query
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (query, started_at) VALUES (?, ?)",
+                (self.query, time.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def write(self, result, domain=None):
+        """Buffer a single result and write the batch when it is full."""
+        if self.run_id is None:
+            self.start_run()
+        self._buffer.append(as_site_result(result))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Upsert the buffered results in a single transaction."""
+        if not self._buffer:
+            return
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        run_id = self.run_id
+
+        with self.conn:
+            for result in self._buffer:
+                url = result.url
+                domain = normalize_domain(result.domain or url)
+
+                if result.status != 'success':
+                    # A failed scrape says nothing about the emails of a site, so a site that
+                    # is already stored keeps its emails and status, only the run is updated
+                    self.conn.execute(
+                        """
+                        INSERT INTO sites (url, domain, status, error, pages_checked, domain_matches,
+                                           email_count, first_run_id, last_run_id, updated_at)
+                        VALUES (?, ?, ?, ?, ?, 0, 0, ?, ?, ?)
+                        ON CONFLICT (url) DO UPDATE SET
+                            last_run_id = excluded.last_run_id,
+                            updated_at = excluded.updated_at
+                        """,
+                        (url, domain, result.status, result.error, result.pages_checked, run_id, run_id, now)
+                    )
+                    self._sites += 1
+                    continue
+
+                # Emails removed from the result by the seen filter are still on the site
+                email_categories = list(result.all_email_categories())
+                domain_matches = result.domain_matches + sum(
+                    1 for email, _ in result.removed or () if matches_site_domain(email, result.domain))
+
+                self.conn.execute(
+                    """
+                    INSERT INTO sites (url, domain, status, error, pages_checked, domain_matches,
+                                       email_count, first_run_id, last_run_id, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        status = excluded.status,
+                        error = excluded.error,
+                        pages_checked = excluded.pages_checked,
+                        domain_matches = excluded.domain_matches,
+                        email_count = excluded.email_count,
+                        last_run_id = excluded.last_run_id,
+                        updated_at = excluded.updated_at
+                    """,
+                    (url, domain, result.status, result.error, result.pages_checked, domain_matches,
+                     len(email_categories), run_id, run_id, now)
+                )
+                site_id = self.conn.execute("SELECT id FROM sites WHERE url = ?", (url,)).fetchone()[0]
+
+                # Emails an earlier scrape found that the site no longer has are removed,
+                # so the emails of a site always match its email_count
+                current = {email for email, _ in email_categories}
+                self.conn.executemany(
+                    "DELETE FROM emails WHERE id = ?",
+                    [(email_id,) for email_id, email in
+                     self.conn.execute("SELECT id, email FROM emails WHERE site_id = ?", (site_id,))
+                     if email not in current]
+                )
+
+                # Every email is stored once per site with its category
+                self.conn.executemany(
+                    """
+                    INSERT INTO emails (site_id, email, category, domain_match, first_run_id, last_run_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (site_id, email) DO UPDATE SET
+                        category = excluded.category,
+                        domain_match = excluded.domain_match,
+                        last_run_id = excluded.last_run_id
+                    """,
+                    [
+                        (site_id, email, category or 'other',
+                         int(normalize_domain(email.split('@')[-1]) == domain), run_id, run_id)
+                        for email, category in email_categories
+                    ]
+                )
+
+                self._sites += 1
+                self._emails += len(email_categories)
+
+            self.conn.execute(
+                "UPDATE runs SET sites = ?, emails = ? WHERE id = ?",
+                (self._sites, self._emails, run_id)
+            )
+        self._buffer = []
+
+    def close(self):
+        """Write the remaining results, finish the run and close the database."""
+        if self.conn is None:
+            return
+        self.flush()
+        if self.run_id is not None:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE runs SET finished_at = ? WHERE id = ?",
+                    (time.strftime("%Y-%m-%d %H:%M:%S"), self.run_id)
+                )
+            logger.info("Results saved to database", file=self.path, results=self._sites, run=self.run_id)
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def find_emails(self, domain=None, category=None, email=None, run_id=None, limit=None):
+        """
+        Look up stored emails.
+
+        Args:
+            domain (str, optional): Only emails found on this domain (with or without 'www.')
+            category (str, optional): Only emails in this category, such as 'sales'
+            email (str, optional): Only this email address
+            run_id (int, optional): Only emails seen in this run
+            limit (int, optional): Maximum number of rows
+
+        Returns:
+            list: Dictionaries with the email, category, domain, url and run ids
+        """
+        conditions = []
+        params = []
+        if domain:
+            conditions.append("sites.domain = ?")
+            params.append(normalize_domain(domain))
+        if category:
+            conditions.append("emails.category = ?")
+            params.append(category.lower())
+        if email:
+            conditions.append("emails.email = ?")
+            params.append(email.lower())
+        if run_id:
+            conditions.append("emails.last_run_id = ?")
+            params.append(run_id)
+
+        sql = (
+            "SELECT emails.email, emails.category, emails.domain_match, sites.domain, sites.url, "
+            "emails.first_run_id, emails.last_run_id "
+            "FROM emails JOIN sites ON sites.id = emails.site_id"
+        )
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY sites.domain, emails.email"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def find_sites(self, domain=None, has_emails=None, limit=None):
+        """
+        Look up stored sites.
+
+        Args:
+            domain (str, optional): Only sites on this domain
+            has_emails (bool, optional): Only sites with (True) or without (False) emails
+            limit (int, optional): Maximum number of rows
+
+        Returns:
+            list: Dictionaries with the stored site columns
+        """
+        conditions = []
+        params = []
+        if domain:
+            conditions.append("domain = ?")
+            params.append(normalize_domain(domain))
+        if has_emails is not None:
+            conditions.append("email_count > 0" if has_emails else "email_count = 0")
+
+        sql = "SELECT * FROM sites"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY domain, url"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def domain_stats(self):
+        """
+        Return how often the sites of each domain had emails in earlier runs.
+
+        Returns:
+            dict: Domain to a (sites, sites with emails) tuple
+        """
+        rows = self.conn.execute(
+            "SELECT domain, COUNT(*), SUM(email_count > 0) FROM sites GROUP BY domain"
+        )
+        return {domain: (sites, hits or 0) for domain, sites, hits in rows}
+
+    def runs(self):
+        """Return all runs, most recent first."""
+        return [dict(row) for row in self.conn.execute("SELECT * FROM runs ORDER BY id DESC")]
+
+def import_results(path, database):
+    """Import results from a JSON or JSONL file into the database. Returns the number of results."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            results = (json.loads(line) for line in f if line.strip())
+        else:
+            results = json.load(f)
+        count = 0
+        for result in results:
+            database.write(result)
+            count += 1
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the scraping results database")
+    parser.add_argument('--db', default='scraping_results.db', help="Database file (default: scraping_results.db)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    emails = subparsers.add_parser('emails', help="Look up emails")
+    emails.add_argument('--domain', help="Only emails found on this domain")
+    emails.add_argument('--category', help="Only emails in this category (contact, sales, support, ...)")
+    emails.add_argument('--email', help="Only this email address")
+    emails.add_argument('--run', type=int, help="Only emails seen in this run")
+    emails.add_argument('--limit', type=int, help="Maximum number of rows")
+
+    sites = subparsers.add_parser('sites', help="Look up sites")
+    sites.add_argument('--domain', help="Only sites on this domain")
+    sites.add_argument('--with-emails', action='store_true', help="Only sites with emails")
+    sites.add_argument('--limit', type=int, help="Maximum number of rows")
+
+    subparsers.add_parser('runs', help="List the runs")
+
+    importer = subparsers.add_parser('import', help="Import a search_results.json or .jsonl file")
+    importer.add_argument('file', help="File to import")
+    importer.add_argument('--query', help="Search term to record for the run")
+
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level, args.log_format, args.quiet, args.log_file)
+
+    database = ResultDatabase(args.db)
+    try:
+        if args.command == 'emails':
+            for row in database.find_emails(args.domain, args.category, args.email, args.run, args.limit):
+                print(f"{row['email']}\t{row['category']}\t{row['domain']}\t{row['url']}")
+        elif args.command == 'sites':
+            for row in database.find_sites(args.domain, True if args.with_emails else None, args.limit):
+                print(f"{row['url']}\t{row['status']}\t{row['email_count']} emails\trun {row['last_run_id']}")
+        elif args.command == 'runs':
+            for row in database.runs():
+                print(f"{row['id']}\t{row['started_at']}\t{row['sites']} sites\t{row['emails']} emails\t{row['query'] or ''}")
+        elif args.command == 'import':
+            database.start_run(args.query)
+            count = import_results(args.file, database)
+            logger.info("Imported results", file=args.file, results=count)
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    main()
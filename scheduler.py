@@ -0,0 +1,197 @@
+import time
+import heapq
+import asyncio
+import itertools
+from urllib.parse import urlparse
+from results_db import normalize_domain
+
+# How fast the expected yield falls with the position in the search results. Rank 1 counts
+# fully, rank 34 half and rank 100 about a quarter.
+RANK_DECAY = 0.03
+
+# Weight of the rank-based estimate against the history of a domain, in sites. A domain
+# with this many past sites counts as much as the estimate.
+PRIOR_SITES = 2
+
+# Weight of the latest site when updating the average time per site of a host
+LATENCY_SMOOTHING = 0.3
+
+# Returned by _next_url when an async iterable of URLs is exhausted
+_URLS_EXHAUSTED = object()
+
+async def _next_url(url_iterator):
+    try:
+        return await anext(url_iterator)
+    except StopAsyncIteration:
+        return _URLS_EXHAUSTED
+
+class PriorityScheduler:
+    """
+    Hands out the URLs to extract in order of expected emails per second.
+
+    The expected yield of a site combines its position in the search results, the share of
+    the domain's sites that had emails in earlier runs (from the results database) and the
+    share of sites with emails in this run. The expected time is the average time per site
+    of its host in this run, or of all sites while the host is new. Every finished site
+    updates both, and queued sites are scored again when they come up, so sites of slow or
+    empty hosts move back while the run is going on.
+
+    The scheduler is meant for runs with a deadline: scrape_websites_for_emails reads the
+    URLs from iter_urls() one at a time as requests become free, and stops at the deadline,
+    so the sites that are dropped are the least promising ones.
+
+    Example:
+        scheduler = PriorityScheduler(result_db.domain_stats())
+        results = await scrape_websites_for_emails(urls, deadline=300, scheduler=scheduler)
+    """
+
+    def __init__(self, history=None, default_seconds=2.0, lookahead=10000):
+        """
+        Args:
+            history (dict, optional): Domain to (sites, sites with emails) of earlier runs, as
+                returned by ResultDatabase.domain_stats()
+            default_seconds (float): Expected time per site until the first site finished
+            lookahead (int): Maximum number of URLs read ahead and ordered, so a streamed URL
+                list is never loaded as a whole
+        """
+        self.history = dict(history or {})
+        self.lookahead = lookahead
+        self.site_seconds = default_seconds
+        self.host_seconds = {}
+        self.sites = 0
+        self.hits = 0
+        self._queue = []
+        self._order = itertools.count()
+        self._dispatched = {}
+
+    def expected_yield(self, url, rank):
+        """Return the estimated chance that a site has emails."""
+        run_rate = (self.hits + 1) / (self.sites + 2)
+        prior = run_rate / (1 + RANK_DECAY * (rank - 1))
+        sites, hits = self.history.get(normalize_domain(url), (0, 0))
+        return (hits + PRIOR_SITES * prior) / (sites + PRIOR_SITES)
+
+    def expected_seconds(self, url):
+        """Return the estimated time to extract a site."""
+        return self.host_seconds.get(urlparse(url).netloc, self.site_seconds)
+
+    def score(self, url, rank):
+        """Return the expected emails per second of a site, higher is extracted first."""
+        return self.expected_yield(url, rank) / max(self.expected_seconds(url), 0.001)
+
+    def add(self, url, rank):
+        """
+        Queue a URL.
+
+        Args:
+            url (str): URL to extract
+            rank (int): Position in the search results or in the URL list, starting at 1
+        """
+        heapq.heappush(self._queue, (-self.score(url, rank), next(self._order), url, rank))
+
+    def pop(self):
+        """Return the queued URL with the highest score, or None when the queue is empty."""
+        while self._queue:
+            _, order, url, rank = heapq.heappop(self._queue)
+            # The stored score can be outdated. If the current one is lower than the best
+            # stored score, the URL goes back in the queue with its current score.
+            score = self.score(url, rank)
+            if self._queue and score < -self._queue[0][0]:
+                heapq.heappush(self._queue, (-score, order, url, rank))
+                continue
+            self._dispatched[url] = time.monotonic()
+            return url
+        return None
+
+    def observe(self, result):
+        """
+        Update the estimates with a finished site.
+
+        Args:
+            result (SiteResult): Result of the site
+        """
+        url = result.url
+        found = bool(result.emails)
+        self.sites += 1
+        self.hits += found
+
+        domain = normalize_domain(url)
+        sites, hits = self.history.get(domain, (0, 0))
+        self.history[domain] = (sites + 1, hits + found)
+
+        started = self._dispatched.pop(url, None)
+        if started is not None:
+            seconds = time.monotonic() - started
+            host = result.domain
+            # The first site of a host (and of the run) replaces the estimate instead of
+            # being averaged with it
+            previous = self.host_seconds.get(host)
+            self.host_seconds[host] = seconds if previous is None else previous + LATENCY_SMOOTHING * (seconds - previous)
+            if self.sites == 1:
+                self.site_seconds = seconds
+            else:
+                self.site_seconds += LATENCY_SMOOTHING * (seconds - self.site_seconds)
+
+    async def iter_urls(self, urls, deadline=None):
+        """
+        Yield URLs in order of their score until they run out or the deadline passes.
+
+        URLs are read ahead up to lookahead, but only as far as the source has them ready:
+        when an async source is waiting for more, the best URL read so far is yielded, so
+        a slow pipe starts the work as soon as its first URL arrives.
+
+        Args:
+            urls: List, iterable or async iterable of URLs, in the order of the search results
+            deadline (float, optional): time.monotonic() value after which no URL is yielded
+
+        Yields:
+            str: The next URL to extract
+        """
+        is_async = hasattr(urls, '__aiter__')
+        url_iterator = aiter(urls) if is_async else iter(urls)
+        next_url = None  # Pending read from an async iterable
+        exhausted = False
+        rank = 0
+        try:
+            while True:
+                # Keep the queue filled, so a streamed list is ordered within the lookahead
+                while not exhausted and len(self._queue) < self.lookahead:
+                    if is_async:
+                        if next_url is None:
+                            next_url = asyncio.ensure_future(_next_url(url_iterator))
+                            # Let the read run, a URL that is ready arrives right away
+                            await asyncio.sleep(0)
+                        if not next_url.done():
+                            if self._queue:
+                                break
+                            # Nothing to hand out, wait for the source but not past the deadline
+                            timeout = max(0, deadline - time.monotonic()) if deadline is not None else None
+                            await asyncio.wait([next_url], timeout=timeout)
+                            if not next_url.done():
+                                return
+                        url, next_url = next_url.result(), None
+                        if url is _URLS_EXHAUSTED:
+                            exhausted = True
+                            break
+                    else:
+                        try:
+                            url = next(url_iterator)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    rank += 1
+                    self.add(url, rank)
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                url = self.pop()
+                if url is None:
+                    return
+                yield url
+        finally:
+            if next_url is not None:
+                next_url.cancel()
+
+    def queued(self):
+        """Return the number of URLs read but not handed out yet."""
+        return len(self._queue)
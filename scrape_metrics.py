@@ -0,0 +1,169 @@
+import json
+import time
+import asyncio
+from aiohttp import web
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+class ScrapeMetrics:
+    """
+    Live counters of a scraping run.
+
+    Updated by scrape_google_urls (SERP stage) and scrape_websites_for_emails (extraction
+    stage), and exposed through MetricsServer (Prometheus text format) and StatsWriter
+    (periodic JSONL snapshots).
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.serp_pages_loaded = 0
+        self.serp_urls_found = 0
+        self.requests_in_flight = 0
+        self.requests_total = 0
+        self.bytes_downloaded = 0
+        self.sites_total = 0
+        self.sites_completed = 0
+        self.sites_with_emails = 0
+        self.emails_found = 0
+        self.concurrency_limit = 0
+        self.errors = {}
+
+    def serp_page_loaded(self, url_count):
+        """Count a loaded search results page and the URLs found on it."""
+        self.serp_pages_loaded += 1
+        self.serp_urls_found += url_count
+
+    def request_started(self):
+        self.requests_in_flight += 1
+        self.requests_total += 1
+
+    def request_finished(self, byte_count=0, error=None):
+        """Count a finished request, its body size and its error type (if any)."""
+        self.requests_in_flight -= 1
+        self.bytes_downloaded += byte_count
+        if error is not None:
+            self.error(error)
+
+    def error(self, error_type):
+        self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def site_completed(self, email_count):
+        self.sites_completed += 1
+        self.emails_found += email_count
+        if email_count:
+            self.sites_with_emails += 1
+
+    def snapshot(self):
+        """Return the current values as a JSON-serializable dictionary."""
+        return {
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'serp_pages_loaded': self.serp_pages_loaded,
+            'serp_urls_found': self.serp_urls_found,
+            'requests_in_flight': self.requests_in_flight,
+            'requests_total': self.requests_total,
+            'bytes_downloaded': self.bytes_downloaded,
+            'sites_total': self.sites_total,
+            'sites_completed': self.sites_completed,
+            'sites_with_emails': self.sites_with_emails,
+            'emails_found': self.emails_found,
+            'concurrency_limit': self.concurrency_limit,
+            'errors': dict(self.errors),
+        }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        metrics = [
+            ('scraper_uptime_seconds', 'gauge', 'Seconds since the run started', round(time.time() - self.started_at, 1)),
+            ('scraper_serp_pages_loaded_total', 'counter', 'Search results pages loaded', self.serp_pages_loaded),
+            ('scraper_serp_urls_found_total', 'counter', 'URLs found on search results pages', self.serp_urls_found),
+            ('scraper_requests_in_flight', 'gauge', 'HTTP requests currently in flight', self.requests_in_flight),
+            ('scraper_requests_total', 'counter', 'HTTP requests started', self.requests_total),
+            ('scraper_bytes_downloaded_total', 'counter', 'Response body bytes downloaded', self.bytes_downloaded),
+            ('scraper_sites_total', 'gauge', 'Websites scheduled for email extraction', self.sites_total),
+            ('scraper_sites_completed_total', 'counter', 'Websites checked for emails', self.sites_completed),
+            ('scraper_sites_with_emails_total', 'counter', 'Websites where emails were found', self.sites_with_emails),
+            ('scraper_emails_found_total', 'counter', 'Emails found', self.emails_found),
+            ('scraper_concurrency_limit', 'gauge', 'Maximum number of concurrent requests', self.concurrency_limit),
+        ]
+
+        lines = []
+        for name, metric_type, help_text, value in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {value}")
+
+        lines.append("# HELP scraper_errors_total Errors by type")
+        lines.append("# TYPE scraper_errors_total counter")
+        for error_type, count in sorted(self.errors.items()):
+            label = error_type.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            lines.append(f'scraper_errors_total{{type="{label}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving the metrics at /metrics in Prometheus text format,
+    and as JSON at /stats.
+    """
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.metrics.to_prometheus(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    async def _handle_stats(self, request):
+        return web.json_response(self.metrics.snapshot())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        app.router.add_get('/stats', self._handle_stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Metrics endpoint started", url=f"http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+class StatsWriter:
+    """Append a JSON snapshot of the metrics to a file at a fixed interval."""
+
+    def __init__(self, metrics, filename="scraper_stats.jsonl", interval=5.0):
+        self.metrics = metrics
+        self.filename = filename
+        self.interval = interval
+        self._task = None
+
+    def _write_snapshot(self):
+        with open(self.filename, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.metrics.snapshot()) + '\n')
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._write_snapshot()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info("Writing stats snapshots", file=self.filename, interval=self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Always end with the final numbers
+            self._write_snapshot()
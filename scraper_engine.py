@@ -0,0 +1,219 @@
+import asyncio
+import collections
+import aiohttp
+from async_google_scraper import iter_google_result_pages, iter_site_results
+from browser_pool import BrowserPool
+from render_fallback import RenderFallback
+from url_utils import normalize_url, canonical_key, DEFAULT_STRIP_PARAMS
+from request_timing import create_trace_config
+
+# Kinds of the items in the queue of extract()
+_CACHED = 'cached'
+_FETCHED = 'fetched'
+_FAILED = 'failed'
+_FINISHED = 'finished'
+
+class ScraperEngine:
+    """
+    Long-lived scraper that owns the browsers, the HTTP session and the caches.
+
+    The engine is meant to be created once and shared, for example by a service that
+    handles many requests. Nothing is started per call: searches borrow a browser from a
+    bounded pool, and all extractions share one HTTP session (with its connection pool and
+    DNS cache) and one limit on concurrent requests. Results are yielded as they complete.
+
+    Example:
+        async with ScraperEngine(max_concurrent=20) as engine:
+            async for hit in engine.search("plumbers amsterdam", num_pages=2):
+                print(hit['rank'], hit['url'])
+            async for result in engine.extract(urls):
+                print(result.url, result.emails)
+    """
+
+    def __init__(self, max_concurrent=15, browsers=1, num_results=100, num_pages=1, timeout=10,
+                 dns_cache_ttl=300, cache_size=10000, recorder=None, metrics=None, chrome_options=None,
+                 strip_params=DEFAULT_STRIP_PARAMS, render_budget=None, proxy_pool=None):
+        """
+        Args:
+            max_concurrent (int): Maximum number of concurrent requests over all extractions
+            browsers (int): Maximum number of browsers used for concurrent searches
+            num_results (int): Default number of results per page of a search
+            num_pages (int): Default number of pages of a search
+            timeout (int): Request timeout in seconds
+            dns_cache_ttl (int): Seconds DNS lookups are cached, 0 to disable
+            cache_size (int): Number of site results kept, so extracting a URL again does not
+                fetch it again. 0 disables the cache.
+            recorder (LatencyRecorder, optional): Records the latency of every request
+            metrics (ScrapeMetrics, optional): Live counters of both stages
+            chrome_options (Options, optional): Chrome options, defaults to build_chrome_options()
+            strip_params (iterable): Query parameters removed from search results before they
+                are deduplicated, see url_utils.DEFAULT_STRIP_PARAMS
+            render_budget (float, optional): Seconds per extract() call during which sites that
+                returned HTML but no emails are rendered in the engine's browsers. None disables
+                rendering.
+            proxy_pool (ProxyPool, optional): Spread the extraction requests over these proxies
+        """
+        self.max_concurrent = max_concurrent
+        self.num_results = num_results
+        self.num_pages = num_pages
+        self.timeout = timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.cache_size = cache_size
+        self.recorder = recorder
+        self.metrics = metrics
+        self.strip_params = strip_params
+        self.render_budget = render_budget
+        self.proxy_pool = proxy_pool
+        self.browsers = BrowserPool(browsers, chrome_options)
+        self.session = None
+        self._semaphore = None
+        self._cache = collections.OrderedDict()
+
+    async def start(self):
+        """Create the HTTP session. Called by 'async with'."""
+        if self.session is not None:
+            return self
+        connector = aiohttp.TCPConnector(use_dns_cache=bool(self.dns_cache_ttl), ttl_dns_cache=self.dns_cache_ttl or None)
+        trace_configs = [create_trace_config(self.recorder)] if self.recorder is not None else None
+        self.session = aiohttp.ClientSession(connector=connector, trace_configs=trace_configs)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.metrics is not None:
+            self.metrics.concurrency_limit = self.max_concurrent
+        return self
+
+    async def close(self):
+        """Close the HTTP session and the browsers."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        await self.browsers.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def search(self, query, num_results=None, num_pages=None):
+        """
+        Search Google and yield the result URLs page by page.
+
+        URLs are canonicalized (see url_utils), and URLs of a page that already appeared
+        earlier in the same search are skipped.
+
+        Args:
+            query (str): The search term to use
+            num_results (int, optional): Results per page, defaults to the engine setting
+            num_pages (int, optional): Number of pages, defaults to the engine setting
+
+        Yields:
+            dict: {'query', 'url', 'original_url', 'rank', 'page'}, rank starts at 1 and
+                original_url is the URL as found on the results page
+        """
+        num_results = max(10, min(100, num_results or self.num_results))
+        num_pages = max(1, min(10, num_pages or self.num_pages))
+        seen = set()
+        async with self.browsers.browser() as driver:
+            page_number = 0
+            async for page_urls in iter_google_result_pages(driver, query, num_results, num_pages, self.metrics):
+                page_number += 1
+                for original_url in page_urls:
+                    url = normalize_url(original_url, self.strip_params)
+                    key = canonical_key(url, self.strip_params)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield {'query': query, 'url': url, 'original_url': original_url, 'rank': len(seen), 'page': page_number}
+
+    async def extract(self, urls):
+        """
+        Extract emails from websites and yield the results as the sites complete.
+
+        Sites in the result cache are yielded without fetching them again. With a render budget,
+        sites without emails in their HTML are rendered in the browser pool shared with search().
+
+        Args:
+            urls: List, iterable or async iterable of URLs
+
+        Yields:
+            SiteResult: The URL, the extracted emails and the metadata of a site,
+                the same as the items returned by scrape_websites_for_emails
+        """
+        if self.session is None:
+            raise RuntimeError("ScraperEngine is not started, use 'async with ScraperEngine() as engine'")
+
+        # Cached and fetched results meet in one queue, so a cached result is yielded as
+        # soon as its URL is read instead of waiting for the next fetched site
+        ready = asyncio.Queue(maxsize=1)
+        results = iter_site_results(self.session, self._uncached(urls, ready), self.max_concurrent,
+                                    recorder=self.recorder, metrics=self.metrics, semaphore=self._semaphore,
+                                    timeout=self.timeout, proxy_pool=self.proxy_pool)
+        if self.render_budget:
+            results = RenderFallback(self.browsers.size, self.render_budget, pool=self.browsers).iter_results(results)
+
+        async def fetch():
+            try:
+                async for result in results:
+                    await ready.put((_FETCHED, result))
+            except Exception as e:
+                await ready.put((_FAILED, e))
+            else:
+                await ready.put((_FINISHED, None))
+
+        fetcher = asyncio.ensure_future(fetch())
+        try:
+            while True:
+                kind, item = await ready.get()
+                if kind is _FINISHED:
+                    return
+                if kind is _FAILED:
+                    raise item
+                if kind is _FETCHED:
+                    self._remember(item)
+                    if self.metrics is not None:
+                        self.metrics.sites_total += 1
+                        self.metrics.site_completed(len(item.emails))
+                        if item.error:
+                            self.metrics.error('SiteError')
+                yield item
+        finally:
+            # Cancel the remaining work when the consumer stops early. A fetcher blocked on the
+            # queue leaves the results suspended, so they are closed to cancel their sites.
+            fetcher.cancel()
+            try:
+                await fetcher
+            except asyncio.CancelledError:
+                pass
+            await results.aclose()
+
+    async def _uncached(self, urls, ready):
+        """Yield the URLs that are not cached and put the cached results in the ready queue."""
+        async for url in _iterate(urls):
+            result = self._cached(url)
+            if result is None:
+                yield url
+            else:
+                await ready.put((_CACHED, result))
+
+    def _cached(self, url):
+        result = self._cache.get(url)
+        if result is not None:
+            self._cache.move_to_end(url)
+        return result
+
+    def _remember(self, result):
+        if not self.cache_size:
+            return
+        self._cache[result.url] = result
+        self._cache.move_to_end(result.url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+async def _iterate(urls):
+    """Iterate over an iterable or an async iterable."""
+    if hasattr(urls, '__aiter__'):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
@@ -0,0 +1,150 @@
+import sys
+import json
+import time
+import logging
+
+# Standard LogRecord attributes, everything else passed to the logger is a structured field
+_RESERVED_KWARGS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+# Set by configure_logging(quiet=True) to silence progress output for batch jobs
+_progress_enabled = True
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger that accepts structured fields as keyword arguments.
+
+    Example:
+        logger.info("Found emails", url=url, count=3)
+    """
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _RESERVED_KWARGS}
+        extra = kwargs.setdefault('extra', {})
+        extra['fields'] = fields
+        return msg, kwargs
+
+def get_logger(name):
+    """Return a structured logger for a module."""
+    return StructuredLogger(logging.getLogger(name), {})
+
+def _format_value(value):
+    text = str(value)
+    if not text or any(char in text for char in ' ="'):
+        return json.dumps(text)
+    return text
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines: time, level, message and key=value fields."""
+
+    def format(self, record):
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers and machine parsing."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level='INFO', fmt='text', quiet=False, log_file=None):
+    """
+    Configure logging for the command line tools.
+
+    Args:
+        level (str): Minimum level to log (DEBUG, INFO, WARNING, ERROR)
+        fmt (str): 'text' for key=value lines or 'json' for one JSON object per line
+        quiet (bool): Only log warnings and errors and hide the progress line
+        log_file (str, optional): Write the log to this file instead of stderr
+    """
+    global _progress_enabled
+    _progress_enabled = not quiet
+
+    handler = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if fmt == 'json' else KeyValueFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING if quiet else getattr(logging, str(level).upper(), logging.INFO))
+
+    # Keep third-party libraries at warnings unless debugging
+    if root.level > logging.DEBUG:
+        for name in ('selenium', 'urllib3', 'asyncio', 'aiohttp'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+def add_logging_arguments(parser):
+    """Add the --log-level, --log-format, --log-file and --quiet options to an argparse parser."""
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Minimum log level (default: INFO)")
+    parser.add_argument('--log-format', default='text', choices=['text', 'json'],
+                        help="Log as key=value text or as JSON lines (default: text)")
+    parser.add_argument('--log-file', help="Write the log to this file instead of stderr")
+    parser.add_argument('--quiet', action='store_true', help="Only log warnings and errors, no progress line")
+
+class ProgressRenderer:
+    """
+    Progress output throttled to a fixed update frequency.
+
+    On a terminal the progress line is redrawn in place. Otherwise, for example when
+    the output goes to a log file, a structured 'Progress' record is logged at most
+    once per interval. The final state is always shown when the renderer is closed.
+    """
+
+    def __init__(self, total=None, label="Progress", interval=1.0, logger=None, stream=None):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.logger = logger or get_logger('progress')
+        self.stream = stream or sys.stderr
+        self.enabled = _progress_enabled
+        self.completed = 0
+        self.fields = {}
+        self._last_render = 0.0
+        self._interactive = self.enabled and hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._closed = False
+
+    def update(self, completed, total=None, **fields):
+        """Record the current progress and render it if the interval has passed."""
+        self.completed = completed
+        if total is not None:
+            self.total = total
+        self.fields = fields
+        now = time.monotonic()
+        if self.enabled and now - self._last_render >= self.interval:
+            self._last_render = now
+            self._render()
+
+    def _render(self, final=False):
+        percent = f" ({self.completed / self.total * 100:.1f}%)" if self.total else ""
+        total = f"/{self.total}" if self.total is not None else ""
+        if self._interactive:
+            extra = ''.join(f", {value} {key.replace('_', ' ')}" for key, value in self.fields.items())
+            self.stream.write(f"\r{self.label}: {self.completed}{total}{percent}{extra}\033[K")
+            if final:
+                self.stream.write('\n')
+            self.stream.flush()
+        else:
+            self.logger.info(self.label, completed=self.completed, total=self.total, **self.fields)
+
+    def close(self):
+        """Render the final state."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.enabled:
+            self._render(final=True)
@@ -0,0 +1,228 @@
+import os
+import math
+import mmap
+import struct
+import hashlib
+from results_db import normalize_domain
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+# File layout: a fixed-size header followed by the bit array
+MAGIC = b'SEENBLM1'
+HEADER = struct.Struct('<8sQIQQd')  # magic, bits, hashes, count, capacity, false positive rate
+HEADER_SIZE = 64
+
+class BloomFilter:
+    """
+    Persistent Bloom filter in a memory-mapped file.
+
+    Answers "was this key added before?" with no false negatives and a configurable rate
+    of false positives, in about 1.2 bytes per key at a 1% rate and 1.8 bytes at 0.1%.
+    The bit array is memory-mapped, so only the pages that are touched are read from
+    disk, and a filter for millions of keys opens instantly. The size is fixed when the
+    file is created: an existing file keeps its own capacity and rate. Past its capacity
+    the filter keeps working, but its false positive rate rises.
+
+    Only one process should write to a filter at a time.
+
+    Example:
+        with BloomFilter("seen.bloom", capacity=10_000_000, fp_rate=0.001) as seen:
+            if seen.add("info@example.com"):
+                print("new")
+    """
+
+    def __init__(self, path, capacity=10_000_000, fp_rate=0.001):
+        """
+        Args:
+            path (str): Filter file, created if it does not exist
+            capacity (int): Number of keys the filter is sized for
+            fp_rate (float): Share of new keys wrongly reported as seen at capacity
+        """
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be between 0 and 1")
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create(path, max(1, int(capacity)), fp_rate)
+
+        self._file = open(path, 'r+b')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+        except Exception:
+            self._file.close()
+            raise
+        if len(self._mmap) < HEADER_SIZE or self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            self._file.close()
+            raise ValueError(f"{path} is not a seen filter file")
+        _, self.bits, self.hashes, self.count, self.capacity, self.fp_rate = HEADER.unpack_from(self._mmap)
+        if (capacity, fp_rate) != (self.capacity, self.fp_rate):
+            logger.debug("Using the size of the existing filter", file=path, capacity=self.capacity, fp_rate=self.fp_rate)
+
+    @staticmethod
+    def _create(path, capacity, fp_rate):
+        # Optimal size and number of hash functions for the capacity and rate
+        bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, bits, hashes, 0, capacity, fp_rate).ljust(HEADER_SIZE, b'\0'))
+            f.truncate(HEADER_SIZE + (bits + 7) // 8)
+        logger.info("Seen filter created", file=path, capacity=capacity, fp_rate=fp_rate,
+                    mb=round((bits + 7) // 8 / 1e6, 1))
+
+    def _positions(self, key):
+        # Double hashing: the k positions are derived from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        data = self._mmap
+        return all(data[HEADER_SIZE + (position >> 3)] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key):
+        """
+        Add a key.
+
+        Returns:
+            bool: True if the key is new, False if it was (probably) added before
+        """
+        data = self._mmap
+        new = False
+        for position in self._positions(key):
+            offset = HEADER_SIZE + (position >> 3)
+            mask = 1 << (position & 7)
+            if not data[offset] & mask:
+                data[offset] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __len__(self):
+        """Approximate number of keys added."""
+        return self.count
+
+    def estimated_fp_rate(self):
+        """Return the false positive rate at the current number of keys."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def flush(self):
+        """Write the key count and the changed pages to disk."""
+        HEADER.pack_into(self._mmap, 0, MAGIC, self.bits, self.hashes, self.count, self.capacity, self.fp_rate)
+        self._mmap.flush()
+
+    def close(self):
+        if self._mmap.closed:
+            return
+        self.flush()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class SeenFilter:
+    """
+    Emails and domains delivered by earlier runs, kept in a persistent BloomFilter.
+
+    Every result of scrape_websites_for_emails is checked against the filter. Emails
+    that were delivered before are listed under 'seen_emails' in the metadata, or removed
+    from the result with suppress=True, and the new ones are added. The domain of a site
+    is added once a site of it returned HTML or emails, and with skip_domains=True the URLs of
+    known domains are skipped before they are fetched. A false positive wrongly flags a
+    new email or skips a new domain, at the rate the filter was created with.
+
+    Example:
+        seen = SeenFilter("seen.bloom", capacity=5_000_000, suppress=True)
+        try:
+            results = await scrape_websites_for_emails(urls, seen_filter=seen)
+        finally:
+            seen.close()
+    """
+
+    def __init__(self, path, capacity=10_000_000, fp_rate=0.001, suppress=False, skip_domains=False):
+        """
+        Args:
+            path (str): Filter file, created if it does not exist
+            capacity (int): Number of emails and domains the filter is sized for
+            fp_rate (float): False positive rate at capacity
+            suppress (bool): Remove seen emails from the results instead of flagging them
+            skip_domains (bool): Do not fetch the URLs of domains delivered before
+        """
+        self.filter = BloomFilter(path, capacity, fp_rate)
+        self.suppress = suppress
+        self.skip_domains = skip_domains
+        self.seen_emails = 0
+        self.skipped_sites = 0
+
+    def seen_domain(self, url):
+        """Return True if the domain of a URL was delivered before."""
+        return f"domain:{normalize_domain(url)}" in self.filter
+
+    def filter_urls(self, urls):
+        """
+        Leave out the URLs of domains delivered before, when skip_domains is set.
+
+        A list is filtered right away, so its length stays known. Other iterables and
+        async iterables are filtered as they are read, so they also skip domains
+        delivered earlier in the same run.
+
+        Args:
+            urls: List, iterable or async iterable of URLs
+
+        Returns:
+            The URLs to fetch, of the same kind as urls
+        """
+        if not self.skip_domains:
+            return urls
+        if hasattr(urls, '__aiter__'):
+            return self._filter_async(urls)
+        if hasattr(urls, '__len__'):
+            return list(self._filter(urls))
+        return self._filter(urls)
+
+    def _filter(self, urls):
+        for url in urls:
+            if self.seen_domain(url):
+                self.skipped_sites += 1
+            else:
+                yield url
+
+    async def _filter_async(self, urls):
+        async for url in urls:
+            if self.seen_domain(url):
+                self.skipped_sites += 1
+            else:
+                yield url
+
+    def apply(self, result):
+        """
+        Flag or remove the emails of a result that were delivered before, and record the
+        new ones and the domain.
+
+        Args:
+            result (SiteResult): Result of a site, updated in place
+        """
+        # Only a site that delivered content counts as seen, so unreachable sites are tried again
+        delivered = result.status == 'success' and not result.error and (result.html_pages > 0 or bool(result.emails))
+        seen = [email for email in result.emails if not self.filter.add(f"email:{email.lower()}")]
+        if seen:
+            self.seen_emails += len(seen)
+            if self.suppress:
+                result.remove_emails(seen)
+            else:
+                result.set_extra('seen_emails', seen)
+        if delivered:
+            self.filter.add(f"domain:{normalize_domain(result.domain or result.url)}")
+
+    def close(self):
+        """Write the filter to disk and close it."""
+        self.filter.close()
+        logger.info("Seen filter saved", file=self.filter.path, keys=len(self.filter),
+                    fp_rate=round(self.filter.estimated_fp_rate(), 6), seen_emails=self.seen_emails,
+                    skipped_sites=self.skipped_sites)
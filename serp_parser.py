@@ -0,0 +1,132 @@
+from bs4 import BeautifulSoup
+from url_utils import unwrap_redirect
+from scraper_logging import get_logger
+
+logger = get_logger(__name__)
+
+def _clean_url(url):
+    """Strip Google's /url?q= redirect wrapper, decoding the target URL."""
+    return unwrap_redirect(url)
+
+def parse_organic_blocks(soup):
+    """
+    Method 1: organic results in div.dURPMd > div.Ww4FFb (current layout).
+
+    Raises:
+        AttributeError: If the page has no div.dURPMd container
+    """
+    results = []
+    for result in soup.find("div", {"class": "dURPMd"}).find_all("div", {"class": "Ww4FFb"}):
+        h3 = result.find("h3")
+        title = h3.text if h3 else None
+        try:
+            url = _clean_url(result.find("a").get('href'))
+        except (AttributeError, TypeError):
+            continue
+        if url:
+            results.append({"title": title, "url": url})
+    return results
+
+def parse_g_blocks(soup):
+    """Method 2: result blocks with class "g" (classic layout)."""
+    results = []
+    for div in soup.find_all("div", class_="g"):
+        a_tag = div.find("a")
+        url = _clean_url(a_tag.get('href', '')) if a_tag else ''
+        if not url.startswith('http'):
+            continue
+
+        title = None
+        h3 = div.find("h3")
+        if h3:
+            title = h3.text
+        else:
+            # Try alternative title patterns
+            h3_like = a_tag.find(["h3", "h4", "div", "span"])
+            if h3_like:
+                title = h3_like.text
+        results.append({"title": title, "url": url})
+    return results
+
+def parse_yurubf_blocks(soup):
+    """Method 3: title links in div.yuRUbf."""
+    results = []
+    for result in soup.find_all("div", {"class": "yuRUbf"}):
+        a_tag = result.find("a")
+        url = _clean_url(a_tag.get('href', '')) if a_tag else ''
+        if not url.startswith('http'):
+            continue
+        h3 = result.find("h3")
+        results.append({"title": h3.text if h3 else None, "url": url})
+    return results
+
+def parse_all_links(soup, require_query=False):
+    """
+    Method 4: every external link on the page, as a last resort.
+
+    Google redirect links (/url?q=, used by the basic HTML layout) are unwrapped.
+
+    Args:
+        soup (BeautifulSoup): The parsed page
+        require_query (bool): Only keep links with a query string (checked before unwrapping,
+            so redirect links are kept)
+    """
+    results = []
+    seen = set()
+    for link in soup.find_all("a"):
+        raw_href = link.get('href')
+        href = _clean_url(raw_href)
+        if not href or not href.startswith('http') or 'google' in href or href in seen:
+            continue
+        if require_query and '?' not in raw_href:
+            continue
+
+        # Look for a title next to the link, fall back to the link text
+        h3 = link.parent.find("h3") if link.parent else None
+        title = h3.text if h3 else (link.text.strip() or href)
+        results.append({"title": title, "url": href})
+        seen.add(href)
+    return results
+
+# Parsing strategies in the order they are tried
+STRATEGIES = [
+    ('organic_blocks', parse_organic_blocks),
+    ('g_blocks', parse_g_blocks),
+    ('yurubf_blocks', parse_yurubf_blocks),
+    ('all_links', parse_all_links),
+]
+
+def parse_serp(page, parser='html.parser', require_query=False, strategies=None):
+    """
+    Extract the search results from a Google results page.
+
+    The strategies are tried in order and the first one that finds any result wins.
+    Google URLs are removed from the results.
+
+    Args:
+        page (str or BeautifulSoup): Page HTML, or an already parsed page
+        parser (str): BeautifulSoup parser backend, such as 'html.parser' or 'lxml'
+        require_query (bool): Passed to the generic all_links strategy
+        strategies (list, optional): Names of the strategies to try (default: all)
+
+    Returns:
+        list: Dictionaries with 'title' and 'url'
+    """
+    soup = page if isinstance(page, BeautifulSoup) else BeautifulSoup(page, parser)
+
+    for name, strategy in STRATEGIES:
+        if strategies is not None and name not in strategies:
+            continue
+        try:
+            if strategy is parse_all_links:
+                results = strategy(soup, require_query=require_query)
+            else:
+                results = strategy(soup)
+        except Exception as e:
+            logger.debug("SERP parse method failed", method=name, error=str(e))
+            continue
+        logger.debug("SERP parse", method=name, results=len(results))
+        if results:
+            return [result for result in results if 'google.com' not in result['url']]
+
+    return []
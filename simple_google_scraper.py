@@ -1,11 +1,40 @@
 import time
 import re
 import csv
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
+from serp_parser import parse_serp
+from scraper_logging import get_logger, configure_logging, ProgressRenderer
+
+logger = get_logger(__name__)
+
+# Common user agent
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+}
+
+def create_session(pool_connections=32, pool_maxsize=4):
+    """
+    Create a requests Session that keeps connections open for reuse.
+    
+    Args:
+        pool_connections (int): Number of hosts whose connection pools are kept
+        pool_maxsize (int): Maximum number of open connections per host
+        
+    Returns:
+        requests.Session: Session with the user agent set
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    return session
 
 def scrape_google_urls(query):
     """
@@ -36,96 +65,24 @@ def scrape_google_urls(query):
     try:
         # Open the search URL
         driver.get(search_url)
-        print("Navigating to Google search page...")
+        logger.info("Navigating to Google search page")
         
         # Wait for the page to load
         time.sleep(3)
         
-        # Get the page source and parse with BeautifulSoup
+        # Get the page source
         page_html = driver.page_source
-        soup = BeautifulSoup(page_html, 'html.parser')
-        
-        # Extract URLs
-        urls = []
         
         # Save HTML for debugging (optional)
         with open("google_source.html", "w", encoding="utf-8") as f:
             f.write(page_html)
-        print("Saved HTML source to google_source.html for debugging")
+        logger.debug("Saved HTML source for debugging", file="google_source.html")
         
         # Try multiple selector strategies to find search results
-        print("Extracting URLs from search results...")
-        
-        # Method 1: Try the original selectors from info.txt
-        try:
-            organic_results = soup.find("div", {"class": "dURPMd"}).find_all("div", {"class": "Ww4FFb"})
-            print(f"Method 1: Found {len(organic_results)} results")
-            
-            for result in organic_results:
-                try:
-                    url = result.find("a").get('href')
-                    # Clean URL if necessary
-                    if url.startswith('/url?q='):
-                        url = url.split('/url?q=')[1].split('&')[0]
-                    urls.append(url)
-                except:
-                    continue
-        except Exception as e:
-            print(f"Method 1 failed: {e}")
+        logger.info("Extracting URLs from search results")
+        urls = [result['url'] for result in parse_serp(page_html, require_query=True)]
         
-        # Method 2: Try finding all search result blocks with common classes
-        if not urls:
-            try:
-                # Look for any divs that might contain search results (most common pattern)
-                search_divs = soup.find_all("div", class_="g")
-                print(f"Method 2: Found {len(search_divs)} results")
-                
-                for div in search_divs:
-                    try:
-                        a_tag = div.find("a")
-                        if a_tag and a_tag.get('href'):
-                            url = a_tag.get('href')
-                            if url.startswith('http'):
-                                urls.append(url)
-                    except Exception as e:
-                        continue
-            except Exception as e:
-                print(f"Method 2 failed: {e}")
-        
-        # Method 3: Try another common pattern
-        if not urls:
-            try:
-                # Try to find all 'a' tags within search results
-                search_results = soup.find_all("div", {"class": "yuRUbf"})
-                print(f"Method 3: Found {len(search_results)} results")
-                
-                for result in search_results:
-                    try:
-                        url = result.find("a").get('href')
-                        if url.startswith('http'):
-                            urls.append(url)
-                    except:
-                        continue
-            except Exception as e:
-                print(f"Method 3 failed: {e}")
-        
-        # Method 4: Most generic approach - find all links on the page and filter
-        if not urls:
-            try:
-                all_links = soup.find_all("a")
-                print(f"Method 4: Found {len(all_links)} links")
-                
-                for link in all_links:
-                    href = link.get('href')
-                    if href and href.startswith('http') and 'google' not in href and '?' in href:
-                        # This is likely a search result link
-                        if href not in urls:
-                            urls.append(href)
-            except Exception as e:
-                print(f"Method 4 failed: {e}")
-        
-        # Remove duplicates and Google-related URLs
-        urls = [url for url in urls if 'google.com' not in url]
+        # Remove duplicates
         urls = list(dict.fromkeys(urls))  # Remove duplicates while preserving order
         
         return urls
@@ -135,15 +92,17 @@ def scrape_google_urls(query):
         try:
             driver.quit()
         except Exception as e:
-            print(f"Note: Could not terminate browser process cleanly, but this is normal. Error: {type(e).__name__}")
+            logger.debug("Could not terminate browser process cleanly, this is normal", error=type(e).__name__)
 
-def extract_emails_from_url(url, timeout=10):
+def extract_emails_from_url(url, timeout=10, session=None):
     """
     Extract email addresses from a given URL.
     
     Args:
         url (str): The URL to scrape for emails
         timeout (int): Request timeout in seconds
+        session (requests.Session, optional): Session to send the requests with, so connections
+            are reused. Without a session every request opens a new connection.
         
     Returns:
         list: A list of found email addresses
@@ -154,11 +113,6 @@ def extract_emails_from_url(url, timeout=10):
         # Get the domain name for potential contact page check
         domain = urlparse(url).netloc
         
-        # Common user agent
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-        }
-        
         # Pages to check for emails
         pages_to_check = [url]  # Start with the main URL
         
@@ -178,8 +132,8 @@ def extract_emails_from_url(url, timeout=10):
         # Check all pages for emails
         for page_url in pages_to_check[:3]:  # Limit to first 3 to avoid too many requests
             try:
-                print(f"Checking for emails on: {page_url}")
-                response = requests.get(page_url, headers=headers, timeout=timeout)
+                logger.debug("Checking for emails", url=page_url)
+                response = (session or requests).get(page_url, headers=HEADERS, timeout=timeout)
                 
                 if response.status_code == 200:
                     # Try to find emails in the HTML content
@@ -209,21 +163,71 @@ def extract_emails_from_url(url, timeout=10):
                     break
                     
             except Exception as e:
-                print(f"Error checking {page_url}: {str(e)}")
+                logger.debug("Error checking page", url=page_url, error=str(e))
                 continue
                 
     except Exception as e:
-        print(f"Error extracting emails from {url}: {str(e)}")
+        logger.warning("Error extracting emails", url=url, error=str(e))
     
     return emails
 
-def scrape_websites_for_emails(urls, max_sites=None):
+def iter_websites_for_emails(urls, workers=8, ordered=True, timeout=10, pool_connections=32, pool_maxsize=4):
+    """
+    Check websites for email addresses in a pool of threads and yield the results.
+    
+    Every thread has its own requests Session, so connections are reused within a thread
+    without sharing a session between threads.
+    
+    Args:
+        urls (list): List of URLs to check for emails
+        workers (int): Number of threads
+        ordered (bool): Yield the results in the order of urls. When False, results are
+            yielded as soon as they are done.
+        timeout (int): Request timeout in seconds
+        pool_connections (int): Number of hosts whose connections each thread keeps open
+        pool_maxsize (int): Maximum number of open connections per host and thread
+        
+    Yields:
+        dict: Dictionary with the URL and its emails
+    """
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+    
+    def check(url):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = create_session(pool_connections, pool_maxsize)
+            with sessions_lock:
+                sessions.append(session)
+        return {"url": url, "emails": extract_emails_from_url(url, timeout, session)}
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='email-worker')
+    try:
+        if ordered:
+            yield from executor.map(check, urls)
+        else:
+            futures = [executor.submit(check, url) for url in urls]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        # Drop the sites that have not started when the caller stops early
+        executor.shutdown(wait=True, cancel_futures=True)
+        for session in sessions:
+            session.close()
+
+def scrape_websites_for_emails(urls, max_sites=None, workers=1, ordered=True, timeout=10):
     """
     Scrape a list of websites for email addresses.
     
     Args:
         urls (list): List of URLs to check for emails
         max_sites (int): Maximum number of sites to check (None for all)
+        workers (int): Number of threads checking sites at the same time. With 1 the sites
+            are checked one at a time in the calling thread.
+        ordered (bool): Keep the results in the order of urls. When False, the results
+            are in the order the sites finished.
+        timeout (int): Request timeout in seconds
         
     Returns:
         list: A list of dictionaries containing URLs and their emails
@@ -234,22 +238,31 @@ def scrape_websites_for_emails(urls, max_sites=None):
     if max_sites:
         urls = urls[:max_sites]
     
-    print(f"\nSearching for email addresses on {len(urls)} websites...")
+    logger.info("Searching for email addresses", sites=len(urls), workers=workers)
+    progress = ProgressRenderer(len(urls))
+    emails_found = 0
     
-    for i, url in enumerate(urls, 1):
-        data = {"url": url, "emails": []}
-        
-        print(f"\n[{i}/{len(urls)}] Checking {url}")
-        emails = extract_emails_from_url(url)
-        
-        if emails:
-            data["emails"] = emails
-            print(f"  Found {len(emails)} email(s): {', '.join(emails)}")
-        else:
-            print(f"  No emails found")
-        
-        results.append(data)
+    session = None
+    if workers > 1:
+        site_results = iter_websites_for_emails(urls, workers, ordered, timeout)
+    else:
+        session = create_session()
+        site_results = ({"url": url, "emails": extract_emails_from_url(url, timeout, session)} for url in urls)
     
+    try:
+        for i, data in enumerate(site_results, 1):
+            if data["emails"]:
+                emails_found += len(data["emails"])
+                logger.debug("Found emails", url=data["url"], count=len(data["emails"]), emails=', '.join(data["emails"]))
+            
+            results.append(data)
+            progress.update(i, emails=emails_found)
+    finally:
+        # Close the threads and sessions also when a site raises
+        site_results.close()
+        if session is not None:
+            session.close()
+    progress.close()
     return results
 
 def save_results_to_csv(results, filename="google_results_with_emails.csv"):
@@ -271,11 +284,13 @@ def save_results_to_csv(results, filename="google_results_with_emails.csv"):
                 'emails': ', '.join(result['emails'])
             })
     
-    print(f"\nResults saved to {filename}")
+    logger.info("Results saved", file=filename, results=len(results))
 
 if __name__ == "__main__":
+    configure_logging()
+
     search_term = input("Enter search term: ")
-    print(f"Searching for: {search_term}")
+    logger.info("Searching", query=search_term)
     
     # Get URLs from Google search results
     urls = scrape_google_urls(search_term)
@@ -296,12 +311,19 @@ if __name__ == "__main__":
         except ValueError:
             max_sites = None
         
+        # Ask for the number of threads to use
+        try:
+            workers = int(input("\nHow many sites do you want to check at the same time? (1-32, default 8): ") or 8)
+            workers = max(1, min(32, workers))  # Limit between 1 and 32
+        except ValueError:
+            workers = 8
+        
         # Scrape websites for emails
-        results = scrape_websites_for_emails(urls, max_sites)
+        results = scrape_websites_for_emails(urls, max_sites, workers)
         
         # Count total emails found
         total_emails = sum(len(result['emails']) for result in results)
-        print(f"\nTotal emails found: {total_emails}")
+        logger.info("Email extraction finished", emails=total_emails)
         
         # Save results to CSV
         save_results_to_csv(results)
@@ -310,10 +332,10 @@ if __name__ == "__main__":
         with open("google_urls.txt", "w") as f:
             for url in urls:
                 f.write(f"{url}\n")
-        print(f"URLs saved to google_urls.txt")
+        logger.info("URLs saved", file="google_urls.txt")
     else:
         # Just write URLs to a text file without scraping for emails
         with open("google_urls.txt", "w") as f:
             for url in urls:
                 f.write(f"{url}\n")
-        print(f"\nURLs saved to google_urls.txt") 
\ No newline at end of file
+        logger.info("URLs saved", file="google_urls.txt") 
\ No newline at end of file
@@ -0,0 +1,176 @@
+import sys
+from urllib.parse import urlparse
+from email_extractor import EMAIL_CATEGORY_KEYWORDS
+
+# Category names in code order. A result stores the category of each email as a one-byte
+# code instead of a second copy of the email in a per-category list.
+CATEGORY_NAMES = tuple(sys.intern(name) for name in EMAIL_CATEGORY_KEYWORDS)
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORY_NAMES)}
+
+# Code of an email without a category, only found in results read from old files
+UNCATEGORIZED = 255
+
+def matches_site_domain(email, domain):
+    """Return True if the domain of an email contains the registered domain of a site."""
+    parts = domain.split('.')
+    base_domain = '.'.join(parts[-2:]) if len(parts) > 1 else domain
+    return base_domain in email.split('@')[-1]
+
+def url_domain(url):
+    """Return the interned domain (network location) of a URL, or '' if it cannot be parsed."""
+    try:
+        return sys.intern(urlparse(url).netloc)
+    except ValueError:
+        return ''
+
+class SiteResult:
+    """
+    Compact result of the email extraction of one site.
+
+    Every email is stored once, with its category as a code in a bytearray, and domains
+    and category names are interned, so a run that keeps 100k results in memory holds a
+    fraction of what the equivalent nested dictionaries take. Optional metadata (per-site
+    timings, render fallback outcome) is only allocated when it is set.
+
+    Results are converted to the dictionary shape of the JSON outputs,
+    {'url', 'emails', 'metadata': {'categorized_emails', ...}}, only by to_dict(), and
+    read back with from_dict(). For existing scripts, result['url'], result['emails'] and
+    result['metadata'] still work, but they build a copy on every access.
+    """
+
+    __slots__ = ('url', 'domain', 'emails', 'category_codes', 'status', 'error',
+                 'pages_checked', 'domain_matches', 'html_pages', 'extra', 'removed')
+
+    def __init__(self, url, domain=None, status='failure', error=None, pages_checked=0, domain_matches=0, html_pages=0):
+        self.url = url
+        self.domain = sys.intern(domain) if domain is not None else url_domain(url)
+        self.emails = []
+        self.category_codes = bytearray()
+        self.status = status
+        self.error = error
+        self.pages_checked = pages_checked
+        self.domain_matches = domain_matches
+        self.html_pages = html_pages
+        self.extra = None
+        self.removed = None
+
+    def add_email(self, email, category='other'):
+        """Add an email that is not in the result yet, with its category name (or None)."""
+        self.emails.append(email)
+        self.category_codes.append(CATEGORY_CODES[category] if category is not None else UNCATEGORIZED)
+
+    def remove_emails(self, emails):
+        """
+        Remove emails from the result, together with their categories and domain matches.
+
+        The removed emails are not exported, but all_email_categories() still returns
+        them, so the results database keeps every email the site has.
+        """
+        emails = set(emails)
+        kept = []
+        if self.removed is None:
+            self.removed = []
+        for email, code in zip(self.emails, self.category_codes):
+            if email in emails:
+                self.removed.append((email, code))
+            else:
+                kept.append((email, code))
+        self.emails = [email for email, _ in kept]
+        self.category_codes = bytearray(code for _, code in kept)
+        self.domain_matches = sum(1 for email in self.emails if matches_site_domain(email, self.domain))
+
+    def email_categories(self):
+        """Yield (email, category name) pairs, None for an email without a category."""
+        for email, code in zip(self.emails, self.category_codes):
+            yield email, CATEGORY_NAMES[code] if code != UNCATEGORIZED else None
+
+    def all_email_categories(self):
+        """Like email_categories(), followed by the emails taken out with remove_emails()."""
+        yield from self.email_categories()
+        for email, code in self.removed or ():
+            yield email, CATEGORY_NAMES[code] if code != UNCATEGORIZED else None
+
+    def categorized_emails(self):
+        """Return the non-empty categories and their emails, in category order."""
+        categorized = {}
+        for code in sorted(set(self.category_codes)):
+            if code != UNCATEGORIZED:
+                categorized[CATEGORY_NAMES[code]] = [email for email, email_code in zip(self.emails, self.category_codes)
+                                                     if email_code == code]
+        return categorized
+
+    def set_extra(self, key, value):
+        """Set an optional metadata field such as 'timings' or 'render'."""
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def get_extra(self, key, default=None):
+        """Return an optional metadata field."""
+        return self.extra.get(key, default) if self.extra is not None else default
+
+    @property
+    def metadata(self):
+        """The metadata dictionary of the JSON outputs, built on every access."""
+        metadata = {
+            'pages_checked': self.pages_checked,
+            'status': self.status,
+            'error': self.error,
+            'categorized_emails': self.categorized_emails(),
+            'domain_matches': self.domain_matches,
+            'html_pages': self.html_pages,
+        }
+        if self.extra:
+            metadata.update(self.extra)
+        return metadata
+
+    def to_dict(self):
+        """Return the result in the dictionary shape of the JSON outputs."""
+        return {'url': self.url, 'emails': list(self.emails), 'metadata': self.metadata}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Read a result from the dictionary shape of the JSON outputs."""
+        metadata = data.get('metadata') or {}
+        result = cls(data['url'], status=metadata.get('status', 'unknown'), error=metadata.get('error'),
+                     pages_checked=metadata.get('pages_checked', 0), domain_matches=metadata.get('domain_matches', 0),
+                     html_pages=metadata.get('html_pages', 0))
+        categories = {}
+        for category, emails in metadata.get('categorized_emails', {}).items():
+            for email in emails:
+                categories.setdefault(email, category if category in CATEGORY_CODES else 'other')
+        for email in data.get('emails', []):
+            result.add_email(email, categories.get(email))
+        for key, value in metadata.items():
+            if key not in _METADATA_FIELDS:
+                result.set_extra(key, value)
+        return result
+
+    def __getitem__(self, key):
+        if key == 'url':
+            return self.url
+        if key == 'emails':
+            return list(self.emails)
+        if key == 'metadata':
+            return self.metadata
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"SiteResult({self.url!r}, emails={self.emails!r}, status={self.status!r})"
+
+# Metadata keys stored in the slots of a SiteResult, everything else goes to extra
+_METADATA_FIELDS = frozenset(['pages_checked', 'status', 'error', 'categorized_emails', 'domain_matches', 'html_pages'])
+
+def as_site_result(result):
+    """Return a SiteResult for a SiteResult or a result dictionary read from a JSON file."""
+    return result if isinstance(result, SiteResult) else SiteResult.from_dict(result)
+
+def to_json_results(results):
+    """Convert results to the dictionary shape of the JSON outputs."""
+    return [result.to_dict() if isinstance(result, SiteResult) else result for result in results]
@@ -0,0 +1,17 @@
+import contextlib
+from aiohttp import web
+
+@contextlib.asynccontextmanager
+async def serve(handler):
+    """Serve every GET request with handler on a free local port and yield the base URL."""
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
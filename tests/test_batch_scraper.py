@@ -0,0 +1,50 @@
+import json
+import pytest
+import batch_scraper
+from batch_scraper import parse_query_line, read_queries, load_config, resolve_settings, query_directory_name
+
+def test_query_lines():
+    assert parse_query_line("plumbers amsterdam") == {'query': "plumbers amsterdam", 'pages': 1, 'results': 100}
+    assert parse_query_line("plumbers\t3\t50", pages=2) == {'query': "plumbers", 'pages': 3, 'results': 50}
+    assert parse_query_line("plumbers\t\t20", pages=2) == {'query': "plumbers", 'pages': 2, 'results': 20}
+    assert parse_query_line('{"query": "bakers", "pages": 40, "results": 5}') == {'query': "bakers", 'pages': 10, 'results': 10}
+    with pytest.raises(ValueError):
+        parse_query_line("\t2")
+
+def test_read_queries_skips_comments_and_invalid_lines(tmp_path):
+    path = tmp_path / "queries.txt"
+    path.write_text("# comment\nplumbers\n\n{broken json\nbakers\t2\n", encoding='utf-8')
+    assert [(entry['query'], entry['pages']) for entry in read_queries(str(path), pages=3)] == [("plumbers", 3), ("bakers", 2)]
+
+def test_command_line_overrides_the_config_file(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({'pages': 4, 'concurrency': 5, 'output_dir': "out"}), encoding='utf-8')
+    settings = resolve_settings(load_config(str(path)), {'pages': 2, 'concurrency': None})
+    assert (settings['pages'], settings['concurrency'], settings['output_dir']) == (2, 5, "out")
+    assert settings['query_delay'] == batch_scraper.DEFAULT_SETTINGS['query_delay']
+
+    path.write_text(json.dumps({'page': 4}), encoding='utf-8')
+    with pytest.raises(ValueError, match="unknown settings: page"):
+        load_config(str(path))
+
+def test_query_directory_name():
+    assert query_directory_name(7, "Plumbers in Amsterdam!") == "007-plumbers-in-amsterdam"
+    assert query_directory_name(12, "???") == "012-query"
+
+def test_main_runs_the_batch(tmp_path, monkeypatch):
+    runs = []
+
+    async def run_batch(queries, settings):
+        runs.append((queries, settings))
+        return [{'query': entry['query']} for entry in queries]
+
+    monkeypatch.setattr(batch_scraper, 'run_batch', run_batch)
+    path = tmp_path / "queries.txt"
+    path.write_text("plumbers\nbakers\n", encoding='utf-8')
+    assert batch_scraper.main([str(path), '--pages', '2', '--no-extract', '--quiet']) == 0
+    [(queries, settings)] = runs
+    assert [entry['pages'] for entry in queries] == [2, 2]
+    assert settings['extract'] is False and settings['cache'] is True
+
+    path.write_text("# nothing\n", encoding='utf-8')
+    assert batch_scraper.main([str(path), '--quiet']) == 1
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import threading
+import pytest
+from browser_pool import BrowserPool
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = threading.Event()
+
+    def get(self, url):
+        # Like a page load, this keeps running in its thread after the task is cancelled
+        deadline = time.monotonic() + 2
+        while not self.quit_called.is_set() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def quit(self):
+        self.quit_called.set()
+
+def _pool(size=1):
+    drivers = []
+
+    def factory(options):
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    return BrowserPool(size, factory=factory), drivers
+
+def test_browsers_are_reused():
+    async def run():
+        pool, drivers = _pool()
+        async with pool.browser() as first:
+            pass
+        async with pool.browser() as second:
+            pass
+        await pool.close()
+        return first, second, drivers
+
+    first, second, drivers = asyncio.run(run())
+    assert first is second and len(drivers) == 1
+    assert first.quit_called.is_set()
+
+def test_failed_browser_is_replaced():
+    async def run():
+        pool, drivers = _pool()
+        with pytest.raises(RuntimeError):
+            async with pool.browser():
+                raise RuntimeError("crashed")
+        async with pool.browser() as driver:
+            pass
+        await pool.close()
+        return driver, drivers
+
+    driver, drivers = asyncio.run(run())
+    assert len(drivers) == 2 and driver is drivers[1]
+    assert drivers[0].quit_called.is_set()
+
+def test_cancelled_browser_is_not_handed_out_again():
+    # Regression: a browser released on cancellation went back to the idle list while the
+    # worker thread of asyncio.to_thread was still loading a page in it
+    async def run():
+        pool, drivers = _pool()
+
+        async def load():
+            async with pool.browser() as driver:
+                await asyncio.to_thread(driver.get, "https://example.com/")
+
+        task = asyncio.ensure_future(load())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        async with pool.browser() as driver:
+            pass
+        await pool.close()
+        return driver, drivers
+
+    driver, drivers = asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert drivers[0].quit_called.is_set()
+    assert driver is not drivers[0]
@@ -0,0 +1,55 @@
+import re
+import random
+import base64
+from email_extractor import EMAIL_REGEX, VALID_TLDS, find_candidates, extract_emails, categorize_email
+
+TRICKY_TEXTS = [
+    "",
+    "no at sign here",
+    "@",
+    "@@a.com",
+    "a@b.com@c.org",
+    "x@y.com.zz-foo@bar.com",
+    "ab@cd.ef.gh@ij.com and kl @mn.com",
+    " @b.com@c.org",
+    "a@b@c.com",
+    "mail:info@shop.co.uk, sales@shop.co.uk.",
+    "<img src='/img/logo@2x.png' srcset='/img/logo@1x.png 1x, /img/hero@3x.webp 3x'>",
+    "vendor@1.2.3.js git@github.com:org/repo.git @media (max-width: 600px)",
+    "a@b.c0m x@y.com-z first.last+tag@sub-domain.example.org",
+    "AAAA" * 500 + "@example.com " + "BBBB" * 500 + "@nope",
+    "a.b@c.d@e.fr@g.hi.jk",
+]
+
+def test_find_candidates_matches_findall():
+    for text in TRICKY_TEXTS:
+        assert find_candidates(text) == re.findall(EMAIL_REGEX, text), text
+
+def test_find_candidates_matches_findall_on_random_text():
+    rng = random.Random(7)
+    alphabet = 'ab1.-_%+@ .:/<>x@yz'
+    for _ in range(2000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(40)))
+        text += rng.choice(['', '.com', '.png', '.c', '.org@'])
+        assert find_candidates(text) == re.findall(EMAIL_REGEX, text), text
+
+def test_tlds_filter_keeps_the_other_matches_in_place():
+    text = "logo@2x.png info@example.com x@y.com.png@z.org"
+    assert find_candidates(text, VALID_TLDS) == \
+        [match for match in re.findall(EMAIL_REGEX, text) if match.rpartition('.')[2] in VALID_TLDS]
+
+def test_long_base64_run_is_linear():
+    data = base64.b64encode(random.Random(1).randbytes(300000)).decode('ascii')
+    text = f'<img src="data:image/png;base64,{data}"> @x <a>info@example.com</a>'
+    assert extract_emails(text) == ['info@example.com']
+
+def test_extract_emails_validates_and_deduplicates():
+    text = ("Info@Example.com info@example.com logo@2x.png a@b.com "
+            "sales@shop.nl app@1.2.js jane@Example.COM")
+    assert extract_emails(text) == ['info@example.com', 'sales@shop.nl']
+
+def test_categorize_email():
+    assert categorize_email('Info@example.com') == 'contact'
+    assert categorize_email('helpdesk@example.com') == 'support'
+    assert categorize_email('webmaster@example.com') == 'admin'
+    assert categorize_email('xyz@example.com') == 'other'
@@ -0,0 +1,156 @@
+import csv
+import gzip
+import json
+import pytest
+from site_result import SiteResult
+from exporters import (CSV_FIELDNAMES, ResultSummary, StreamingCSVExporter, StreamingEmailsOnlyExporter, StreamingJSONLExporter,
+                       StreamingParquetExporter, StreamingExcelExporter, StreamingExport)
+
+TIMESTAMP = "2024-01-01 00:00:00"
+
+def _results():
+    first = SiteResult("https://www.a.com/", status='success', pages_checked=2, domain_matches=1)
+    first.add_email("info@a.com", 'contact')
+    first.add_email("jane@gmail.com", 'personal')
+    second = SiteResult("https://b.com/", status='error', error="timeout")
+    third = SiteResult("https://c.com/", status='success', pages_checked=1, domain_matches=1)
+    third.add_email("sales@c.com", 'sales')
+    return [first, second, third]
+
+def _read_csv(filename):
+    with open(filename, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+def test_csv_round_trip(tmp_path):
+    filename = str(tmp_path / "results.csv")
+    exporter = StreamingCSVExporter(filename, batch_size=2, timestamp=TIMESTAMP)
+    for result in _results():
+        exporter.write(result)
+    exporter.close()
+
+    with open(filename, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['url'] for row in rows] == ["https://www.a.com/", "https://b.com/", "https://c.com/"]
+    assert rows[0]['id'] == '1' and rows[0]['domain'] == "www.a.com"
+    assert rows[0]['all_emails'] == "info@a.com; jane@gmail.com"
+    assert rows[0]['contact_emails'] == "info@a.com" and rows[0]['personal_emails'] == "jane@gmail.com"
+    assert rows[1]['has_email'] == 'No' and rows[1]['error'] == "timeout"
+    assert rows[2]['timestamp'] == TIMESTAMP
+
+def test_rows_are_readable_after_a_flush(tmp_path):
+    filename = str(tmp_path / "emails_only.csv")
+    exporter = StreamingEmailsOnlyExporter(filename, batch_size=100)
+    exporter.write(_results()[0])
+    exporter.flush()
+    assert _read_csv(filename) == [
+        ['Domain', 'Email', 'Category', 'Domain Match'],
+        ['www.a.com', 'info@a.com', 'Contact', 'Yes'],
+        ['www.a.com', 'jane@gmail.com', 'Personal', 'No'],
+    ]
+    exporter.close()
+
+def test_jsonl_round_trip(tmp_path):
+    filename = str(tmp_path / "results.jsonl")
+    exporter = StreamingJSONLExporter(filename)
+    for result in _results():
+        exporter.write(result)
+    exporter.write({'url': "https://old.com/", 'emails': []})
+    exporter.close()
+
+    with open(filename, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[:3] == [result.to_dict() for result in _results()]
+    assert lines[3] == {'url': "https://old.com/", 'emails': []}
+    assert SiteResult.from_dict(lines[0]).categorized_emails() == {'contact': ["info@a.com"], 'personal': ["jane@gmail.com"]}
+
+def test_streaming_export_writes_every_output(tmp_path):
+    export = StreamingExport(str(tmp_path / "results.csv"), str(tmp_path / "emails_only.csv"),
+                             str(tmp_path / "results.jsonl"), str(tmp_path / "summary.txt"), timestamp=TIMESTAMP)
+    with export:
+        for result in _results():
+            export.write(result.to_dict())
+    assert len(_read_csv(tmp_path / "results.csv")) == 4
+    assert len(_read_csv(tmp_path / "emails_only.csv")) == 4
+    assert len((tmp_path / "results.jsonl").read_text(encoding='utf-8').splitlines()) == 3
+    report = (tmp_path / "summary.txt").read_text(encoding='utf-8')
+    assert "Total websites scraped: 3" in report and "Total emails found: 3" in report
+
+def test_summary_matches_a_pass_over_the_full_list():
+    results = _results() + [SiteResult("https://d.com/", status='success')]
+    results[3].add_email("x@d.com", 'other')
+    results[3].add_email("y@d.com", 'other')
+    summary = ResultSummary(top_n=2)
+    for result in results:
+        summary.add(result)
+    assert (summary.total_sites, summary.sites_with_emails, summary.total_emails, summary.domain_matches) == (4, 3, 5, 2)
+    assert summary.sorted_categories()[0] == ('other', 2)
+    # Equal counts keep the order of the results, like a stable sort
+    assert summary.top_domains() == [("www.a.com", 2), ("d.com", 2)]
+    table = summary.summary_table(TIMESTAMP)
+    assert dict(zip(table['Metric'], table['Value']))['Success rate'] == "75.0%"
+    assert table['Metric'][-4:] == ['Other emails', 'Contact emails', 'Personal emails', 'Sales emails']
+
+def test_gzip_jsonl_round_trip(tmp_path):
+    exporter = StreamingJSONLExporter(str(tmp_path / "results.jsonl"), batch_size=1, compression='gzip')
+    assert exporter.filename.endswith("results.jsonl.gz")
+    for result in _results():
+        exporter.write(result)
+    exporter.close()
+    with gzip.open(exporter.filename, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [result.to_dict() for result in _results()]
+
+def test_zstd_jsonl_round_trip(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    exporter = StreamingJSONLExporter(str(tmp_path / "results.jsonl"), batch_size=1, compression='zstd')
+    assert exporter.filename.endswith("results.jsonl.zst")
+    for result in _results():
+        exporter.write(result)
+    exporter.close()
+    with open(exporter.filename, 'rb') as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read().decode('utf-8')
+    assert [json.loads(line) for line in data.splitlines()] == [result.to_dict() for result in _results()]
+
+def test_parquet_round_trip(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    filename = str(tmp_path / "results.parquet")
+    exporter = StreamingParquetExporter(filename, batch_size=2)
+    for result in _results():
+        exporter.write(result)
+    exporter.close()
+
+    parquet = pq.ParquetFile(filename)
+    assert parquet.metadata.num_row_groups == 2
+    rows = parquet.read().to_pylist()
+    assert [(row['domain'], row['email'], row['category'], row['domain_match']) for row in rows] == [
+        ("www.a.com", "info@a.com", 'contact', True),
+        ("www.a.com", "jane@gmail.com", 'personal', False),
+        ("b.com", None, None, None),
+        ("c.com", "sales@c.com", 'sales', True),
+    ]
+    assert rows[2]['status'] == 'error' and rows[2]['error'] == "timeout"
+    assert rows[0]['pages_checked'] == 2
+
+def test_xlsx_round_trip(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    filename = str(tmp_path / "results.xlsx")
+    summary = ResultSummary()
+    exporter = StreamingExcelExporter(filename, timestamp=TIMESTAMP)
+    # Sales arrives before personal, the sheets still come out in the usual order
+    for result in reversed(_results()):
+        summary.add(result)
+        exporter.write(result)
+    exporter.close(summary, background=True)
+    exporter.wait()
+
+    workbook = openpyxl.load_workbook(filename, read_only=True)
+    assert workbook.sheetnames == ['Full Results', 'Summary', 'Contact Emails', 'Sales Emails', 'Personal Emails', 'All Emails']
+    sheet_rows = {name: [list(row) for row in workbook[name].iter_rows(values_only=True)] for name in workbook.sheetnames}
+    workbook.close()
+
+    full_results = sheet_rows['Full Results']
+    assert full_results[0] == CSV_FIELDNAMES
+    assert [row[1] for row in full_results[1:]] == ["https://c.com/", "https://b.com/", "https://www.a.com/"]
+    assert sheet_rows['Contact Emails'] == [['Domain', 'URL', 'Email'], ["www.a.com", "https://www.a.com/", "info@a.com"]]
+    assert sheet_rows['All Emails'][1:] == [["c.com", "sales@c.com", 'Yes'], ["www.a.com", "info@a.com", 'Yes'],
+                                            ["www.a.com", "jane@gmail.com", 'No']]
+    assert dict(sheet_rows['Summary'][1:])['Total emails found'] == 3
@@ -0,0 +1,73 @@
+import time
+import asyncio
+from profiler import StageProfiler
+
+def _busy_in_a():
+    return sum(range(20000))
+
+def _functions(profiler, stage):
+    if stage not in profiler._ordered_stages():
+        return ''
+    return ' '.join(function for function, own, total in profiler.hot_functions(stage, top_n=1000))
+
+def test_concurrent_tasks_keep_their_own_stages():
+    # Regression: one stack for all tasks, so task A leaving 'export' went back to the
+    # 'extraction' stage task B had entered, instead of its own 'fetch'
+    profiler = StageProfiler('cprofile')
+
+    async def run():
+        b_entered = asyncio.Event()
+        a_done = asyncio.Event()
+
+        async def task_b():
+            with profiler.stage('extraction'):
+                b_entered.set()
+                await a_done.wait()
+
+        with profiler.stage('fetch'):
+            b = asyncio.ensure_future(task_b())
+            await b_entered.wait()
+            with profiler.stage('export'):
+                pass
+            _busy_in_a()
+            a_done.set()
+            await b
+
+    profiler.start()
+    asyncio.run(run())
+    profiler.stop()
+
+    assert '_busy_in_a' in _functions(profiler, 'fetch')
+    assert '_busy_in_a' not in _functions(profiler, 'extraction')
+
+def _busy_in_thread():
+    return sum(range(200000))
+
+def test_worker_thread_work_is_attributed_to_the_stage():
+    # Regression: stage() around asyncio.to_thread only profiled the event loop waiting
+    profiler = StageProfiler('cprofile')
+
+    async def run():
+        with profiler.stage('serp_browser'):
+            await asyncio.to_thread(profiler.call, 'serp_browser', _busy_in_thread)
+
+    profiler.start()
+    asyncio.run(run())
+    profiler.stop()
+    assert '_busy_in_thread' in _functions(profiler, 'serp_browser')
+
+def test_sampler_samples_worker_threads():
+    profiler = StageProfiler('sample', interval=0.001)
+
+    def spin():
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            _busy_in_thread()
+
+    async def run():
+        await asyncio.to_thread(profiler.call, 'serp_browser', spin)
+
+    profiler.start()
+    asyncio.run(run())
+    profiler.stop()
+    assert '_busy_in_thread' in _functions(profiler, 'serp_browser')
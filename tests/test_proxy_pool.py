@@ -0,0 +1,106 @@
+import asyncio
+import aiohttp
+from aiohttp import web
+from proxy_pool import ProxyPool, is_proxy_failure
+from async_google_scraper import extract_emails_from_url
+from benchmarks.site_farm import FarmConnector
+from benchmarks.stub_proxy import StubProxy
+from support import serve
+
+def test_proxy_failures_are_proxy_errors_only():
+    connection_key = object()
+    assert is_proxy_failure(aiohttp.ClientProxyConnectionError(connection_key, OSError("refused")))
+    assert is_proxy_failure(status=407)
+    assert is_proxy_failure(status=429)
+    # Regression: a slow site used to count against the proxy it was fetched through
+    assert not is_proxy_failure(asyncio.TimeoutError())
+    assert not is_proxy_failure(aiohttp.ServerTimeoutError())
+    assert not is_proxy_failure(status=500)
+    # Regression: a 502 to CONNECT means the site is down, the same as a 502 over plain http
+    assert is_proxy_failure(aiohttp.ClientHttpProxyError(None, (), status=407))
+    assert not is_proxy_failure(aiohttp.ClientHttpProxyError(None, (), status=502))
+    assert not is_proxy_failure(aiohttp.ClientHttpProxyError(None, (), status=503))
+    assert not is_proxy_failure(status=200)
+
+def test_weighting_prefers_fast_healthy_proxies():
+    async def run():
+        pool = ProxyPool(['http://fast:1', 'http://slow:1', 'http://flaky:1'], max_per_proxy=100)
+        fast, slow, flaky = pool.proxies
+        for _ in range(20):
+            pool.record(fast, 0.1)
+            pool.record(slow, 2.0)
+            pool.record(flaky, 0.1, failed=(_ % 2 == 0))
+            flaky.consecutive_failures = 0
+        pool._random.seed(1)
+        picks = []
+        for _ in range(300):
+            proxy = await pool.acquire()
+            picks.append(proxy.url)
+            await pool.release(proxy)
+        return picks
+
+    picks = asyncio.run(run())
+    assert picks.count('http://fast:1') > picks.count('http://flaky:1') > picks.count('http://slow:1') > 0
+
+def test_ejection_and_return():
+    async def run():
+        pool = ProxyPool(['http://a:1', 'http://b:1'], eject_after=2, eject_seconds=0.2)
+        a = pool.proxies[0]
+        pool.record(a, 0.1, failed=True)
+        assert not pool.is_ejected(a)
+        pool.record(a, 0.1, failed=True)
+        assert pool.is_ejected(a) and a.ejections == 1
+        # Requests still in flight do not eject it again
+        pool.record(a, 0.1, failed=True)
+        assert a.ejections == 1
+        picks = set()
+        for _ in range(20):
+            proxy = await pool.acquire()
+            picks.add(proxy.url)
+            await pool.release(proxy)
+        assert picks == {'http://b:1'}
+        await asyncio.sleep(0.25)
+        assert not pool.is_ejected(a)
+        # Back from ejection, a single failure ejects it again
+        pool.record(a, 0.1, failed=True)
+        assert pool.is_ejected(a) and a.ejections == 2
+
+    asyncio.run(run())
+
+def test_acquire_waits_for_a_free_proxy():
+    async def run():
+        pool = ProxyPool(['http://a:1'], max_per_proxy=1)
+        first = await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await pool.release(first, 0.1)
+        second = await asyncio.wait_for(waiter, timeout=1)
+        assert second is first and second.in_flight == 1
+
+    asyncio.run(run())
+
+def test_slow_site_does_not_penalise_proxy():
+    async def slow_site(request):
+        await asyncio.sleep(2)
+        return web.Response(text="<p>info@example.com</p>", content_type='text/html')
+
+    async def run():
+        async with serve(slow_site) as base_url:
+            stub = StubProxy(int(base_url.rsplit(':', 1)[1]))
+            port = await stub.start()
+            try:
+                pool = ProxyPool([f"http://127.0.0.1:{port}"], eject_after=2)
+                # The stub proxy has no CONNECT, so the https contact pages go out as plain http
+                async with aiohttp.ClientSession(connector=FarmConnector(port)) as session:
+                    result = await extract_emails_from_url(session, "http://slow.example/", asyncio.Semaphore(5),
+                                                           timeout=0.3, proxy_pool=pool)
+                return result, pool.proxies[0], stub.requests
+            finally:
+                await stub.stop()
+
+    result, proxy, requests = asyncio.run(asyncio.wait_for(run(), timeout=20))
+    assert result.status == 'failure'
+    assert proxy.failures == 0 and proxy.ejections == 0
+    # Every page is tried at most twice
+    assert requests <= 2 * result.pages_checked
@@ -0,0 +1,98 @@
+import asyncio
+from site_result import SiteResult
+from browser_pool import BrowserPool
+from render_fallback import RenderFallback
+
+class FakeDriver:
+    def __init__(self, pages):
+        self.pages = pages
+        self.url = None
+        self.quit_called = False
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        if url not in self.pages:
+            raise RuntimeError("page crashed")
+        self.url = url
+
+    def execute_script(self, script):
+        return 'complete'
+
+    @property
+    def page_source(self):
+        return self.pages[self.url]
+
+    def quit(self):
+        self.quit_called = True
+
+def _fallback(pages, budget=60.0):
+    drivers = []
+
+    def factory(options):
+        drivers.append(FakeDriver(pages))
+        return drivers[-1]
+
+    return RenderFallback(browsers=1, budget=budget, settle=0, pool=BrowserPool(1, factory=factory)), drivers
+
+def _static(url, emails=(), html_pages=1, error=None):
+    result = SiteResult(url, status='success' if error is None else 'error', html_pages=html_pages, error=error)
+    for email in emails:
+        result.add_email(email)
+    return result
+
+async def _as_async(results):
+    for result in results:
+        yield result
+
+def test_only_html_without_emails_is_rendered():
+    fallback, _ = _fallback({})
+    assert fallback.wants(_static("https://a.com/"))
+    assert not fallback.wants(_static("https://a.com/", ["info@a.com"]))
+    assert not fallback.wants(_static("https://a.com/", html_pages=0))
+    assert not fallback.wants(_static("https://a.com/", error="timeout"))
+
+def test_rendered_emails_are_added():
+    pages = {"https://js.com/": "<p>contact@js.com</p><p>jane@gmail.com</p>", "https://empty.com/": "<p>nothing</p>"}
+
+    async def run():
+        fallback, drivers = _fallback(pages)
+        static = [_static("https://js.com/"), _static("https://static.com/", ["info@static.com"]), _static("https://empty.com/")]
+        results = [result async for result in fallback.iter_results(_as_async(static))]
+        await fallback.pool.close()
+        return fallback, drivers, results
+
+    fallback, drivers, results = asyncio.run(asyncio.wait_for(run(), timeout=10))
+    # The static result is not held back by the renders
+    assert results[0].url == "https://static.com/" and results[0].get_extra('render') is None
+    by_url = {result.url: result for result in results}
+    rendered = by_url["https://js.com/"]
+    assert rendered.emails == ["contact@js.com", "jane@gmail.com"]
+    assert rendered.get_extra('render') == 'done' and rendered.domain_matches == 1
+    assert by_url["https://empty.com/"].get_extra('render') == 'done' and not by_url["https://empty.com/"].emails
+    assert (fallback.rendered, fallback.emails_found) == (2, 2)
+    assert len(drivers) == 1 and drivers[0].quit_called
+
+def test_sites_are_skipped_once_the_budget_is_spent():
+    async def run():
+        fallback, drivers = _fallback({}, budget=0)
+        result = await fallback.render(_static("https://js.com/"))
+        return fallback, drivers, result
+
+    fallback, drivers, result = asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert result.get_extra('render') == 'skipped' and fallback.skipped == 1
+    assert drivers == []
+
+def test_failed_render_replaces_the_browser():
+    async def run():
+        fallback, drivers = _fallback({"https://ok.com/": "<p>info@ok.com</p>"})
+        failed = await fallback.render(_static("https://crash.com/"))
+        rendered = await fallback.render(_static("https://ok.com/"))
+        await fallback.pool.close()
+        return drivers, failed, rendered
+
+    drivers, failed, rendered = asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert failed.get_extra('render') == 'failed' and not failed.emails
+    assert rendered.emails == ["info@ok.com"]
+    assert len(drivers) == 2 and drivers[0].quit_called
@@ -0,0 +1,78 @@
+from results_db import ResultDatabase, normalize_domain
+from site_result import SiteResult
+from seen_filter import SeenFilter
+
+def _result(url, emails, status='success'):
+    result = SiteResult(url, status=status)
+    for email in emails:
+        result.add_email(email, 'contact' if email.startswith('info') else 'other')
+    return result
+
+def test_normalize_domain():
+    assert normalize_domain("HTTPS://www.Example.com:8080/contact") == "example.com"
+    assert normalize_domain("www.shop.nl") == "shop.nl"
+
+def test_results_are_upserted_across_runs(tmp_path):
+    path = str(tmp_path / "results.db")
+    with ResultDatabase(path, query="first") as database:
+        database.write(_result("https://example.com/", ["info@example.com"]))
+        database.write(_result("https://other.com/", []))
+    with ResultDatabase(path, query="second") as database:
+        database.write(_result("https://example.com/", ["info@example.com", "jane@gmail.com"]))
+        database.flush()
+
+        rows = database.find_emails(domain="www.example.com")
+        assert [(row['email'], row['first_run_id'], row['last_run_id']) for row in rows] == \
+            [("info@example.com", 1, 2), ("jane@gmail.com", 2, 2)]
+        assert rows[0]['category'] == 'contact' and rows[0]['domain_match'] == 1 and rows[1]['domain_match'] == 0
+        assert [site['url'] for site in database.find_sites(has_emails=True)] == ["https://example.com/"]
+        assert database.domain_stats() == {'example.com': (1, 1), 'other.com': (1, 0)}
+        assert [run['query'] for run in database.runs()] == ["second", "first"]
+
+def test_stale_emails_are_removed(tmp_path):
+    # Regression: emails a site no longer had stayed in the emails table forever
+    path = str(tmp_path / "results.db")
+    with ResultDatabase(path) as database:
+        database.write(_result("https://example.com/", ["info@example.com", "old@example.com"]))
+    with ResultDatabase(path) as database:
+        database.write(_result("https://example.com/", ["info@example.com"]))
+        database.write(_result("https://gone.com/", []))
+        database.flush()
+        assert [row['email'] for row in database.find_emails()] == ["info@example.com"]
+        assert database.find_emails(email="old@example.com") == []
+        assert database.find_sites(domain="example.com")[0]['email_count'] == 1
+
+def test_failed_rescrape_keeps_the_stored_emails(tmp_path):
+    # Regression: a timeout on a later run deleted the site's emails and its domain stats
+    path = str(tmp_path / "results.db")
+    with ResultDatabase(path) as database:
+        database.write(_result("https://b.com/", ["info@b.com"]))
+    with ResultDatabase(path) as database:
+        failed = _result("https://b.com/", [], status='failure')
+        failed.error = "Timeout"
+        database.write(failed)
+        database.write(_result("https://new.com/", [], status='failure'))
+        database.flush()
+        assert [row['email'] for row in database.find_emails(domain='b.com')] == ["info@b.com"]
+        site = database.find_sites(domain='b.com')[0]
+        assert (site['status'], site['email_count'], site['last_run_id']) == ('success', 1, 2)
+        assert database.domain_stats() == {'b.com': (1, 1), 'new.com': (1, 0)}
+
+def test_suppressed_emails_are_kept(tmp_path):
+    # Regression: with --suppress-seen the second run of a site deleted every email it had
+    path = str(tmp_path / "results.db")
+    seen = SeenFilter(str(tmp_path / "seen.bloom"), capacity=1000, fp_rate=0.01, suppress=True)
+    try:
+        for _ in range(2):
+            result = _result("https://b.com/", ["info@b.com", "jane@b.com"])
+            result.domain_matches = 2
+            seen.apply(result)
+            with ResultDatabase(path) as database:
+                database.write(result)
+        assert result.emails == []
+        with ResultDatabase(path) as database:
+            assert [row['email'] for row in database.find_emails()] == ["info@b.com", "jane@b.com"]
+            site = database.find_sites()[0]
+            assert (site['email_count'], site['domain_matches']) == (2, 2)
+    finally:
+        seen.close()
@@ -0,0 +1,67 @@
+import time
+import asyncio
+from scheduler import PriorityScheduler
+from site_result import SiteResult
+
+def _collect(scheduler, urls, deadline=None):
+    async def collect():
+        return [url async for url in scheduler.iter_urls(urls, deadline)]
+    return asyncio.run(collect())
+
+def test_history_orders_urls():
+    scheduler = PriorityScheduler({'b.com': (10, 10), 'a.com': (10, 0)})
+    assert _collect(scheduler, ['http://a.com/', 'http://c.com/', 'http://b.com/']) == \
+        ['http://b.com/', 'http://c.com/', 'http://a.com/']
+
+def test_async_source_is_ordered_when_ready():
+    async def source():
+        for url in ['http://a.com/', 'http://c.com/', 'http://b.com/']:
+            yield url
+
+    scheduler = PriorityScheduler({'b.com': (10, 10), 'a.com': (10, 0)})
+    assert _collect(scheduler, source()) == ['http://b.com/', 'http://c.com/', 'http://a.com/']
+
+def test_slow_source_does_not_hold_back_urls():
+    # Regression: the queue used to be filled up to lookahead before the first URL was
+    # yielded, so a slow pipe started nothing until the deadline had passed
+    async def run():
+        stalled = asyncio.Event()
+
+        async def source():
+            yield 'http://a.com/'
+            yield 'http://b.com/'
+            await stalled.wait()
+            yield 'http://never.com/'
+
+        scheduler = PriorityScheduler()
+        start = time.monotonic()
+        received = []
+        async for url in scheduler.iter_urls(source(), deadline=start + 0.5):
+            received.append((url, time.monotonic() - start))
+        return received, time.monotonic() - start
+
+    received, elapsed = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert [url for url, _ in received] == ['http://a.com/', 'http://b.com/']
+    assert all(seconds < 0.2 for _, seconds in received)
+    assert elapsed < 1.0
+
+def test_no_urls_after_deadline():
+    scheduler = PriorityScheduler()
+    assert _collect(scheduler, ['http://a.com/', 'http://b.com/'], deadline=time.monotonic() - 1) == []
+    assert scheduler.queued() == 2
+
+def test_observe_moves_slow_hosts_back():
+    scheduler = PriorityScheduler(default_seconds=1.0)
+    scheduler.add('http://slow.com/1', 1)
+    scheduler.add('http://fast.com/1', 2)
+    scheduler.add('http://slow.com/2', 3)
+    scheduler.add('http://fast.com/2', 4)
+    assert scheduler.pop() == 'http://slow.com/1'
+    assert scheduler.pop() == 'http://fast.com/1'
+    scheduler._dispatched['http://slow.com/1'] -= 5
+    for url in ('http://slow.com/1', 'http://fast.com/1'):
+        result = SiteResult(url, status='success')
+        result.add_email('info@example.com')
+        scheduler.observe(result)
+    assert scheduler.expected_seconds('http://slow.com/2') > scheduler.expected_seconds('http://fast.com/2')
+    assert scheduler.pop() == 'http://fast.com/2'
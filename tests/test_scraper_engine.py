@@ -0,0 +1,58 @@
+import time
+import contextlib
+import asyncio
+from aiohttp import web
+from scraper_engine import ScraperEngine
+from support import serve
+
+async def handler(request):
+    if request.path.startswith('/slow'):
+        await asyncio.sleep(1.5)
+    return web.Response(text=f"<p>info@{request.path.strip('/').split('/')[0]}.com</p>", content_type='text/html')
+
+def test_cached_results_are_not_held_back_by_fetches():
+    # Regression: cached results used to wait for the next fetched site to complete
+    async def run():
+        async with serve(handler) as base_url, ScraperEngine(max_concurrent=5, timeout=5) as engine:
+            first = [result async for result in engine.extract([f"{base_url}/fast"])]
+            start = time.monotonic()
+            arrivals = []
+            async for result in engine.extract([f"{base_url}/fast", f"{base_url}/slow"]):
+                arrivals.append((result.url.rsplit('/', 1)[1], time.monotonic() - start))
+            return first, arrivals
+
+    first, arrivals = asyncio.run(run())
+    assert "info@fast.com" in first[0].emails
+    assert arrivals[0][0] == 'fast' and arrivals[0][1] < 0.5
+    assert arrivals[1][0] == 'slow'
+
+def test_consumer_can_stop_early():
+    async def run():
+        async with serve(handler) as base_url, ScraperEngine(max_concurrent=5, timeout=5) as engine:
+            start = time.monotonic()
+            async for result in engine.extract([f"{base_url}/slow{i}" for i in range(3)] + [f"{base_url}/fast"]):
+                break
+            return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert result.url.endswith('/fast')
+    assert elapsed < 1.0
+
+def test_stopping_early_cancels_the_sites_in_progress():
+    # Regression: the fetcher was cancelled while blocked on the queue, which left the site
+    # results suspended with their requests running until garbage collection
+    def running_sites():
+        return [task for task in asyncio.all_tasks()
+                if task.get_coro().__name__ == 'extract_emails_from_url' and not task.done() and not task.cancelling()]
+
+    async def run():
+        async with serve(handler) as base_url, ScraperEngine(max_concurrent=5, timeout=5) as engine:
+            urls = [f"{base_url}/fast{i}" for i in range(3)] + [f"{base_url}/slow{i}" for i in range(3)]
+            async with contextlib.aclosing(engine.extract(urls)) as results:
+                async for result in results:
+                    # Meanwhile the fast sites fill the queue and the fetcher blocks on it
+                    await asyncio.sleep(0.3)
+                    break
+            return running_sites()
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=10)) == []
@@ -0,0 +1,106 @@
+import asyncio
+import aiohttp
+import pytest
+from aiohttp import web
+from seen_filter import BloomFilter, SeenFilter
+from site_result import SiteResult
+from async_google_scraper import extract_emails_from_url
+from support import serve
+
+def test_bloom_filter_persists_keys(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    with BloomFilter(path, capacity=1000, fp_rate=0.01) as bloom:
+        assert bloom.add("info@example.com")
+        assert not bloom.add("info@example.com")
+        assert "info@example.com" in bloom
+
+    # An existing file keeps its own size, whatever is asked for
+    with BloomFilter(path, capacity=5, fp_rate=0.5) as bloom:
+        assert "info@example.com" in bloom
+        assert "sales@example.com" not in bloom
+        assert (bloom.capacity, bloom.fp_rate, len(bloom)) == (1000, 0.01, 1)
+
+def test_bloom_filter_false_positive_rate(tmp_path):
+    with BloomFilter(str(tmp_path / "seen.bloom"), capacity=10000, fp_rate=0.01) as bloom:
+        for i in range(10000):
+            bloom.add(f"user{i}@example.com")
+        assert all(f"user{i}@example.com" in bloom for i in range(10000))
+        false_positives = sum(f"other{i}@example.org" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.02
+
+def test_bloom_filter_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"x" * 100)
+    with pytest.raises(ValueError):
+        BloomFilter(str(path))
+
+def _result(url, emails, html_pages=1, status='success'):
+    result = SiteResult(url, status=status, html_pages=html_pages)
+    for email in emails:
+        result.add_email(email)
+    return result
+
+def test_seen_filter_flags_emails_and_records_domains(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    seen = SeenFilter(path, capacity=1000)
+    first = _result("https://www.example.com/", ["info@example.com"])
+    seen.apply(first)
+    assert first.get_extra('seen_emails') is None
+    seen.close()
+
+    seen = SeenFilter(path, skip_domains=True)
+    second = _result("https://example.com/about", ["info@example.com", "sales@example.com"])
+    seen.apply(second)
+    assert second.get_extra('seen_emails') == ["info@example.com"]
+    assert seen.filter_urls(["http://example.com/contact", "https://other.com/"]) == ["https://other.com/"]
+    assert seen.skipped_sites == 1
+    seen.close()
+
+def test_seen_filter_suppress_recomputes_domain_matches(tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.bloom"), capacity=1000, suppress=True)
+    seen.apply(_result("https://a.com/", ["info@a.com"]))
+    result = _result("https://www.a.com/", ["info@a.com", "sales@a.com", "x@gmail.com"])
+    result.domain_matches = 2
+    seen.apply(result)
+    assert result.emails == ["sales@a.com", "x@gmail.com"]
+    assert result.domain_matches == 1
+    seen.close()
+
+def test_seen_filter_does_not_record_sites_without_content(tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.bloom"), capacity=1000, skip_domains=True)
+    seen.apply(_result("https://down.com/", [], html_pages=0))
+    seen.apply(_result("https://broken.com/", [], html_pages=0, status='failure'))
+    seen.apply(_result("https://empty.com/", [], html_pages=1))
+    assert seen.filter_urls(["https://down.com/", "https://broken.com/", "https://empty.com/"]) == \
+        ["https://down.com/", "https://broken.com/"]
+    seen.close()
+
+def test_unreachable_site_is_not_marked_seen(tmp_path):
+    async def handler(request):
+        raise web.HTTPInternalServerError()
+
+    async def scrape():
+        async with serve(handler) as base_url, aiohttp.ClientSession() as session:
+            return await extract_emails_from_url(session, f"{base_url}/", asyncio.Semaphore(5), timeout=5)
+
+    result = asyncio.run(scrape())
+    assert result.status == 'failure'
+    assert result.error
+    assert result.pages_checked == 3 and result.html_pages == 0
+
+    seen = SeenFilter(str(tmp_path / "seen.bloom"), capacity=1000, skip_domains=True)
+    seen.apply(result)
+    assert not seen.seen_domain(result.url)
+    seen.close()
+
+def test_loaded_site_is_success():
+    async def handler(request):
+        return web.Response(text="<p>info@example.com</p>", content_type='text/html')
+
+    async def scrape():
+        async with serve(handler) as base_url, aiohttp.ClientSession() as session:
+            return await extract_emails_from_url(session, f"{base_url}/", asyncio.Semaphore(5), timeout=5)
+
+    result = asyncio.run(scrape())
+    assert result.status == 'success' and result.error is None
+    assert result.emails == ["info@example.com"]
@@ -0,0 +1,30 @@
+import asyncio
+from aiohttp import web
+from async_google_scraper import shard_urls_by_domain, scrape_websites_sharded
+from support import serve
+
+def test_urls_of_a_domain_share_a_shard():
+    urls = [f"https://site{i}.com/page{j}" for i in range(20) for j in range(3)] + ["https://www.site3.com/"]
+    shards = shard_urls_by_domain(urls, 4)
+    assert len(shards) == 4 and sorted(url for shard in shards for url in shard) == sorted(urls)
+    for i in range(20):
+        [shard] = [shard for shard in shards if f"https://site{i}.com/page0" in shard]
+        assert all(f"https://site{i}.com/page{j}" in shard for j in range(3))
+    assert any("https://www.site3.com/" in shard and "https://site3.com/page0" in shard for shard in shards)
+    # The hash is stable, so a rerun puts every domain in the same shard
+    assert shard_urls_by_domain(urls, 4) == shards
+
+async def handler(request):
+    host = request.path.strip('/').split('/')[0]
+    return web.Response(text=f"<p>info@{host}.com</p>", content_type='text/html')
+
+def test_sharded_results_are_merged():
+    async def run():
+        async with serve(handler) as base_url:
+            urls = [f"{base_url}/site{i}" for i in range(6)]
+            return urls, await scrape_websites_sharded(urls, num_workers=2, max_sites=5, max_concurrent=3)
+
+    urls, results = asyncio.run(asyncio.wait_for(run(), timeout=60))
+    # All local URLs share a domain, so one worker gets them all
+    assert sorted(result.url for result in results) == sorted(urls[:5])
+    assert all(result.emails == [f"info@{result.url.rsplit('/', 1)[1]}.com"] for result in results)
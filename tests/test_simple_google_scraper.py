@@ -0,0 +1,31 @@
+import pytest
+import simple_google_scraper
+
+class FakeSession:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_session_is_closed_when_a_site_raises(monkeypatch):
+    # Regression: the session of the sequential path leaked when a site raised
+    session = FakeSession()
+
+    def extract(url, timeout, session):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(simple_google_scraper, 'create_session', lambda: session)
+    monkeypatch.setattr(simple_google_scraper, 'extract_emails_from_url', extract)
+    with pytest.raises(RuntimeError):
+        simple_google_scraper.scrape_websites_for_emails(["https://example.com/"])
+    assert session.closed
+
+def test_threaded_results_keep_url_order(monkeypatch):
+    def extract(url, timeout, session):
+        return [f"info@{url.split('//')[1].strip('/')}"]
+
+    monkeypatch.setattr(simple_google_scraper, 'extract_emails_from_url', extract)
+    urls = [f"https://site{i}.com/" for i in range(10)]
+    results = simple_google_scraper.scrape_websites_for_emails(urls, workers=4)
+    assert [result['url'] for result in results] == urls
+    assert results[3]['emails'] == ["info@site3.com"]
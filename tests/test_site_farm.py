@@ -0,0 +1,23 @@
+import asyncio
+import aiohttp
+from async_google_scraper import extract_emails_from_url
+from benchmarks.site_farm import FarmConfig, FarmConnector, SiteFarm, build_sites
+
+def test_contact_pages_on_https_reach_the_farm():
+    # The scraper requests contact pages on https, which the http-only farm must still serve
+    async def run():
+        config = FarmConfig(sites=20, latency=0, error_rate=0, redirect_rate=0, no_email_rate=0, contact_rate=1)
+        farm = SiteFarm(config)
+        port = await farm.start()
+        try:
+            async with aiohttp.ClientSession(connector=FarmConnector(port)) as session:
+                site = build_sites(config)[0]
+                async with session.get(f"https://{site.host}/contact") as response:
+                    assert response.status == 200
+                    assert site.emails[0] in await response.text()
+                result = await extract_emails_from_url(session, site.url, asyncio.Semaphore(5))
+                assert sorted(result.emails) == sorted(site.emails)
+        finally:
+            await farm.stop()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=30))
@@ -0,0 +1,58 @@
+import pytest
+from site_result import SiteResult, CATEGORY_NAMES, UNCATEGORIZED, as_site_result, to_json_results
+
+def test_categories_are_stored_as_codes():
+    result = SiteResult("https://www.example.com/contact")
+    result.add_email("info@example.com", 'contact')
+    result.add_email("sales@example.com", 'sales')
+    result.add_email("old@example.com", None)
+    assert result.domain == "www.example.com"
+    assert list(result.category_codes) == [CATEGORY_NAMES.index('contact'), CATEGORY_NAMES.index('sales'), UNCATEGORIZED]
+    assert list(result.email_categories()) == \
+        [("info@example.com", 'contact'), ("sales@example.com", 'sales'), ("old@example.com", None)]
+    assert result.categorized_emails() == {'contact': ["info@example.com"], 'sales': ["sales@example.com"]}
+    with pytest.raises(KeyError):
+        result.add_email("x@example.com", 'unknown')
+
+def test_dict_round_trip():
+    result = SiteResult("https://example.com/", status='success', pages_checked=3, domain_matches=1, html_pages=2)
+    result.add_email("info@example.com", 'contact')
+    result.add_email("jane@gmail.com", 'personal')
+    result.set_extra('timings', {'total_ms': 12.5})
+    data = result.to_dict()
+    assert data['metadata']['categorized_emails'] == {'contact': ["info@example.com"], 'personal': ["jane@gmail.com"]}
+    assert data['metadata']['timings'] == {'total_ms': 12.5}
+
+    copy = SiteResult.from_dict(data)
+    assert copy.to_dict() == data
+    assert copy.get_extra('timings') == {'total_ms': 12.5} and copy.get_extra('render') is None
+    assert as_site_result(data).emails == result.emails
+    assert as_site_result(result) is result
+    assert to_json_results([result, data]) == [data, data]
+
+def test_dict_access_for_old_scripts():
+    result = SiteResult("https://example.com/", status='success')
+    result.add_email("info@example.com")
+    assert result['url'] == "https://example.com/"
+    assert result['metadata']['status'] == 'success'
+    result['emails'].append("changed@example.com")
+    assert result.emails == ["info@example.com"]
+    assert result.get('missing', 'default') == 'default'
+
+def test_from_dict_with_unknown_category():
+    data = {'url': "https://example.com/", 'emails': ["a@example.com", "b@example.com"],
+            'metadata': {'categorized_emails': {'legacy': ["a@example.com"]}}}
+    result = SiteResult.from_dict(data)
+    assert list(result.email_categories()) == [("a@example.com", 'other'), ("b@example.com", None)]
+    assert result.status == 'unknown'
+
+def test_remove_emails_keeps_codes_and_domain_matches_in_step():
+    result = SiteResult("https://www.example.com/", domain_matches=2)
+    result.add_email("info@example.com", 'contact')
+    result.add_email("jane@gmail.com", 'personal')
+    result.add_email("sales@example.com", 'sales')
+    result.remove_emails(["info@example.com"])
+    assert list(result.email_categories()) == [("jane@gmail.com", 'personal'), ("sales@example.com", 'sales')]
+    assert result.domain_matches == 1
+    assert result.to_dict()['emails'] == ["jane@gmail.com", "sales@example.com"]
+    assert list(result.all_email_categories())[-1] == ("info@example.com", 'contact')
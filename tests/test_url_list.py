@@ -0,0 +1,71 @@
+import os
+import sys
+import csv
+import asyncio
+import subprocess
+import aiohttp
+from aiohttp import web
+from async_google_scraper import stream_url_lines, iter_site_results, run_url_list
+from support import serve
+
+async def handler(request):
+    await asyncio.sleep(0.05)
+    return web.Response(text=f"<p>info@{request.path.strip('/').split('/')[0]}.com</p>", content_type='text/html')
+
+def test_url_lines_are_streamed(tmp_path):
+    path = tmp_path / "urls.txt"
+    path.write_text("# sites\nexample.com\n\nhttp://b.com/contact\n" + "".join(f"site{i}.com\n" for i in range(100)),
+                    encoding='utf-8')
+
+    async def run():
+        return [url async for url in stream_url_lines(str(path), batch_bytes=16)]
+
+    urls = asyncio.run(run())
+    assert urls[:3] == ["https://example.com", "http://b.com/contact", "https://site0.com"]
+    assert len(urls) == 102
+
+def test_sites_in_progress_stay_within_the_window():
+    in_progress = 0
+    most_in_progress = 0
+
+    async def counting_handler(request):
+        nonlocal in_progress, most_in_progress
+        in_progress += 1
+        most_in_progress = max(most_in_progress, in_progress)
+        try:
+            return await handler(request)
+        finally:
+            in_progress -= 1
+
+    async def run():
+        async with serve(counting_handler) as base_url, aiohttp.ClientSession() as session:
+            async def urls():
+                for i in range(20):
+                    yield f"{base_url}/site{i}"
+
+            return [result async for result in iter_site_results(session, urls(), max_concurrent=10, window=3)]
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=30))
+    assert len(results) == 20 and all(result.emails for result in results)
+    assert most_in_progress <= 3
+
+def test_url_list_run_writes_the_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def run():
+        async with serve(handler) as base_url:
+            (tmp_path / "urls.txt").write_text("".join(f"{base_url}/site{i}\n" for i in range(5)), encoding='utf-8')
+            await run_url_list("urls.txt", max_concurrent=3, max_sites=4)
+
+    asyncio.run(asyncio.wait_for(run(), timeout=30))
+    with open("google_results_with_emails.csv", newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row['all_emails'] for row in rows) == [f"info@site{i}.com" for i in range(4)]
+    assert os.path.exists("scraping_results.db") and os.path.exists("email_scraping_summary.txt")
+
+def test_url_list_mode_does_not_import_the_browser_stack():
+    code = ("import sys, async_google_scraper; "
+            "print(sorted(name for name in ('selenium', 'bs4', 'openpyxl', 'pyarrow') if name in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
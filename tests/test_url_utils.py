@@ -0,0 +1,30 @@
+from url_utils import unwrap_redirect, normalize_url, canonical_key, dedupe_urls
+
+def test_unwrap_redirect():
+    assert unwrap_redirect("/url?q=https://example.com/%3Fa%3D1&sa=U&ved=x") == "https://example.com/?a=1"
+    assert unwrap_redirect("https://www.google.com/url?url=http://example.com/&usg=y") == "http://example.com/"
+    assert unwrap_redirect("https://example.com/url?q=https://other.com/") == "https://example.com/url?q=https://other.com/"
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://WWW.Example.COM:443?utm_source=x&b=2&a=1#top") == "https://www.example.com/?b=2&a=1"
+    assert normalize_url("http://example.com.:8080/Path?gclid=1") == "http://example.com:8080/Path"
+    assert normalize_url("https://user:pw@example.com/") == "https://user:pw@example.com/"
+
+def test_normalize_url_keeps_ipv6_brackets():
+    # Regression: hostname drops the brackets, which left 'http://::1:8080/'
+    assert normalize_url("http://[::1]:8080/") == "http://[::1]:8080/"
+    assert normalize_url("https://[2001:DB8::1]:443/a?fbclid=x") == "https://[2001:db8::1]/a"
+    assert canonical_key("http://[::1]:8080/contact/") == "[::1]:8080/contact"
+
+def test_canonical_key():
+    key = canonical_key("https://example.com/contact?a=1&b=2")
+    assert canonical_key("http://www.example.com/contact/?b=2&a=1&utm_medium=cpc") == key
+    assert canonical_key("https://example.com/%63ontact?a=1&b=2#form") == key
+    assert canonical_key("https://example.com/about?a=1&b=2") != key
+
+def test_dedupe_urls_prefers_https():
+    urls = ["http://example.com/?utm_source=x", "https://www.example.com", "https://other.com/a", "http://example.com/?utm_source=x"]
+    unique, fetched = dedupe_urls(urls)
+    assert unique == ["https://www.example.com/", "https://other.com/a"]
+    assert fetched["http://example.com/?utm_source=x"] == "https://www.example.com/"
+    assert len(fetched) == 3
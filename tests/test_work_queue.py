@@ -0,0 +1,75 @@
+import pytest
+from distributed_scraper import WorkQueue, SQLiteWorkQueue, open_work_queue
+
+URLS = ["https://a.com/", "https://b.com/", "https://c.com/"]
+
+def test_push_skips_known_urls(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    assert queue.push(URLS) == 3
+    assert queue.push(URLS[:1] + ["https://d.com/"]) == 1
+    assert queue.counts() == {'pending': 4}
+    queue.close()
+
+def test_leases_are_exclusive_across_connections(tmp_path):
+    path = str(tmp_path / "queue.db")
+    first, second = SQLiteWorkQueue(path), SQLiteWorkQueue(path)
+    first.push(URLS)
+    leased_first = first.lease('w1', batch_size=2)
+    leased_second = second.lease('w2', batch_size=2)
+    assert [url for _, url in leased_first] == URLS[:2]
+    assert [url for _, url in leased_second] == URLS[2:]
+    assert second.lease('w2') == []
+    assert first.counts() == {'leased': 3}
+    first.close()
+    second.close()
+
+def test_ack_stores_the_result_and_drains(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    queue.push(URLS[:2])
+    assert not queue.is_drained()
+    for item_id, url in queue.lease('w1'):
+        queue.ack(item_id, 'w1', {'url': url, 'emails': []})
+    assert queue.is_drained()
+    assert queue.counts() == {'done': 2}
+    assert [result['url'] for result in queue.results()] == URLS[:2]
+    queue.close()
+
+def test_expired_lease_is_issued_again(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    queue.push(URLS[:1])
+    [(item_id, _)] = queue.lease('crashed', lease_timeout=-1)
+    assert queue.counts() == {'pending': 1, 'leased': 0}
+    assert queue.lease('w2') == [(item_id, URLS[0])]
+    # A late ack of the first worker is still a valid result
+    queue.ack(item_id, 'crashed', {'url': URLS[0]})
+    queue.ack(item_id, 'w2', {'url': 'second ack'})
+    assert queue.results() == [{'url': URLS[0]}]
+    queue.close()
+
+def test_item_fails_after_max_attempts(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.push(URLS[:1])
+    assert len(queue.lease('w1', lease_timeout=-1)) == 1
+    assert len(queue.lease('w2', lease_timeout=-1)) == 1
+    assert queue.lease('w3') == []
+    assert queue.counts() == {'failed': 1}
+    assert queue.is_drained()
+    queue.close()
+
+def test_open_work_queue(tmp_path):
+    queue = open_work_queue(f"sqlite:///{tmp_path}/queue.db", max_attempts=5)
+    assert queue.path == f"{tmp_path}/queue.db" and queue.max_attempts == 5
+    queue.close()
+    queue = open_work_queue(str(tmp_path / "plain.db"))
+    assert isinstance(queue, SQLiteWorkQueue)
+    queue.close()
+    with pytest.raises(ValueError):
+        open_work_queue("redis://localhost/0")
+
+def test_incomplete_backend_cannot_be_created():
+    class PushOnlyQueue(WorkQueue):
+        def push(self, urls):
+            return 0
+
+    with pytest.raises(TypeError):
+        PushOnlyQueue()
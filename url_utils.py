@@ -0,0 +1,145 @@
+import fnmatch
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# Query parameters removed from URLs before they are compared or fetched. Entries can use
+# shell-style wildcards, names are matched case-insensitively.
+DEFAULT_STRIP_PARAMS = (
+    'utm_*',     # Google Analytics campaign tags
+    'gclid',     # Google Ads click id
+    'gbraid',
+    'wbraid',
+    'dclid',     # DoubleClick click id
+    'fbclid',    # Facebook click id
+    'msclkid',   # Microsoft Ads click id
+    'yclid',     # Yandex click id
+    'mc_cid',    # Mailchimp
+    'mc_eid',
+    '_ga',
+    '_gl',
+    'srsltid',   # Google Merchant Center
+)
+
+# Default ports that are dropped from the host
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Paths of Google's redirect links, with the target in the q or url parameter
+REDIRECT_PATHS = ('/url', '/interstitial')
+
+def unwrap_redirect(href):
+    """
+    Return the target of a Google redirect link such as /url?q=https://example.com/%3Fa%3D1&sa=U.
+
+    The query string is parsed properly, so the target is percent-decoded once and
+    parameters of the redirect itself (sa, ved, usg) are dropped. Other links are
+    returned unchanged.
+
+    Args:
+        href (str): Link from a results page, relative or absolute
+
+    Returns:
+        str: The target URL, or href itself
+    """
+    if not href:
+        return href
+    parts = urlsplit(href.strip())
+    host = parts.hostname or ''
+    if parts.path in REDIRECT_PATHS and (not host or host.startswith('google.') or '.google.' in host):
+        params = dict(parse_qsl(parts.query))
+        target = params.get('q') or params.get('url')
+        if target and target.startswith(('http://', 'https://')):
+            return target
+    return href
+
+def _is_stripped(name, strip_params):
+    name = name.lower()
+    return any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in strip_params)
+
+def normalize_url(url, strip_params=DEFAULT_STRIP_PARAMS):
+    """
+    Clean up a URL for fetching.
+
+    Unwraps Google redirect links, lowercases the scheme and host, drops default ports,
+    the fragment and the tracking parameters in strip_params, and turns an empty path
+    into '/'. The scheme, the 'www.' prefix and the order of the remaining parameters
+    are kept, so the URL still points to the same page.
+
+    Args:
+        url (str): URL or Google redirect link
+        strip_params (iterable): Query parameter names or wildcard patterns to remove
+
+    Returns:
+        str: The normalized URL
+    """
+    url = unwrap_redirect(url.strip())
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+        # hostname drops the brackets of an IPv6 address, which the netloc needs
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    if parts.username or parts.password:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+
+    query = parts.query
+    if query and strip_params:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(name, value) for name, value in params if not _is_stripped(name, strip_params)]
+        if len(kept) != len(params):
+            query = urlencode(kept)
+
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def canonical_key(url, strip_params=DEFAULT_STRIP_PARAMS):
+    """
+    Return the identity of a URL for deduplication.
+
+    On top of normalize_url, http and https, 'www.' and the bare host, a trailing slash,
+    percent-encoding differences and the order of the query parameters are all treated
+    as the same URL.
+
+    Args:
+        url (str): URL or Google redirect link
+        strip_params (iterable): Query parameter names or wildcard patterns to remove
+
+    Returns:
+        str: Key such as 'example.com/contact?a=1'
+    """
+    parts = urlsplit(normalize_url(url, strip_params))
+    host = parts.netloc
+    if host.startswith('www.'):
+        host = host[4:]
+    path = unquote(parts.path).rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+def dedupe_urls(urls, strip_params=DEFAULT_STRIP_PARAMS):
+    """
+    Remove URLs that point to the same page, keeping the order of first appearance.
+
+    Every group of URLs with the same canonical_key is fetched once, through the normalized
+    form of its first URL. An https URL is preferred over an http one of the same page.
+
+    Args:
+        urls (iterable): URLs or Google redirect links
+        strip_params (iterable): Query parameter names or wildcard patterns to remove
+
+    Returns:
+        tuple: (list of unique normalized URLs, dictionary of every original URL to the
+            URL that is fetched for it)
+    """
+    chosen = {}
+    keys = {}
+    for url in urls:
+        if url in keys:
+            continue
+        normalized = normalize_url(url, strip_params)
+        key = keys[url] = canonical_key(normalized, strip_params)
+        current = chosen.get(key)
+        if current is None or (current.startswith('http://') and normalized.startswith('https://')):
+            chosen[key] = normalized
+    return list(chosen.values()), {url: chosen[key] for url, key in keys.items()}